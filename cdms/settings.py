@@ -53,6 +53,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.query_budget.QueryBudgetMiddleware',
+    'dashboard.master_data.MasterDataMiddleware',
 ]
 
 ROOT_URLCONF = 'cdms.urls'
@@ -135,6 +137,53 @@ if DEBUG:
     # Add this line to serve static files in development
     STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 
+# Cache shared by all worker processes on this host; holds per-user permission
+# and scope data, invalidated by bumping a per-user version
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
+USER_ACCESS_CACHE_TIMEOUT = 3600
+
+# Uploaded document storage
+# Files are stored outside the database under their SHA-256 digest
+BLOB_STORE = {
+    'BACKEND': 'dashboard.storage.FileSystemBlobStore',
+    'OPTIONS': {
+        'location': os.path.join(BASE_DIR, 'blobs'),
+    },
+}
+
+# Activity logging
+# 'buffered' queues entries in process and inserts them from a background thread;
+# 'sync' writes each entry as it is made (use this in tests)
+ACTIVITY_LOG = {
+    'MODE': 'buffered',
+    'BATCH_SIZE': 200,       # Entries inserted per bulk_create
+    'FLUSH_INTERVAL': 2,     # Seconds an entry may wait before it is written
+    'MAX_QUEUE_SIZE': 10000,
+    'OVERFLOW': 'sync',      # When the queue is full: 'sync' writes directly, 'drop' discards, 'block' waits
+}
+
+# Background jobs (bulk uploads) run by `python manage.py run_jobs`
+BACKGROUND_JOBS = {
+    'WORKERS': 2,              # Worker threads per run_jobs process
+    'POLL_INTERVAL': 2,        # Seconds between checks for queued jobs
+    'HEARTBEAT_INTERVAL': 10,  # Seconds between heartbeats of running jobs (and checks for stale ones)
+    'STALE_AFTER': 60,         # Seconds without a heartbeat before a running job is requeued
+    'MAX_ATTEMPTS': 3,         # Claims of a job before a stopping worker fails it instead
+}
+
+# Per-request query budgets, declared next to the views with @query_budget
+# 'log' warns about requests over budget, 'strict' raises (use in tests), 'off' disables
+QUERY_BUDGET = {
+    'MODE': 'log',
+    'DEFAULT_MAX_QUERIES': 50,  # For views without a declared budget
+    'MAX_REPEATS': 3,           # Runs of one SELECT shape before it counts as an N+1
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -191,6 +240,6 @@ CORS_ALLOW_CREDENTIALS = True
 # CSRF settings
 CSRF_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_HTTPONLY = False  # Must be False to allow JavaScript to read the cookie
-CSRF_TRUSTED_ORIGINS = ['157.245.108.56']  # Add your domains here
+CSRF_TRUSTED_ORIGINS = ['http://157.245.108.56']  # Add your domains here
 CSRF_USE_SESSIONS = False
 CSRF_COOKIE_SECURE = False  # Set to True in production with HTTPS
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import UserSubDepartment
+
+# Seconds a cached permission set or scope is kept
+ACCESS_CACHE_TIMEOUT = getattr(settings, 'USER_ACCESS_CACHE_TIMEOUT', 3600)
+
+
+def _version_key(user_id):
+    return f'user_access:{user_id}:version'
+
+
+def get_user_version(user_id):
+    """Current cache version of a user's permissions and scope."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Never restart at a number older entries may still be stored under
+        version = time.time_ns()
+        if not cache.add(_version_key(user_id), version, None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate everything cached for the user by moving to a new version."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def user_cache_key(user_id, name):
+    return f'user_access:{user_id}:{get_user_version(user_id)}:{name}'
+
+
+_MASTER_VERSION_KEY = 'master_data:version'
+
+
+def get_master_version():
+    """Current version of branches, departments, sub-departments and their links."""
+    version = cache.get(_MASTER_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_MASTER_VERSION_KEY, version, None):
+            version = cache.get(_MASTER_VERSION_KEY, version)
+    return version
+
+
+def bump_master_version():
+    """Invalidate everything cached from the master data, for all users."""
+    try:
+        cache.incr(_MASTER_VERSION_KEY)
+    except ValueError:
+        cache.set(_MASTER_VERSION_KEY, time.time_ns(), None)
+
+
+def get_permission_set(user):
+    """
+    The user's resolved permissions: can_* names, the page permission tree
+    and the codenames of Django permissions granted directly or via groups.
+    """
+    key = user_cache_key(user.id, 'permissions')
+    permission_set = cache.get(key)
+    if permission_set is None:
+        codenames = (Permission.objects.filter(Q(user=user) | Q(group__user=user))
+                     .values_list('codename', flat=True).distinct())
+        permission_set = {
+            'names': user.permission_names(),
+            'page_permissions': user.get_page_permissions(),
+            'codenames': sorted(set(codenames)),
+        }
+        cache.set(key, permission_set, ACCESS_CACHE_TIMEOUT)
+    return permission_set
+
+
+def get_user_mappings(user):
+    """
+    The user's UserSubDepartment mappings, or None when the user has no
+    mapping row at all.
+    """
+    key = user_cache_key(user.id, 'mappings')
+    cached = cache.get(key)
+    if cached is None:
+        user_mappings = UserSubDepartment.objects.filter(user=user).only('mappings').first()
+        cached = {'mappings': user_mappings.get_mappings() if user_mappings else None}
+        cache.set(key, cached, ACCESS_CACHE_TIMEOUT)
+    return cached['mappings']
@@ -0,0 +1,69 @@
+from django.db.models import Exists, OuterRef
+
+from .models import UserSubDepartmentAccess
+from .access_cache import get_user_mappings
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def scope_rows(user):
+    """The user's UserSubDepartmentAccess rows."""
+    return UserSubDepartmentAccess.objects.filter(user_id=user.id)
+
+
+def has_access(user, branch_id=None, department_id=None, sub_department_id=None):
+    """
+    Whether the user is mapped to the given branch, department and/or
+    sub-department (ids left as None are not checked). One indexed EXISTS.
+    """
+    filters = {}
+    for name, value in (('branch_id', branch_id), ('department_id', department_id),
+                        ('sub_department_id', sub_department_id)):
+        if value is None:
+            continue
+        filters[name] = _as_id(value)
+        if filters[name] is None:
+            return False
+    return scope_rows(user).filter(**filters).exists()
+
+
+def access_denied_message(user, default):
+    """The error to report when an access check failed, matching the mapping state of the user."""
+    mappings = get_user_mappings(user)
+    if mappings is None:
+        return 'No permissions found for user'
+    if not mappings:
+        return 'No branch-department mappings found for user'
+    return default
+
+
+def scope_branch_ids(user):
+    """Subquery of the branch ids the user is mapped to."""
+    return scope_rows(user).values('branch_id')
+
+
+def scope_department_ids(user, branch_id):
+    """Subquery of the department ids the user is mapped to within a branch."""
+    return scope_rows(user).filter(branch_id=branch_id).values('department_id')
+
+
+def scope_sub_department_ids(user, department_id):
+    """Subquery of the sub-department ids the user is mapped to within a department."""
+    return scope_rows(user).filter(department_id=department_id).values('sub_department_id')
+
+
+def within_scope(queryset, user):
+    """
+    Restrict a queryset of records (anything with branch, department and
+    sub_department foreign keys) to the combinations the user is mapped to.
+    """
+    return queryset.filter(Exists(scope_rows(user).filter(
+        branch_id=OuterRef('branch_id'),
+        department_id=OuterRef('department_id'),
+        sub_department_id=OuterRef('sub_department_id'),
+    )))
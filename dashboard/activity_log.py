@@ -0,0 +1,168 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import ActivityLog, ActivityLogFilterValue
+
+logger = logging.getLogger(__name__)
+
+
+def log_settings():
+    config = {
+        'MODE': 'sync',
+        'BATCH_SIZE': 200,
+        'FLUSH_INTERVAL': 2.0,
+        'MAX_QUEUE_SIZE': 10000,
+        'OVERFLOW': 'sync',
+    }
+    config.update(getattr(settings, 'ACTIVITY_LOG', {}))
+    return config
+
+
+class BufferedLogWriter:
+    """
+    Write-behind buffer for ActivityLog rows. Entries are queued in process
+    and a background thread inserts them with bulk_create once BATCH_SIZE
+    entries are waiting or FLUSH_INTERVAL seconds have passed. Whatever is
+    still queued is written when the process exits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = None
+
+    def _start(self, config):
+        # A forked worker inherits the queue but not the thread, so start over
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=config['MAX_QUEUE_SIZE'])
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self._queue, self._stop, config['BATCH_SIZE'], config['FLUSH_INTERVAL']),
+                name='cdms-activity-log-writer',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def put(self, entry):
+        config = log_settings()
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._start(config)
+        try:
+            if config['OVERFLOW'] == 'block':
+                self._queue.put(entry)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            if config['OVERFLOW'] == 'drop':
+                logger.warning('Activity log queue is full, dropping entry for %s', entry.page)
+            else:
+                write_entries([entry])
+
+    def _run(self, entries, stop, batch_size, interval):
+        try:
+            while not stop.is_set():
+                batch = self._collect(entries, batch_size, interval)
+                if batch:
+                    write_entries(batch)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _collect(entries, batch_size, interval):
+        """Wait up to interval for the first entry, then take what is queued up to batch_size."""
+        try:
+            batch = [entries.get(timeout=interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < batch_size:
+            try:
+                batch.append(entries.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write every queued entry from the calling thread."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= log_settings()['BATCH_SIZE']:
+                write_entries(batch)
+                batch = []
+        if batch:
+            write_entries(batch)
+
+    def shutdown(self):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self.flush()
+
+
+# (kind, value) pairs known to be in ActivityLogFilterValue, so most writes skip the lookup table
+_known_filter_values = set()
+
+
+def record_filter_values(entries):
+    """Add the page and model names of entries to the log report filter lookup table."""
+    values = set()
+    for entry in entries:
+        values.add(('page', entry.page))
+        if entry.model_name:
+            values.add(('model', entry.model_name))
+    new_values = values - _known_filter_values
+    if not new_values:
+        return
+    ActivityLogFilterValue.objects.bulk_create(
+        [ActivityLogFilterValue(kind=kind, value=value) for kind, value in new_values],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: _known_filter_values.update(new_values))
+
+
+def write_entries(entries):
+    try:
+        with transaction.atomic():
+            ActivityLog.objects.bulk_create(entries)
+            record_filter_values(entries)
+    except Exception:
+        # Save one by one so a single bad entry (e.g. its user was deleted meanwhile) loses only itself
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    entry.save()
+                    record_filter_values([entry])
+            except Exception:
+                logger.exception('Could not write activity log entry for %s', entry.page)
+
+
+writer = BufferedLogWriter()
+atexit.register(writer.shutdown)
+
+
+def write_log(entry):
+    """Save an ActivityLog entry now, or queue it in buffered mode."""
+    if log_settings()['MODE'] != 'buffered':
+        entry.save()
+        record_filter_values([entry])
+        return
+    # Entries made inside a transaction are only queued if it commits
+    transaction.on_commit(lambda: writer.put(entry))
@@ -1,17 +1,38 @@
 from django.contrib import admin
+from django import forms
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.forms import UserChangeForm
 from django.contrib.auth.models import Permission
 from django.utils.translation import gettext_lazy as _
 from .models import (
     User, DivisionBranch, Department, SubDepartment, 
     BranchDepartmentLink, Logo, UserSubDepartment,
-    DataEntryRecord, DataEntryFile, ActivityLog
+    DataEntryRecord, DataEntryFile, ActivityLog, BackgroundJob
 )
+from .permissions import PERMISSIONS, PERMISSION_NAMES
+
+class UserPermissionsFormBase(UserChangeForm):
+    """Shows the bits of User.permission_bits as one checkbox per can_* permission."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in PERMISSION_NAMES:
+            self.fields[name].initial = self.instance.has(name)
+
+    def save(self, commit=True):
+        for name in PERMISSION_NAMES:
+            self.instance.set_permission(name, self.cleaned_data.get(name, False))
+        return super().save(commit)
+
+UserPermissionsForm = type('UserPermissionsForm', (UserPermissionsFormBase,), {
+    name: forms.BooleanField(label=label, required=False) for name, label in PERMISSIONS
+})
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     """Custom admin interface for the User model."""
     
+    form = UserPermissionsForm
     list_display = ('username', 'email', 'first_name', 'last_name', 'status', 'is_staff')
     list_filter = ('status', 'is_staff', 'is_superuser', 'groups')
     search_fields = ('username', 'email', 'first_name', 'last_name')
@@ -127,20 +148,18 @@ class CustomUserAdmin(UserAdmin):
         }
         
         # Update permissions based on hierarchy
-        for field in obj._meta.fields:
-            if field.name.startswith('can_'):
-                if getattr(obj, field.name):
-                    # Set parent permissions
-                    for parent, children in permission_hierarchy.items():
-                        if field.name in children:
-                            setattr(obj, parent, True)
-                    
-                    # Add to user_permissions if it exists in the Permission model
-                    try:
-                        perm = Permission.objects.get(codename=field.name)
-                        obj.user_permissions.add(perm)
-                    except Permission.DoesNotExist:
-                        continue
+        for name in obj.permission_names():
+            # Set parent permissions
+            for parent, children in permission_hierarchy.items():
+                if name in children:
+                    setattr(obj, parent, True)
+            
+            # Add to user_permissions if it exists in the Permission model
+            try:
+                perm = Permission.objects.get(codename=name)
+                obj.user_permissions.add(perm)
+            except Permission.DoesNotExist:
+                continue
         
         obj.save()
 
@@ -214,3 +233,12 @@ class ActivityLogAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'page', 'model_name', 'object_id')
     readonly_fields = ('user', 'action', 'page', 'model_name', 'object_id', 'details', 'ip_address', 'user_agent', 'created_at')
     ordering = ('-created_at',)
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'user', 'processed', 'total', 'error_count', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('user__username', 'message')
+    raw_id_fields = ('user',)
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'worker')
+    ordering = ('-created_at',)
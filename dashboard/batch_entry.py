@@ -0,0 +1,143 @@
+import json
+import re
+
+from django.db import transaction
+
+from .models import DivisionBranch, Department, SubDepartment, DataEntryRecord, DataEntryFile
+from .access_scope import scope_rows
+from .master_data import get_master_data
+from .field_schema import normalize_field_values
+from .record_index import index_records
+from .counters import adjust_counts, count_records
+from .signals import log_activity
+
+# Most records accepted by one batch request
+MAX_BATCH_RECORDS = 1000
+
+# Rows per INSERT statement
+BATCH_INSERT_SIZE = 500
+
+# Multipart part holding the files of record <index> of the batch
+FILE_PART = re.compile(r'^documents_(\d+)$')
+
+
+class BatchError(Exception):
+    """The batch as a whole cannot be read; nothing was created."""
+
+
+class BatchEntry:
+    """One validated record of a batch, with its uploaded files."""
+
+    def __init__(self, index, branch, department, sub_department, field_values, files):
+        self.index = index
+        self.branch = branch
+        self.department = department
+        self.sub_department = sub_department
+        self.field_values = field_values
+        self.files = files
+
+
+def read_batch(data):
+    """The list of record dicts of a batch request; records may be sent as a JSON string (multipart) or a list."""
+    records = data.get('records')
+    if isinstance(records, str):
+        try:
+            records = json.loads(records)
+        except ValueError:
+            raise BatchError('records is not valid JSON')
+    if not isinstance(records, list) or not records:
+        raise BatchError('records must be a non-empty list')
+    if len(records) > MAX_BATCH_RECORDS:
+        raise BatchError(f'A batch may hold at most {MAX_BATCH_RECORDS} records')
+    return records
+
+
+def plan_batch(user, records, files):
+    """
+    Validate every record of a batch against the master data and the user's
+    scope, which is read once for the whole batch. files maps multipart part
+    names to their uploaded files. Returns (entries, errors); errors is a
+    list of {'index', 'error'} and entries is only complete when it is empty.
+    """
+    master_data = get_master_data()
+    scope = set(scope_rows(user).values_list('branch_id', 'department_id', 'sub_department_id'))
+
+    files_by_index = {}
+    errors = []
+    for part in files:
+        match = FILE_PART.match(part)
+        if not match or int(match.group(1)) >= len(records):
+            errors.append({'index': None, 'error': f'Files sent for no record: {part}'})
+            continue
+        files_by_index[int(match.group(1))] = files.getlist(part)
+
+    entries = []
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError('Each record must be an object')
+            resolved = []
+            for model, key in ((DivisionBranch, 'branch'), (Department, 'department'), (SubDepartment, 'sub_department')):
+                obj = master_data.get(model, record.get(key))
+                if obj is None:
+                    raise ValueError(f'Invalid {key}: {record.get(key)!r}')
+                resolved.append(obj)
+            branch, department, sub_department = resolved
+            if (branch.id, department.id, sub_department.id) not in scope:
+                raise ValueError('You do not have access to this branch-department-subdepartment combination')
+
+            field_values = record.get('field_values') or {}
+            if not isinstance(field_values, dict):
+                raise ValueError('field_values must be an object')
+            field_values = normalize_field_values(sub_department, field_values)
+
+            entries.append(BatchEntry(index, branch, department, sub_department, field_values,
+                                      files_by_index.get(index, [])))
+        except (ValueError, TypeError) as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    return entries, errors
+
+
+def insert_batch(user, entries, request=None):
+    """
+    Create the records and files of a validated batch in one transaction with
+    bulk inserts, and log a single activity entry for the batch. Returns the
+    created records in batch order.
+    """
+    with transaction.atomic():
+        records = DataEntryRecord.objects.bulk_create([
+            DataEntryRecord(
+                user=user,
+                branch=entry.branch,
+                department=entry.department,
+                sub_department=entry.sub_department,
+                field_values=entry.field_values
+            )
+            for entry in entries
+        ], batch_size=BATCH_INSERT_SIZE)
+
+        files = [
+            DataEntryFile.from_content(record, upload.name, upload.content_type or 'application/octet-stream', upload)
+            for record, entry in zip(records, entries)
+            for upload in entry.files
+        ]
+        DataEntryFile.objects.bulk_create(files, batch_size=BATCH_INSERT_SIZE)
+
+        # bulk_create skips post_save, so do what the DataEntryRecord handlers would have done
+        index_records(records)
+        adjust_counts(count_records(records))
+        log_activity(
+            user=user,
+            action='create',
+            page='Data Entry',
+            model_name='DataEntryRecord',
+            details={
+                'batch': True,
+                'record_count': len(records),
+                'file_count': len(files),
+                'record_ids': [record.id for record in records],
+            },
+            request=request
+        )
+    return records
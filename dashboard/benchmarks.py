@@ -0,0 +1,189 @@
+import json
+import statistics
+import time
+import tracemalloc
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.urls import reverse
+
+from .models import DataEntryFile
+
+# Checked-in budgets: the generate_synthetic_data arguments of the dataset they
+# were taken on, and per endpoint max_queries plus reference timings (median
+# wall time, SQL time and peak Python allocations of one request)
+BUDGETS_FILE = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+
+# Activity log mode the endpoints run with, whatever the settings say: buffered
+# mode writes from another thread, which moves queries out of the request
+# (and out of the rolled back transaction)
+BENCHMARK_ACTIVITY_LOG_MODE = 'sync'
+
+# Reference timings and the measured metric they are compared with. Timings
+# depend on the machine, so they only warn, and only beyond TIMING_TOLERANCE
+REFERENCE_METRICS = {
+    'reference_ms': 'wall_ms',
+    'reference_sql_ms': 'sql_ms',
+    'reference_peak_kb': 'peak_kb',
+}
+TIMING_TOLERANCE = 3.0
+
+
+class QueryTimer:
+    """Database execute wrapper that counts queries and adds up their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def consume(response):
+    """Read the whole body, so streamed responses are timed until their last byte."""
+    # The test client closes the response itself once it has been read
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def request_once(client, scenario):
+    """Send one request of scenario; returns (response status, body size, SQL timer)."""
+    timer = QueryTimer()
+    method, url, kwargs = scenario['request']()
+    with connection.execute_wrapper(timer):
+        response = getattr(client, method)(url, **kwargs)
+        size = consume(response)
+    return response.status_code, size, timer
+
+
+def measure(client, scenario, repeat=5):
+    """
+    Time a scenario: one warm-up request, `repeat` timed requests (medians are
+    reported) and one request under tracemalloc for the peak memory.
+    """
+    request_once(client, scenario)
+
+    wall, sql, queries = [], [], []
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        status, size, timer = request_once(client, scenario)
+        wall.append((time.perf_counter() - started) * 1000)
+        sql.append(timer.seconds * 1000)
+        queries.append(timer.count)
+
+    tracemalloc.start()
+    try:
+        request_once(client, scenario)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'bytes': size,
+        'wall_ms': round(statistics.median(wall), 2),
+        'queries': max(queries),
+        'sql_ms': round(statistics.median(sql), 2),
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def bulk_upload_archive(record):
+    """A one-row bulk upload ZIP for the branch, department and sub-department of record."""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Branch ID', 'Department ID', 'Sub Department ID', 'File Name', 'Field: Reference'])
+    sheet.append([record.branch.division_id, record.department.department_id,
+                  record.sub_department.sub_department_id, 'benchmark.pdf', 'BENCH-1'])
+    manifest = BytesIO()
+    workbook.save(manifest)
+
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('upload/manifest.xlsx', manifest.getvalue())
+        zf.writestr('upload/data/benchmark.pdf', b'%PDF-1.4 benchmark\n' * 64)
+    return archive.getvalue()
+
+
+def reconciliation_params(record):
+    """
+    Search parameters of a month-end reconciliation in the sub-department of
+    record: a numeric field between two bounds, a month of created_at and the
+    largest values first. None when the sub-department has no numeric field.
+    """
+    fields = record.sub_department.fields or []
+    numeric = next((field['name'] for field in fields if field.get('data_type') == 'numeric'), None)
+    if numeric is None:
+        return None
+    month_end = record.created_at.date()
+    return {
+        'subdepartment-filter': record.sub_department_id,
+        f'field_{numeric}__between': '100,100000',
+        'created_at__between': f'{(month_end - timedelta(days=30)).isoformat()},{month_end.isoformat()}',
+        'order_by': f'-field_{numeric}',
+    }
+
+
+def endpoint_scenarios(user, record):
+    """The benchmarked endpoints, requested as user; record is one of the user's records."""
+    scenarios = {
+        'dashboard_home': lambda: ('get', reverse('dashboard_home'), {}),
+        'search': lambda: ('get', reverse('data-entry-search'), {'data': {'page': 1, 'per_page': 10}}),
+        'search_cursor': lambda: ('get', reverse('data-entry-search'), {'data': {'pagination': 'cursor'}}),
+        'get_hierarchy': lambda: ('get', reverse('data-entry-get-hierarchy'), {}),
+        'user_branch_departments': lambda: ('get', reverse('user_branch_departments', args=[user.id]), {}),
+        'log_report': lambda: ('get', reverse('log_report'), {}),
+        'register': lambda: ('get', reverse('register'), {}),
+    }
+    if record is not None:
+        scenarios['search_filtered'] = lambda: ('get', reverse('data-entry-search'), {'data': {
+            'division-filter': record.branch_id, 'department-filter': record.department_id,
+            'subdepartment-filter': record.sub_department_id}})
+        text = next((str(value) for value in (record.field_values or {}).values() if value), record.branch.name)
+        scenarios['search_text'] = lambda: ('get', reverse('data-entry-search'), {'data': {'q': text[:4]}})
+        range_params = reconciliation_params(record)
+        if range_params:
+            scenarios['search_range'] = lambda: ('get', reverse('data-entry-search'), {'data': range_params})
+        archive = bulk_upload_archive(record)
+        scenarios['process_bulk_upload'] = lambda: ('post', reverse('process_bulk_upload'), {'data': {
+            'zipFile': SimpleUploadedFile('benchmark.zip', archive, content_type='application/zip')}})
+        file_obj = DataEntryFile.objects.filter(record=record).first()
+        if file_obj is not None:
+            scenarios['download_file'] = lambda: (
+                'get', reverse('data-entry-download', kwargs={'pk': record.id, 'file_id': file_obj.id}), {})
+    return {name: {'request': build} for name, build in scenarios.items()}
+
+
+def load_budgets(path=BUDGETS_FILE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def budget_violations(name, result, budgets):
+    """Messages for a query count of result over its budget; these fail the benchmark."""
+    budget = budgets.get('endpoints', {}).get(name, {})
+    if 'max_queries' in budget and result['queries'] > budget['max_queries']:
+        return [f'{name}: {result["queries"]} queries exceeds budget {budget["max_queries"]}']
+    return []
+
+
+def timing_warnings(name, result, budgets, tolerance=TIMING_TOLERANCE):
+    """Messages for every timing of result over tolerance times its reference."""
+    budget = budgets.get('endpoints', {}).get(name, {})
+    warnings = []
+    for reference, metric in REFERENCE_METRICS.items():
+        if reference in budget and result[metric] > budget[reference] * tolerance:
+            warnings.append(f'{name}: {metric} {result[metric]} is over {tolerance:g}x its reference {budget[reference]}')
+    return warnings
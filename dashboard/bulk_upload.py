@@ -0,0 +1,337 @@
+import mimetypes
+import posixpath
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import User, Department, SubDepartment, DivisionBranch, DataEntryRecord, DataEntryFile, ActivityLog
+from .record_index import index_records
+from .counters import adjust_counts, count_records
+from .activity_log import record_filter_values
+from .signals import log_activity
+from .storage import CHUNK_SIZE, get_blob_store
+from .master_data import get_master_data
+from .jobs import JobAbandoned
+from .field_schema import normalize_field_values
+
+# Columns every bulk upload sheet must have (matched case-insensitively)
+REQUIRED_COLUMNS = ['branch id', 'department id', 'sub department id', 'file name']
+
+# Manifests larger than this are spooled to a temp file instead of memory
+MANIFEST_SPOOL_SIZE = 10 * 1024 * 1024
+
+# Rows inserted per transaction
+BULK_CREATE_BATCH_SIZE = 500
+
+
+class UploadArchive:
+    """
+    Reads a bulk upload ZIP in place from the blob store. The manifest and the
+    files under data/ are streamed out of the archive member by member, so
+    nothing is extracted to disk and memory use does not grow with its size.
+    """
+
+    def __init__(self, zip_sha256):
+        self.file = get_blob_store().open(zip_sha256)
+        try:
+            self.zip = zipfile.ZipFile(self.file)
+        except zipfile.BadZipFile:
+            self.file.close()
+            raise ValueError('The uploaded file is not a valid ZIP archive')
+
+        members = [info for info in self.zip.infolist() if not info.is_dir()]
+        self.members = {info.filename: info for info in members}
+
+        # Find the Excel file and data directory
+        excel_files = [info for info in members if info.filename.endswith(('.xlsx', '.xls'))]
+        if not excel_files:
+            self.close()
+            raise ValueError('No Excel file found in the ZIP')
+        self.manifest = excel_files[-1]
+
+        data_dirs = set()
+        for name in self.members:
+            parts = name.split('/')[:-1]
+            data_dirs.update('/'.join(parts[:i + 1]) + '/' for i, part in enumerate(parts) if part == 'data')
+        if not data_dirs:
+            self.close()
+            raise ValueError('No data directory found in the ZIP')
+        # Prefer the data directory next to the Excel file
+        manifest_dir = posixpath.dirname(self.manifest.filename)
+        sibling = posixpath.join(manifest_dir, 'data') + '/'
+        self.data_dir = sibling if sibling in data_dirs else min(data_dirs, key=lambda d: (d.count('/'), d))
+
+    def read_manifest(self):
+        """Load the Excel manifest, spooling it to a temp file only when it is large."""
+        with self.zip.open(self.manifest) as source, \
+                tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_SIZE) as spool:
+            shutil.copyfileobj(source, spool, CHUNK_SIZE)
+            spool.seek(0)
+            return pd.read_excel(spool)
+
+    def data_member(self, file_name):
+        """Return the ZipInfo of file_name under the data directory, or None."""
+        name = posixpath.normpath(posixpath.join(self.data_dir, str(file_name)))
+        if not name.startswith(self.data_dir):
+            return None
+        return self.members.get(name)
+
+    def open(self, member):
+        return self.zip.open(member)
+
+    def close(self):
+        self.zip.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PlannedRow:
+    """A sheet row whose IDs and file have been resolved and is ready to insert."""
+
+    def __init__(self, number, branch, department, sub_department, field_values, file_name, member):
+        self.number = number
+        self.branch = branch
+        self.department = department
+        self.sub_department = sub_department
+        self.field_values = field_values
+        self.file_name = file_name
+        self.member = member
+
+
+def sheet_key(model, field_name, value):
+    """Convert a sheet cell to the lookup value .get(field_name=value) would have used."""
+    try:
+        return model._meta.get_field(field_name).to_python(value)
+    except ValidationError:
+        return None
+
+
+def lookup_objects(model, field_name, values):
+    """Resolve all distinct sheet values of one column from the master data cache."""
+    master_data = get_master_data()
+    keys = {sheet_key(model, field_name, value) for value in values}
+    keys.discard(None)
+    return {key: obj for key in keys if (obj := master_data.get_by_business_id(model, key)) is not None}
+
+
+def plan_rows(df, archive):
+    """
+    Validate every row against the looked-up branches, departments and
+    sub-departments. Returns the valid rows as PlannedRows, the invalid ones
+    as (row number, message) and the names of the field columns.
+    """
+    field_columns = [(column, column.replace('field:', '').strip())
+                     for column in df.columns if column.lower().startswith('field:')]
+    lookups = [
+        (DivisionBranch, 'division_id', 'branch id'),
+        (Department, 'department_id', 'department id'),
+        (SubDepartment, 'sub_department_id', 'sub department id'),
+    ]
+    objects = {model: lookup_objects(model, field_name, df[column]) for model, field_name, column in lookups}
+
+    planned = []
+    errors = []
+    for index, row in df.iterrows():
+        try:
+            # Get the file from data directory
+            file_name = row['file name']
+            member = archive.data_member(file_name)
+
+            if member is None:
+                raise FileNotFoundError(f'File not found: {file_name}')
+
+            # Get branch, department, and sub-department
+            resolved = []
+            for model, field_name, column in lookups:
+                obj = objects[model].get(sheet_key(model, field_name, row[column]))
+                if obj is None:
+                    raise ValueError(f'Invalid ID in row {index + 2}: {model.__name__} matching query does not exist.')
+                resolved.append(obj)
+            branch, department, sub_department = resolved
+
+            # Create field values dictionary from dynamic fields
+            field_values = normalize_field_values(
+                sub_department, {field_name: row[column] for column, field_name in field_columns})
+
+            planned.append(PlannedRow(index + 2, branch, department, sub_department,
+                                      field_values, file_name, member))
+        except Exception as e:
+            errors.append((index + 2, f'Row {index + 2}: {str(e)}'))
+
+    return planned, errors, [field_name for column, field_name in field_columns]
+
+
+def merge_new_fields(sub_departments, field_names):
+    """Add sheet columns that a sub-department does not define yet, saving each one once."""
+    for sub_department in sub_departments:
+        existing_fields = sub_department.fields
+        known = {field['name'].lower() for field in existing_fields}
+        new_fields = []
+        for field_name in field_names:
+            if field_name.lower() not in known:
+                new_fields.append({
+                    'name': field_name,
+                    'data_type': 'alphanumeric',  # Default to alphanumeric
+                    'requirement': 'optional',    # Default to optional
+                    'verify': False              # Default to no verification
+                })
+                known.add(field_name.lower())
+        if new_fields:
+            sub_department.fields = existing_fields + new_fields
+            sub_department.save()
+
+
+def insert_rows(user, rows, archive):
+    """Insert records, their files, search index and activity logs for rows with a few bulk queries."""
+    records = DataEntryRecord.objects.bulk_create([
+        DataEntryRecord(
+            user=user,
+            branch=row.branch,
+            department=row.department,
+            sub_department=row.sub_department,
+            field_values=row.field_values
+        )
+        for row in rows
+    ])
+
+    files = []
+    for record, row in zip(records, rows):
+        # Streamed from the archive straight into the blob store
+        with archive.open(row.member) as f:
+            files.append(DataEntryFile.from_content(
+                record,
+                str(row.file_name),
+                mimetypes.guess_type(str(row.file_name))[0] or 'application/octet-stream',
+                f
+            ))
+    DataEntryFile.objects.bulk_create(files)
+
+    # bulk_create skips post_save, so do what the DataEntryRecord handlers would have done
+    index_records(records)
+    adjust_counts(count_records(records))
+    logs = ActivityLog.objects.bulk_create([
+        ActivityLog(
+            user=user,
+            action='create',
+            page='Data Entry',
+            model_name='DataEntryRecord',
+            object_id=str(record.id),
+            details={
+                'branch': record.branch.name,
+                'department': record.department.name,
+                'sub_department': record.sub_department.name
+            }
+        )
+        for record in records
+    ])
+    record_filter_values(logs)
+
+
+def create_records(user, planned, archive, progress, errors=(), batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Insert planned rows one transaction per batch, retrying a failed batch row
+    by row. errors are the (row number, message) of invalid rows. Each
+    transaction also reports the invalid rows before its last row and moves the
+    job's checkpoint to that row, so a job resumed after a crash skips exactly
+    the rows already reported.
+    """
+    pending = deque(sorted(errors))
+
+    def commit_progress(number):
+        while pending and pending[0][0] <= number:
+            progress.error(pending.popleft()[1])
+        progress.checkpoint(number)
+
+    for start in range(0, len(planned), batch_size):
+        batch = planned[start:start + batch_size]
+        try:
+            with transaction.atomic():
+                insert_rows(user, batch, archive)
+                progress.success(len(batch))
+                commit_progress(batch[-1].number)
+        except JobAbandoned:
+            raise
+        except Exception:
+            # Find the offending rows so only they are reported as errors
+            for row in batch:
+                try:
+                    with transaction.atomic():
+                        insert_rows(user, [row], archive)
+                        progress.success()
+                        commit_progress(row.number)
+                except JobAbandoned:
+                    raise
+                except Exception as e:
+                    with transaction.atomic():
+                        progress.error(f'Row {row.number}: {str(e)}')
+                        commit_progress(row.number)
+    if pending:
+        with transaction.atomic():
+            commit_progress(pending[-1][0])
+
+
+def run_bulk_upload_job(job, progress):
+    """
+    Create a DataEntryRecord with its file for every row of the uploaded sheet.
+    Branches, departments and sub-departments are looked up once for the whole
+    sheet and records are inserted in batches. Row failures are reported
+    through progress and do not stop the job.
+    """
+    payload = job.payload
+    user = User.objects.get(id=payload['user_id'])
+
+    with UploadArchive(payload['zip_sha256']) as archive:
+        # Read the Excel file
+        df = archive.read_manifest()
+
+        # Convert column names to lowercase for case-insensitive matching
+        df.columns = [col.lower() for col in df.columns]
+
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f'Missing required columns: {", ".join(missing_columns)}')
+
+        progress.set_total(len(df))
+
+        planned, errors, field_names = plan_rows(df, archive)
+        # Fresh rows, as the cached master data objects are shared and read-only
+        merge_new_fields(SubDepartment.objects.filter(id__in={row.sub_department.id for row in planned}), field_names)
+        if job.checkpoint is not None:
+            # Resumed after its worker stopped: rows up to the checkpoint are already done and counted
+            planned = [row for row in planned if row.number > job.checkpoint]
+            errors = [error for error in errors if error[0] > job.checkpoint]
+        create_records(user, planned, archive, progress, errors)
+
+    progress.flush(force=True)
+
+    # Log the activity
+    log_activity(
+        user=user,
+        action='create',
+        page='Bulk Upload',
+        model_name='DataEntryRecord',
+        details={
+            'job_id': job.id,
+            'success_count': job.success_count,
+            'error_count': job.error_count,
+            'errors': job.errors
+        },
+        ip_address=payload.get('ip_address'),
+        user_agent=payload.get('user_agent', '')
+    )
+
+    return {
+        'message': 'Bulk upload completed',
+        'success_count': job.success_count,
+        'error_count': job.error_count,
+    }
@@ -0,0 +1,60 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import DataEntryRecord, DataEntryRecordCount
+
+
+def adjust_counts(deltas):
+    """
+    Add deltas, a mapping of (branch_id, department_id, sub_department_id)
+    to a change in the number of records, to DataEntryRecordCount. Call it
+    in the transaction that creates or deletes the records.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        # Only increments create rows: a decrement may come from a cascade deleting the branch itself
+        DataEntryRecordCount.objects.bulk_create([
+            DataEntryRecordCount(branch_id=branch_id, department_id=department_id, sub_department_id=sub_department_id)
+            for (branch_id, department_id, sub_department_id), delta in deltas.items() if delta > 0
+        ], ignore_conflicts=True)
+        # Relative updates, so concurrent writers do not overwrite each other
+        for (branch_id, department_id, sub_department_id), delta in deltas.items():
+            DataEntryRecordCount.objects.filter(
+                branch_id=branch_id, department_id=department_id, sub_department_id=sub_department_id
+            ).update(count=F('count') + delta, updated_at=timezone.now())
+
+
+def count_records(records):
+    """Count records by (branch_id, department_id, sub_department_id), for adjust_counts."""
+    return Counter(record.counter_key() for record in records)
+
+
+def rebuild_counts():
+    """Recompute DataEntryRecordCount from the records themselves; returns the number of counter rows."""
+    totals = (DataEntryRecord.objects.order_by()
+              .values('branch_id', 'department_id', 'sub_department_id')
+              .annotate(total=Count('id')))
+    with transaction.atomic():
+        DataEntryRecordCount.objects.all().delete()
+        counts = DataEntryRecordCount.objects.bulk_create([
+            DataEntryRecordCount(branch_id=row['branch_id'], department_id=row['department_id'],
+                                 sub_department_id=row['sub_department_id'], count=row['total'])
+            for row in totals
+        ], batch_size=500)
+    return len(counts)
+
+
+def total_records():
+    """Number of DataEntryRecords, read from the counters."""
+    return DataEntryRecordCount.objects.aggregate(total=Sum('count'))['total'] or 0
+
+
+def record_counts():
+    """(branch_id, department_id, sub_department_id, count) of every combination that has records."""
+    return DataEntryRecordCount.objects.filter(count__gt=0).values_list(
+        'branch_id', 'department_id', 'sub_department_id', 'count')
@@ -0,0 +1,121 @@
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from rest_framework.renderers import BaseRenderer
+
+from .storage import CHUNK_SIZE
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class PassthroughRenderer(BaseRenderer):
+    """Lets download actions answer any Accept header; the body is built by the view."""
+    media_type = '*/*'
+    format = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header into (start, end) inclusive offsets.
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range) and raises ValueError when the range is unsatisfiable.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def range_iterator(file, start, length, chunk_size=CHUNK_SIZE):
+    """Yield length bytes of file starting at start, then close it."""
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def serve_data_entry_file(request, file_obj, as_attachment=True):
+    """
+    Stream a DataEntryFile without loading it into memory.
+
+    Full downloads go through FileResponse (and so wsgi.file_wrapper when the
+    server provides it). Single byte ranges are answered with 206 Partial
+    Content, and ETag/Last-Modified validators allow 304 Not Modified.
+    """
+    etag = quote_etag(file_obj.sha256) if file_obj.sha256 else None
+    last_modified = int(file_obj.uploaded_at.timestamp()) if file_obj.uploaded_at else None
+
+    def add_validators(response):
+        response['Accept-Ranges'] = 'bytes'
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return add_validators(conditional)
+
+    size = file_obj.file_size
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and if_range and if_range.strip() not in (etag, http_date(last_modified) if last_modified else None):
+        # The client's copy is stale, so it gets the whole file
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return add_validators(response)
+
+    if byte_range is None:
+        response = FileResponse(
+            file_obj.open(),
+            content_type=file_obj.file_type or 'application/octet-stream',
+            as_attachment=as_attachment,
+            filename=file_obj.file_name,
+        )
+        response.block_size = CHUNK_SIZE
+        return add_validators(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        range_iterator(file_obj.open(), start, length),
+        status=206,
+        content_type=file_obj.file_type or 'application/octet-stream',
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, file_obj.file_name)
+    return add_validators(response)
@@ -0,0 +1,80 @@
+import csv
+import tempfile
+
+import openpyxl
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+from .storage import CHUNK_SIZE
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """File-like object whose write returns the value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, headers, rows):
+    """Stream rows as CSV, encoding each one as it is produced."""
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+def excel_response(filename, sheet_title, headers, rows, column_width=20):
+    """
+    Write rows to a write-only workbook and stream the finished file.
+    Write-only sheets keep rows on disk as they are appended, so memory use
+    does not grow with the number of rows.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_title)
+    for col in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = column_width
+
+    # Define styles
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    response = FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+    response.block_size = CHUNK_SIZE
+    return response
+
+
+def export_response(file_type, filename, sheet_title, headers, rows, column_width=20):
+    """Return rows as a CSV (file_type 'csv') or Excel download; filename is given without extension."""
+    if file_type == 'csv':
+        return csv_response(f'{filename}.csv', headers, rows)
+    return excel_response(f'{filename}.xlsx', sheet_title, headers, rows, column_width)
@@ -0,0 +1,146 @@
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from .record_index import parse_numeric, parse_date
+
+# Day-first formats accepted for date fields besides ISO dates (as typed or exported from spreadsheets)
+DATE_INPUT_FORMATS = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y/%m/%d']
+
+
+class FieldValueError(ValueError):
+    """field_values do not fit the sub-department's fields; errors maps field names to messages."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f'{name}: {message}' for name, message in errors.items()))
+
+
+def is_empty(value):
+    # value != value catches NaN and pandas NaT from spreadsheet cells
+    return value is None or value != value or (isinstance(value, str) and not value.strip())
+
+
+def to_text(value):
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets read whole numbers as floats; 1042.0 is meant as 1042
+        return str(int(value))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def to_number(value):
+    number = parse_numeric(value)
+    if number is None:
+        raise ValueError('Enter a number')
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return int(number) if number.is_integer() and abs(number) < 2 ** 53 else number
+
+
+def to_date(value):
+    parsed = parse_date(value)
+    if parsed is None and isinstance(value, str):
+        for date_format in DATE_INPUT_FORMATS:
+            try:
+                parsed = datetime.strptime(value.strip(), date_format).date()
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        raise ValueError('Enter a date as YYYY-MM-DD')
+    return parsed.isoformat()
+
+
+# Converter of each SubDepartment field data_type to the stored JSON value
+CONVERTERS = {
+    'alphanumeric': to_text,
+    'numeric': to_number,
+    'date': to_date,
+}
+
+
+class FieldSchema:
+    """
+    The fields of a SubDepartment compiled into converters. normalize()
+    turns submitted field_values into stored ones: numbers as JSON numbers,
+    dates as ISO strings, everything else as trimmed text, keys spelt as
+    declared. Values of undeclared fields are kept as text.
+    """
+
+    def __init__(self, fields, version=None):
+        self.version = version
+        self.fields = {}
+        for field in fields or []:
+            name = field.get('name', '').strip()
+            if name:
+                data_type = field.get('data_type') if field.get('data_type') in CONVERTERS else 'alphanumeric'
+                self.fields[name.lower()] = (name, data_type, field.get('requirement') == 'essential')
+
+    def declared(self, field_name):
+        """(name, data_type) of field_name as declared, matched case-insensitively; None when undeclared."""
+        field = self.fields.get(str(field_name).strip().lower())
+        return field[:2] if field else None
+
+    def normalize(self, field_values):
+        """Return field_values converted to their declared types; raises FieldValueError."""
+        if not isinstance(field_values, dict):
+            raise FieldValueError({'field_values': 'Must be an object'})
+        normalized = {}
+        errors = {}
+        for key, value in field_values.items():
+            name, data_type, essential = self.fields.get(str(key).strip().lower(), (key, 'alphanumeric', False))
+            if is_empty(value):
+                continue
+            try:
+                normalized[name] = CONVERTERS[data_type](value.normalize() if isinstance(value, Decimal) else value)
+            except (TypeError, ValueError) as e:
+                errors[name] = str(e)
+        for name, data_type, essential in self.fields.values():
+            if essential and name not in normalized and name not in errors:
+                errors[name] = 'This field is required'
+        if errors:
+            raise FieldValueError(errors)
+        return normalized
+
+
+class FieldSchemaCache:
+    """
+    Compiled FieldSchemas by sub-department id. An entry is reused while the
+    sub-department's updated_at is unchanged, so a save in another process is
+    picked up with the reloaded master data; forget() drops it at once in this one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schemas = {}
+
+    def get(self, sub_department):
+        version = sub_department.updated_at
+        schema = self._schemas.get(sub_department.pk)
+        if schema is None or schema.version != version:
+            schema = FieldSchema(sub_department.fields, version)
+            with self._lock:
+                self._schemas[sub_department.pk] = schema
+        return schema
+
+    def forget(self, sub_department_id):
+        with self._lock:
+            self._schemas.pop(sub_department_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._schemas.clear()
+
+
+field_schema_cache = FieldSchemaCache()
+
+
+def get_field_schema(sub_department):
+    return field_schema_cache.get(sub_department)
+
+
+def normalize_field_values(sub_department, field_values):
+    """field_values of a record of sub_department as they should be stored; raises FieldValueError."""
+    return get_field_schema(sub_department).normalize(field_values)
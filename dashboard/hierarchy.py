@@ -0,0 +1,66 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import DivisionBranch, Department, SubDepartment
+from .serializers import BranchSerializer
+from .access_cache import ACCESS_CACHE_TIMEOUT, user_cache_key, get_master_version
+from .access_scope import scope_rows
+from .master_data import get_master_data
+
+
+def build_hierarchy(request):
+    """
+    Serialize the branch -> department -> sub-department tree of the request
+    user with one query for the user's scope; the branches, departments and
+    sub-departments come from the master data cache. The output is what
+    BranchSerializer gives for the user's branches: departments are those
+    mapped within the branch, sub-departments those mapped within the
+    department in any branch.
+    """
+    departments_of_branch = {}
+    sub_departments_of_department = {}
+    for branch_id, department_id, sub_department_id in scope_rows(request.user).values_list(
+            'branch_id', 'department_id', 'sub_department_id'):
+        departments_of_branch.setdefault(branch_id, set()).add(department_id)
+        sub_departments_of_department.setdefault(department_id, set()).add(sub_department_id)
+
+    master_data = get_master_data()
+    branches = master_data.filter(DivisionBranch, departments_of_branch)
+    departments = {department.id: department
+                   for department in master_data.filter(Department, sub_departments_of_department)}
+    sub_department_ids = set().union(*sub_departments_of_department.values())
+    sub_departments = master_data.filter(SubDepartment, sub_department_ids)
+
+    # Group in the models' default ordering, as per-object querysets would return them
+    departments_by_branch = {
+        branch_id: [department for department in departments.values() if department.id in department_ids]
+        for branch_id, department_ids in departments_of_branch.items()
+    }
+    sub_departments_by_department = {}
+    for sub_department in sub_departments:
+        sub_departments_by_department.setdefault(sub_department.department_id, []).append(sub_department)
+
+    serializer = BranchSerializer(branches, many=True, context={
+        'request': request,
+        'departments_by_branch': departments_by_branch,
+        'sub_departments_by_department': sub_departments_by_department,
+    })
+    return serializer.data
+
+
+def get_hierarchy(request):
+    """
+    The request user's hierarchy and its ETag, cached until the user's
+    scope or permissions or any master data change.
+    """
+    key = f'{user_cache_key(request.user.id, "hierarchy")}:{get_master_version()}'
+    cached = cache.get(key)
+    if cached is None:
+        data = json.loads(json.dumps(build_hierarchy(request), cls=DjangoJSONEncoder))
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        cached = {'etag': f'"{digest[:32]}"', 'data': data}
+        cache.set(key, cached, ACCESS_CACHE_TIMEOUT)
+    return cached['etag'], cached['data']
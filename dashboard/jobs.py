@@ -0,0 +1,279 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# Handlers run for each BackgroundJob.kind, imported lazily
+JOB_HANDLERS = {
+    'bulk_upload': 'dashboard.bulk_upload.run_bulk_upload_job',
+    'text_reindex': 'dashboard.text_search.run_text_reindex_job',
+}
+
+# Most per-item error messages kept on a job; error_count keeps the full total
+MAX_STORED_ERRORS = 1000
+
+
+def job_settings():
+    config = {
+        'WORKERS': 2,
+        'POLL_INTERVAL': 2.0,
+        'HEARTBEAT_INTERVAL': 10.0,
+        'STALE_AFTER': 60,
+        'MAX_ATTEMPTS': 3,
+    }
+    config.update(getattr(settings, 'BACKGROUND_JOBS', {}))
+    return config
+
+
+def enqueue_job(kind, user, payload):
+    """Queue a job and return it; a run_jobs worker will pick it up."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return BackgroundJob.objects.create(kind=kind, user=user, payload=payload)
+
+
+class JobAbandoned(Exception):
+    """The running job was taken away from this worker (requeued as stale); stop working on it."""
+
+
+# Tells this process apart from an earlier one with the same host and pid (e.g. a restarted container)
+PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+
+def process_id():
+    """Prefix of the worker ids of this process: host:pid:token."""
+    return f'{socket.gethostname()}:{os.getpid()}:{PROCESS_TOKEN}'
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest queued job to running and return it.
+    The conditional UPDATE makes concurrent workers (threads or processes)
+    skip jobs that another worker claimed first.
+    """
+    while True:
+        job_id = (BackgroundJob.objects.filter(status='queued')
+                  .order_by('created_at', 'id').values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = BackgroundJob.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker_id, started_at=now, heartbeat_at=now, updated_at=now,
+            attempts=F('attempts') + 1)
+        if claimed:
+            return BackgroundJob.objects.get(id=job_id)
+
+
+def beat(process):
+    """Record that the workers of process (see process_id) are alive."""
+    return BackgroundJob.objects.filter(status='running', worker__startswith=f'{process}:').update(
+        heartbeat_at=timezone.now())
+
+
+def dead_local_workers():
+    """Worker ids of running jobs whose process, on this host, has exited."""
+    host = socket.gethostname()
+    dead = set()
+    for worker in (BackgroundJob.objects.filter(status='running', worker__startswith=f'{host}:')
+                   .values_list('worker', flat=True).distinct()):
+        try:
+            pid = int(worker.split(':')[1])
+        except (IndexError, ValueError):
+            continue
+        if pid == os.getpid():
+            if not worker.startswith(f'{process_id()}:'):
+                dead.add(worker)
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            dead.add(worker)
+        except PermissionError:
+            # Alive, run by another user
+            pass
+    return dead
+
+
+def requeue_stale_jobs(stale_after, max_attempts=None):
+    """
+    Take back running jobs whose worker is gone: its heartbeat is older than
+    stale_after seconds, or its process on this host has exited. A job that
+    already used max_attempts claims is failed rather than run again. Jobs
+    with a checkpoint keep their progress and resume after it; the others
+    start over. Returns the number of jobs requeued or failed.
+    """
+    max_attempts = max_attempts or job_settings()['MAX_ATTEMPTS']
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=stale_after)
+    stale = BackgroundJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, updated_at__lt=cutoff)
+        | Q(worker__in=dead_local_workers()),
+        status='running')
+
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status='failed', message=f'The worker stopped during each of {max_attempts} attempts',
+        finished_at=now, updated_at=now)
+    requeued = stale.filter(checkpoint__isnull=False).update(
+        status='queued', worker='', heartbeat_at=None, updated_at=now)
+    requeued += stale.filter(checkpoint__isnull=True).update(
+        status='queued', worker='', heartbeat_at=None, updated_at=now,
+        processed=0, success_count=0, error_count=0, errors=[])
+    if failed or requeued:
+        logger.warning('Requeued %s and failed %s background jobs whose worker stopped', requeued, failed)
+    return failed + requeued
+
+
+class JobProgress:
+    """Collects a job's progress and writes it back at most every `interval` seconds."""
+
+    def __init__(self, job, interval=1.0):
+        self.job = job
+        self.interval = interval
+        self._last_flush = 0.0
+
+    def set_total(self, total):
+        self.job.total = total
+        self.flush(force=True)
+
+    def success(self, count=1):
+        self.job.success_count += count
+        self.job.processed += count
+        self.flush()
+
+    def error(self, message):
+        self.job.error_count += 1
+        self.job.processed += 1
+        if len(self.job.errors) < MAX_STORED_ERRORS:
+            self.job.errors.append(message)
+        self.flush()
+
+    def checkpoint(self, position):
+        """
+        Record that the job's work up to position is done. Call it in the
+        transaction that commits that work, so a requeued job resumes exactly
+        after it with its counts as they were.
+        """
+        self.job.checkpoint = position
+        self.flush(force=True)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.interval:
+            return
+        self._last_flush = now
+        self.job.updated_at = timezone.now()
+        # Only while the job is still ours; it may have been requeued as stale
+        saved = BackgroundJob.objects.filter(pk=self.job.pk, status='running', worker=self.job.worker).update(
+            **{field: getattr(self.job, field) for field in
+               ('total', 'processed', 'success_count', 'error_count', 'errors', 'checkpoint', 'updated_at')})
+        if not saved:
+            raise JobAbandoned(f'Background job {self.job.pk} is no longer run by {self.job.worker}')
+
+
+def run_job(job):
+    """Run a claimed job with its handler and record the outcome."""
+    progress = JobProgress(job)
+    try:
+        handler = import_string(JOB_HANDLERS[job.kind])
+        job.result = handler(job, progress) or {}
+        job.status = 'succeeded'
+    except JobAbandoned:
+        logger.warning('Background job %s was requeued while %s ran it; stopping', job.id, job.worker)
+        return job
+    except Exception as e:
+        logger.exception('Background job %s failed', job.id)
+        job.status = 'failed'
+        job.message = str(e)
+    job.finished_at = timezone.now()
+    BackgroundJob.objects.filter(pk=job.pk, status='running', worker=job.worker).update(
+        status=job.status, result=job.result, message=job.message, finished_at=job.finished_at,
+        total=job.total, processed=job.processed, success_count=job.success_count,
+        error_count=job.error_count, errors=job.errors, checkpoint=job.checkpoint, updated_at=job.finished_at)
+    return job
+
+
+def worker_loop(worker_id, stop_event, poll_interval, once=False):
+    """Claim and run jobs until stop_event is set (or the queue is empty with once)."""
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_next_job(worker_id)
+        except Exception:
+            logger.exception('Worker %s could not claim a job', worker_id)
+            job = None
+        if job is None:
+            if once:
+                return
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job)
+    close_old_connections()
+
+
+def monitor_loop(process, stop_event, config):
+    """
+    Beat the heartbeat of the jobs run by this process and take back the
+    jobs of stopped workers, every HEARTBEAT_INTERVAL seconds until stop_event is set.
+    """
+    while True:
+        try:
+            beat(process)
+            requeue_stale_jobs(config['STALE_AFTER'], config['MAX_ATTEMPTS'])
+        except Exception:
+            logger.exception('Could not check the background job heartbeats')
+        finally:
+            close_old_connections()
+        if stop_event.wait(config['HEARTBEAT_INTERVAL']):
+            break
+    connection.close()
+
+
+def run_workers(workers=None, poll_interval=None, once=False, stop_event=None):
+    """Run a bounded pool of worker threads in this process, with a thread watching the heartbeats."""
+    config = job_settings()
+    workers = workers or config['WORKERS']
+    poll_interval = poll_interval if poll_interval is not None else config['POLL_INTERVAL']
+    stop_event = stop_event or threading.Event()
+
+    base_id = process_id()
+    # Jobs of a crashed process are requeued straight away if it ran on this host
+    requeue_stale_jobs(config['STALE_AFTER'], config['MAX_ATTEMPTS'])
+    monitor_stop = threading.Event()
+    monitor = threading.Thread(target=monitor_loop, args=(base_id, monitor_stop, config),
+                               name='cdms-job-monitor', daemon=True)
+    monitor.start()
+    threads = [
+        threading.Thread(
+            target=worker_loop,
+            args=(f'{base_id}:{index}', stop_event, poll_interval, once),
+            name=f'cdms-job-worker-{index}',
+            daemon=True,
+        )
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        monitor_stop.set()
+        monitor.join()
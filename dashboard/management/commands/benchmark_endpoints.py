@@ -0,0 +1,149 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dashboard.models import User, DataEntryRecord
+from dashboard.permissions import ALL_PERMISSIONS
+from dashboard.activity_log import log_settings
+from dashboard.benchmarks import (BUDGETS_FILE, BENCHMARK_ACTIVITY_LOG_MODE, TIMING_TOLERANCE, endpoint_scenarios,
+                                  measure, load_budgets, budget_violations, timing_warnings)
+
+class Command(BaseCommand):
+    help = ('Drives the main endpoints through the Django test client against the current database '
+            '(filled by generate_synthetic_data with the arguments recorded in dashboard/benchmark_budgets.json) '
+            'and fails when an endpoint runs more queries than its budget. Wall time, SQL time and peak memory '
+            'are reported, and compared with their references only as warnings unless --fail-on-timing is '
+            'given. Everything the requests write is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User (pk) to request as; defaults to the one with most records')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint')
+        parser.add_argument('--only', nargs='+', help='Only run these endpoints')
+        parser.add_argument('--budgets', default=str(BUDGETS_FILE), help='Budget file to check against')
+        parser.add_argument('--fail-on-timing', action='store_true',
+                            help='Also fail when a timing is over --tolerance times its reference')
+        parser.add_argument('--tolerance', type=float, default=TIMING_TOLERANCE,
+                            help='Multiple of the reference timings that is reported (default %(default)s)')
+        parser.add_argument('--write-budgets', action='store_true',
+                            help='Write the measured query counts and timings as the new budgets instead of checking')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Requests would otherwise close the connection, and with it the transaction, when they finish
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            # Query counts depend on the activity log mode, so it is the same on every run
+            with override_settings(ACTIVITY_LOG={**log_settings(), 'MODE': BENCHMARK_ACTIVITY_LOG_MODE}), \
+                    transaction.atomic():
+                results = self.run_benchmarks(options)
+                # Undo the permissions granted below and whatever the requests wrote
+                transaction.set_rollback(True)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            teardown_test_environment()
+
+        if options['write_budgets']:
+            self.write_budgets(options['budgets'], results)
+            return
+
+        budgets = load_budgets(options['budgets'])
+        self.check_dataset(budgets.get('dataset', {}))
+        violations = [message for name, result in results.items()
+                      for message in budget_violations(name, result, budgets)]
+        warnings = [message for name, result in results.items()
+                    for message in timing_warnings(name, result, budgets, options['tolerance'])]
+        for name in results:
+            if name not in budgets.get('endpoints', {}):
+                self.stdout.write(self.style.WARNING(f'{name} has no budget'))
+        if options['fail_on_timing']:
+            violations += warnings
+        else:
+            for message in warnings:
+                self.stdout.write(self.style.WARNING(message))
+        if violations:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} endpoints are within their query budgets'))
+
+    def check_dataset(self, dataset):
+        records = DataEntryRecord.objects.count()
+        if dataset.get('records') is not None and records != dataset['records']:
+            arguments = ' '.join(f'--{name.replace("_", "-")} {value}'
+                                 for name, value in dataset.get('generate_synthetic_data', {}).items())
+            self.stdout.write(self.style.WARNING(
+                f'The budgets were taken on {dataset["records"]} records, this database has {records}; '
+                f'generate it with: manage.py generate_synthetic_data {arguments}'))
+
+    def run_benchmarks(self, options):
+        user = self.benchmark_user(options['user'])
+        # The benchmark should reach every page, whatever the user may normally open
+        user.permission_bits = ALL_PERMISSIONS
+        user.save()
+        record = (DataEntryRecord.objects.filter(user=user).select_related('branch', 'department', 'sub_department')
+                  .order_by('-created_at', '-id').first())
+
+        client = Client()
+        client.force_login(user)
+
+        scenarios = endpoint_scenarios(user, record)
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+            scenarios = {name: scenarios[name] for name in options['only']}
+
+        self.stdout.write(f'Benchmarking as {user.username} ({DataEntryRecord.objects.filter(user=user).count()} records)')
+        self.stdout.write(f'{"endpoint":<26} {"status":>6} {"ms":>9} {"queries":>8} {"sql ms":>9} {"peak KB":>9}')
+        results = {}
+        for name, scenario in scenarios.items():
+            result = measure(client, scenario, options['repeat'])
+            results[name] = result
+            self.stdout.write(f'{name:<26} {result["status"]:>6} {result["wall_ms"]:>9.2f} {result["queries"]:>8} '
+                              f'{result["sql_ms"]:>9.2f} {result["peak_kb"]:>9}')
+            if result['status'] >= 400:
+                raise CommandError(f'{name} answered with status {result["status"]}')
+        return results
+
+    def benchmark_user(self, user_id):
+        if user_id:
+            try:
+                return User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f'User {user_id} does not exist')
+        busiest = (DataEntryRecord.objects.order_by().values('user_id')
+                   .annotate(total=Count('id')).order_by('-total').first())
+        user = User.objects.get(id=busiest['user_id']) if busiest else User.objects.first()
+        if user is None:
+            raise CommandError('There are no users to benchmark with')
+        return user
+
+    def write_budgets(self, path, results):
+        try:
+            dataset = load_budgets(path).get('dataset', {})
+        except FileNotFoundError:
+            dataset = {}
+        # The generator arguments are kept from the old file; update them by hand when they change
+        dataset['records'] = DataEntryRecord.objects.count()
+        budgets = {
+            'dataset': dataset,
+            'activity_log_mode': BENCHMARK_ACTIVITY_LOG_MODE,
+            'endpoints': {
+                name: {
+                    'max_queries': result['queries'],
+                    'reference_ms': result['wall_ms'],
+                    'reference_sql_ms': result['sql_ms'],
+                    'reference_peak_kb': result['peak_kb'],
+                }
+                for name, result in sorted(results.items())
+            },
+        }
+        with open(path, 'w') as f:
+            json.dump(budgets, f, indent=4)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote budgets for {len(results)} endpoints to {path}'))
@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from dashboard.models import User, DivisionBranch, SubDepartment, DataEntryRecord, ActivityLog
+
+# Indexes compared by the benchmark, by model
+BENCHMARKED_INDEXES = {
+    DataEntryRecord: ['dash_rec_user_created', 'dash_rec_user_branch', 'dash_rec_user_dept', 'dash_rec_user_subdept'],
+    ActivityLog: ['dash_log_page_created', 'dash_log_model_created'],
+}
+
+PAGE_SIZE = 50
+
+class Command(BaseCommand):
+    help = ('Shows the query plans and latency of the data entry and log report list queries with and '
+            'without their composite indexes. The indexes are dropped inside a transaction that is rolled '
+            'back, as is any data added with --seed-records/--seed-logs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs of each query; the median is reported')
+        parser.add_argument('--user', type=int, help='User (pk) whose records are listed; defaults to the one with most records')
+        parser.add_argument('--seed-records', type=int, default=0, help='Synthetic records to add for the benchmark')
+        parser.add_argument('--seed-logs', type=int, default=0, help='Synthetic activity logs to add for the benchmark')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert while seeding')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed_records'] or options['seed_logs']:
+                self.seed(options['seed_records'], options['seed_logs'], options['batch_size'])
+
+            user = self.benchmark_user(options['user'])
+            queries = self.queries(user)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{DataEntryRecord.objects.count()} records, {ActivityLog.objects.count()} activity logs'))
+            with_indexes = self.run('with indexes', queries, options['repeat'])
+            self.drop_indexes()
+            without_indexes = self.run('without indexes', queries, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nMedian latency (ms)'))
+            self.stdout.write(f'{"query":<40} {"indexed":>10} {"no index":>10}')
+            for name in queries:
+                self.stdout.write(f'{name:<40} {with_indexes[name]:>10.2f} {without_indexes[name]:>10.2f}')
+
+            # Restores the indexes and removes seeded rows
+            transaction.set_rollback(True)
+
+    def benchmark_user(self, user_id):
+        if user_id:
+            try:
+                return User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                raise CommandError(f'User {user_id} does not exist')
+        busiest = (DataEntryRecord.objects.order_by().values('user_id')
+                   .annotate(total=Count('id')).order_by('-total').first())
+        user = User.objects.filter(id=busiest['user_id']).first() if busiest else User.objects.first()
+        if user is None:
+            raise CommandError('There are no users to benchmark with')
+        return user
+
+    def queries(self, user):
+        """The list queries of the search view and log report, named for the report."""
+        record = DataEntryRecord.objects.filter(user=user).order_by('-created_at', '-id').first()
+        log = ActivityLog.objects.exclude(model_name='').order_by('-created_at', '-id').first()
+        records = DataEntryRecord.objects.filter(user=user).order_by('-created_at', '-id')
+        logs = ActivityLog.objects.order_by('-created_at', '-id')
+        queries = {'records of user': records[:PAGE_SIZE]}
+        if record:
+            queries['records of user by branch'] = records.filter(branch_id=record.branch_id)[:PAGE_SIZE]
+            queries['records of user by department'] = records.filter(department_id=record.department_id)[:PAGE_SIZE]
+            queries['records of user by sub-department'] = records.filter(sub_department_id=record.sub_department_id)[:PAGE_SIZE]
+        if log:
+            queries['logs by page'] = logs.filter(page=log.page)[:PAGE_SIZE]
+            queries['logs by model'] = logs.filter(model_name=log.model_name)[:PAGE_SIZE]
+        return queries
+
+    def run(self, heading, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nQuery plans {heading}'))
+        timings = {}
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.MIGRATE_LABEL(name))
+            self.stdout.write(self.explain(queryset, heading))
+            durations = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                list(queryset.all())
+                durations.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(durations)
+        return timings
+
+    def explain(self, queryset, label):
+        """
+        The query plan of queryset. The label is appended as an SQL comment so the
+        statement is not served from a statement cache prepared before the indexes
+        were dropped.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {label} */', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def drop_indexes(self):
+        # Plain DROP INDEX statements; entering the schema editor is not allowed in a transaction on SQLite
+        editor = connection.schema_editor(atomic=False)
+        with connection.cursor() as cursor:
+            for names in BENCHMARKED_INDEXES.values():
+                for name in names:
+                    cursor.execute(editor.sql_delete_index % {'name': editor.quote_name(name)})
+
+    def seed(self, record_count, log_count, batch_size):
+        """Bulk insert synthetic records and logs spread over the past year."""
+        user_ids = list(User.objects.values_list('id', flat=True)[:20])
+        sub_departments = list(SubDepartment.objects.values_list('id', 'department_id'))
+        branch_ids = list(DivisionBranch.objects.values_list('id', flat=True))
+        if not user_ids or not sub_departments or not branch_ids:
+            raise CommandError('Seeding needs at least one user, branch and sub-department')
+
+        now = timezone.now()
+        rng = random.Random(0)
+
+        def spread(objects):
+            # created_at is auto_now_add, so set it after the insert
+            for obj in objects:
+                obj.created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+            return objects
+
+        for start in range(0, record_count, batch_size):
+            records = []
+            for _ in range(min(batch_size, record_count - start)):
+                sub_department_id, department_id = rng.choice(sub_departments)
+                records.append(DataEntryRecord(
+                    user_id=rng.choice(user_ids), branch_id=rng.choice(branch_ids), department_id=department_id,
+                    sub_department_id=sub_department_id, field_values={'Reference': f'REF-{rng.randrange(10 ** 6)}'}))
+            DataEntryRecord.objects.bulk_update(spread(DataEntryRecord.objects.bulk_create(records)),
+                                                ['created_at'], batch_size=1000)
+            self.stdout.write(f'Seeded {start + len(records)} records...')
+
+        pages = ['Data Entry', 'Register', 'Log Report', 'Dashboard Home', 'Bulk Upload']
+        models = ['DataEntryRecord', 'Register', 'ActivityLog', 'Dashboard', '']
+        for start in range(0, log_count, batch_size):
+            logs = []
+            for _ in range(min(batch_size, log_count - start)):
+                index = rng.randrange(len(pages))
+                logs.append(ActivityLog(user_id=rng.choice(user_ids), action=rng.choice(['view', 'create', 'update']),
+                                        page=pages[index], model_name=models[index]))
+            ActivityLog.objects.bulk_create(spread(logs))
+            self.stdout.write(f'Seeded {start + len(logs)} activity logs...')
@@ -0,0 +1,250 @@
+import random
+import string
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from dashboard.models import (
+    User, DivisionBranch, Department, SubDepartment, BranchDepartmentLink, UserSubDepartment,
+    UserSubDepartmentAccess, DataEntryRecord, DataEntryFile, ActivityLog
+)
+from dashboard.permissions import PERMISSION_NAMES, pack
+from dashboard.record_index import index_records
+from dashboard.counters import adjust_counts, count_records
+from dashboard.activity_log import record_filter_values
+from dashboard.storage import get_blob_store
+from dashboard.access_cache import bump_master_version
+
+FIELD_TYPES = ['alphanumeric', 'numeric', 'date']
+FIELD_WORDS = ['Invoice', 'Account', 'Reference', 'Amount', 'Customer', 'Vendor', 'Policy', 'Loan',
+               'Branch Code', 'Ledger', 'Voucher', 'Receipt', 'Due', 'Approved', 'Batch', 'Contract']
+FILE_TYPES = [('pdf', 'application/pdf'), ('jpg', 'image/jpeg'), ('png', 'image/png'),
+              ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')]
+LOG_PAGES = [('Data Entry', 'DataEntryRecord', 'create'), ('Data Entry', 'DataEntryRecord', 'update'),
+             ('Register', 'Register', 'view'), ('Log Report', 'ActivityLog', 'view'),
+             ('Dashboard Home', 'Dashboard', 'view'), ('Bulk Upload', 'DataEntryRecord', 'create')]
+DAYS_OF_HISTORY = 3 * 365
+
+
+class Command(BaseCommand):
+    help = ('Generates a synthetic organization for load and scale testing: branches, departments, '
+            'sub-departments with field schemas, users with mappings, data entry records with files, '
+            'and activity logs. Records and logs are bulk inserted in parallel chunks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branches', type=int, default=20)
+        parser.add_argument('--departments', type=int, default=15)
+        parser.add_argument('--sub-departments', type=int, default=8, help='Sub-departments per department')
+        parser.add_argument('--fields', type=int, default=8, help='Fields per sub-department schema')
+        parser.add_argument('--departments-per-branch', type=int, default=10)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--mappings-per-user', type=int, default=40)
+        parser.add_argument('--records', type=int, default=1000000)
+        parser.add_argument('--files-per-record', type=int, default=1)
+        parser.add_argument('--blob-pool', type=int, default=50, help='Distinct file contents shared by the records')
+        parser.add_argument('--file-size', type=int, default=64, help='Size of each pooled file in KB')
+        parser.add_argument('--logs', type=int, default=2000000)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows bulk inserted per chunk')
+        parser.add_argument('--workers', type=int, help='Parallel chunk writers (default 1 on SQLite, 4 otherwise)')
+        parser.add_argument('--prefix', default='SYN', help='Prefix of generated codes, usernames and e-mails')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, so runs are reproducible')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options['prefix']
+        self.rng = random.Random(options['seed'])
+        workers = options['workers'] or (1 if connection.vendor == 'sqlite' else 4)
+
+        if Department.objects.filter(department_id__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f'Data with prefix {self.prefix} already exists; pass another --prefix')
+
+        with transaction.atomic():
+            branches = self.create_branches()
+            sub_departments = self.create_departments()
+            scopes = self.create_links(branches, sub_departments)
+            users = self.create_users(scopes)
+        # bulk_create skips the handlers that move the master data cache on
+        bump_master_version()
+        self.stdout.write(f'Created {len(branches)} branches, {len(sub_departments)} sub-departments, '
+                          f'{len(scopes)} branch/sub-department links and {len(users)} users')
+
+        self.blobs = self.create_blobs()
+        self.scopes_by_user = {user_id: user_scopes for user_id, user_scopes in users.items() if user_scopes}
+        if options['records'] and not self.scopes_by_user:
+            raise CommandError('Records need at least one user with mappings')
+        self.fields = {sub_department.id: sub_department.fields for sub_department in sub_departments}
+
+        self.run_chunks('records', options['records'], workers, self.create_record_chunk)
+        self.run_chunks('activity logs', options['logs'], workers, self.create_log_chunk)
+        self.stdout.write(self.style.SUCCESS('Synthetic data generated'))
+
+    # Organization
+
+    def create_branches(self):
+        start = (DivisionBranch.objects.aggregate(Max('division_id'))['division_id__max'] or 0) + 1
+        return DivisionBranch.objects.bulk_create([
+            DivisionBranch(division_id=start + index, name=f'{self.prefix} Branch {index + 1}',
+                           address=f'{index + 1} Synthetic Road')
+            for index in range(self.options['branches'])
+        ])
+
+    def create_departments(self):
+        departments = Department.objects.bulk_create([
+            Department(department_id=f'{self.prefix}-{index + 1:04d}', name=f'{self.prefix} Department {index + 1}')
+            for index in range(self.options['departments'])
+        ])
+        return SubDepartment.objects.bulk_create([
+            SubDepartment(department=department,
+                          sub_department_id=f'{department.department_id}-{index + 1:03d}',
+                          name=f'{department.name} / Unit {index + 1}',
+                          fields=self.field_schema())
+            for department in departments
+            for index in range(self.options['sub_departments'])
+        ])
+
+    def field_schema(self):
+        names = self.rng.sample(FIELD_WORDS, min(self.options['fields'], len(FIELD_WORDS)))
+        names += [f'Field {index}' for index in range(len(names), self.options['fields'])]
+        return [{
+            'name': name,
+            'data_type': self.rng.choice(FIELD_TYPES),
+            'requirement': self.rng.choice(['essential', 'optional']),
+            'verify': False,
+        } for name in names]
+
+    def create_links(self, branches, sub_departments):
+        """Link every branch to a random set of departments; returns the (branch, department, sub-department) triples."""
+        by_department = {}
+        for sub_department in sub_departments:
+            by_department.setdefault(sub_department.department_id, []).append(sub_department)
+        department_ids = list(by_department)
+
+        links = []
+        for branch in branches:
+            for department_id in self.rng.sample(department_ids, min(self.options['departments_per_branch'], len(department_ids))):
+                for sub_department in by_department[department_id]:
+                    links.append(BranchDepartmentLink(branch=branch, department_id=department_id,
+                                                      sub_department=sub_department))
+        BranchDepartmentLink.objects.bulk_create(links, batch_size=1000)
+        return [(link.branch_id, link.department_id, link.sub_department_id) for link in links]
+
+    def create_users(self, scopes):
+        """Create users with a few page permissions and a random set of mappings each."""
+        password = make_password(self.prefix.lower())
+        permissions = pack([name for name in PERMISSION_NAMES if 'data' in name or 'report' in name or 'register' in name])
+        users = User.objects.bulk_create([
+            User(username=f'{self.prefix.lower()}user{index + 1}', email=f'{self.prefix.lower()}user{index + 1}@example.com',
+                 first_name='Synthetic', last_name=f'User {index + 1}', password=password, permission_bits=permissions)
+            for index in range(self.options['users'])
+        ], batch_size=1000)
+
+        user_scopes = {}
+        mappings, access = [], []
+        for user in users:
+            chosen = self.rng.sample(scopes, min(self.options['mappings_per_user'], len(scopes)))
+            user_scopes[user.id] = chosen
+            mappings.append(UserSubDepartment(user=user, mappings=UserSubDepartment.build_mappings(chosen)))
+            access += [UserSubDepartmentAccess(user=user, branch_id=branch_id, department_id=department_id,
+                                               sub_department_id=sub_department_id)
+                       for branch_id, department_id, sub_department_id in chosen]
+        # bulk_create skips post_save, so fill the access rows here
+        UserSubDepartment.objects.bulk_create(mappings, batch_size=1000)
+        UserSubDepartmentAccess.objects.bulk_create(access, batch_size=1000)
+        return user_scopes
+
+    def create_blobs(self):
+        """Store a pool of random file contents; records share them as real uploads often do."""
+        if not self.options['files_per_record']:
+            return []
+        store = get_blob_store()
+        size = self.options['file_size'] * 1024
+        blobs = []
+        for index in range(self.options['blob_pool']):
+            extension, file_type = FILE_TYPES[index % len(FILE_TYPES)]
+            sha256, file_size = store.save(BytesIO(self.rng.randbytes(size)))
+            blobs.append((extension, file_type, sha256, file_size))
+        return blobs
+
+    # Parallel chunks
+
+    def run_chunks(self, label, total, workers, create_chunk):
+        chunks = [(index, min(self.options['chunk_size'], total - start))
+                  for index, start in enumerate(range(0, total, self.options['chunk_size']))]
+        if not chunks:
+            return
+        done = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for count in executor.map(lambda chunk: self.run_chunk(create_chunk, *chunk), chunks):
+                done += count
+                self.stdout.write(f'Inserted {done}/{total} {label}...')
+
+    def run_chunk(self, create_chunk, index, count):
+        # Each chunk gets its own generator so the output does not depend on thread scheduling
+        rng = random.Random(f'{self.options["seed"]}-{create_chunk.__name__}-{index}')
+        try:
+            with transaction.atomic():
+                create_chunk(rng, count)
+            return count
+        finally:
+            # Worker threads open their own connection; do not leave it behind
+            connection.close()
+
+    def created_at(self, rng):
+        return timezone.now() - timedelta(seconds=rng.randrange(DAYS_OF_HISTORY * 24 * 3600))
+
+    def field_value(self, rng, field):
+        if field['data_type'] == 'numeric':
+            return round(rng.lognormvariate(8, 1.5), 2)
+        if field['data_type'] == 'date':
+            return (date.today() - timedelta(days=rng.randrange(DAYS_OF_HISTORY))).isoformat()
+        return f'{field["name"][:3].upper()}-{rng.randrange(10 ** 7):07d}-{rng.choice(string.ascii_uppercase)}'
+
+    def create_record_chunk(self, rng, count):
+        user_ids = list(self.scopes_by_user)
+        records, timestamps = [], []
+        for _ in range(count):
+            user_id = rng.choice(user_ids)
+            branch_id, department_id, sub_department_id = rng.choice(self.scopes_by_user[user_id])
+            timestamps.append(self.created_at(rng))
+            records.append(DataEntryRecord(
+                user_id=user_id, branch_id=branch_id, department_id=department_id,
+                sub_department_id=sub_department_id,
+                field_values={field['name']: self.field_value(rng, field) for field in self.fields[sub_department_id]
+                              if field['requirement'] == 'essential' or rng.random() < 0.7},
+            ))
+        records = DataEntryRecord.objects.bulk_create(records)
+        # created_at and updated_at are stamped on insert, so spread them over the history afterwards
+        for record, created_at in zip(records, timestamps):
+            record.created_at = record.updated_at = created_at
+        DataEntryRecord.objects.bulk_update(records, ['created_at', 'updated_at'], batch_size=1000)
+
+        files = []
+        for record in records:
+            for number in range(self.options['files_per_record']):
+                extension, file_type, sha256, file_size = rng.choice(self.blobs)
+                files.append(DataEntryFile(record=record, file_name=f'document_{record.id}_{number + 1}.{extension}',
+                                           file_type=file_type, sha256=sha256, file_size=file_size))
+        DataEntryFile.objects.bulk_create(files)
+
+        # bulk_create skips post_save, so do what the DataEntryRecord handlers would have done
+        index_records(records)
+        adjust_counts(count_records(records))
+
+    def create_log_chunk(self, rng, count):
+        user_ids = list(self.scopes_by_user) or [None]
+        logs = []
+        for _ in range(count):
+            page, model_name, action = rng.choice(LOG_PAGES)
+            logs.append(ActivityLog(
+                user_id=rng.choice(user_ids), action=action, page=page, model_name=model_name,
+                details={'synthetic': True}, ip_address=f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                user_agent='Mozilla/5.0 (synthetic)', created_at=self.created_at(rng),
+            ))
+        ActivityLog.objects.bulk_create(logs)
+        record_filter_values(logs)
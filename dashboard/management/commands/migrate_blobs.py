@@ -0,0 +1,83 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard.models import DataEntryFile, Logo, BackgroundJob
+from dashboard.storage import get_blob_store
+
+class Command(BaseCommand):
+    help = 'Moves DataEntryFile and Logo contents out of the database into the blob store in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows moved per transaction')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete stored blobs that no row references any more')
+        parser.add_argument('--prune-min-age', type=int, default=3600,
+                            help='Only prune blobs older than this many seconds')
+
+    def handle(self, *args, **options):
+        store = get_blob_store()
+        batch_size = options['batch_size']
+
+        moved = self.move_rows(
+            DataEntryFile.objects.filter(sha256='', file_data__isnull=False),
+            blob_field='file_data',
+            update=lambda pk, sha256, size: DataEntryFile.objects.filter(pk=pk).update(
+                sha256=sha256, file_size=size, file_data=None),
+            store=store,
+            batch_size=batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} data entry files to the blob store'))
+
+        moved = self.move_rows(
+            Logo.objects.filter(logo_sha256='', logo_data__isnull=False),
+            blob_field='logo_data',
+            update=lambda pk, sha256, size: Logo.objects.filter(pk=pk).update(
+                logo_sha256=sha256, logo_size=size, logo_data=None),
+            store=store,
+            batch_size=batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} logos to the blob store'))
+
+        if options['prune']:
+            pruned = self.prune(store, options['prune_min_age'])
+            self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} unreferenced blobs'))
+
+    def move_rows(self, queryset, blob_field, update, store, batch_size):
+        moved = 0
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return moved
+            with transaction.atomic():
+                for pk in ids:
+                    # Load one blob at a time so memory stays bounded
+                    content = queryset.model.objects.filter(pk=pk).values_list(blob_field, flat=True).first()
+                    sha256, size = store.save(bytes(content or b''))
+                    update(pk, sha256, size)
+            moved += len(ids)
+            self.stdout.write(f'Moved {moved} {queryset.model._meta.verbose_name_plural}...')
+
+    def prune(self, store, min_age):
+        if not hasattr(store, 'location'):
+            self.stdout.write(self.style.WARNING('The configured blob store does not support pruning'))
+            return 0
+        referenced = set(DataEntryFile.objects.exclude(sha256='').values_list('sha256', flat=True))
+        referenced.update(Logo.objects.exclude(logo_sha256='').values_list('logo_sha256', flat=True))
+        # Uploaded archives of bulk uploads that have not run yet
+        referenced.update(
+            job.payload.get('zip_sha256')
+            for job in BackgroundJob.objects.filter(status__in=['queued', 'running']).only('payload')
+        )
+        cutoff = time.time() - min_age
+        pruned = 0
+        for root, dirs, files in os.walk(store.location):
+            for name in files:
+                path = os.path.join(root, name)
+                if len(name) != 64 or name in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                store.delete(name)
+                pruned += 1
+        return pruned
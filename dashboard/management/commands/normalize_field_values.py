@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard.field_schema import FieldValueError, normalize_field_values
+from dashboard.master_data import get_master_data
+from dashboard.models import DataEntryRecord, SubDepartment
+from dashboard.record_index import index_records
+
+class Command(BaseCommand):
+    help = ('Rewrites the field_values of existing DataEntryRecords as the types their sub-department declares, '
+            'and reindexes the changed records')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Records read per batch')
+        parser.add_argument('--sub-department', type=int, help='Only normalize records of this sub-department (pk)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        master_data = get_master_data()
+        queryset = DataEntryRecord.objects.order_by('id').only(
+            'id', 'branch_id', 'department_id', 'sub_department_id', 'field_values')
+        if options['sub_department']:
+            queryset = queryset.filter(sub_department_id=options['sub_department'])
+
+        checked = changed = 0
+        invalid = []
+        batch = []
+        for record in queryset.iterator(chunk_size=batch_size):
+            checked += 1
+            sub_department = master_data.get(SubDepartment, record.sub_department_id)
+            try:
+                field_values = normalize_field_values(sub_department, record.field_values or {})
+            except FieldValueError as e:
+                # Left as they are; these need fixing by hand
+                invalid.append((record.id, str(e)))
+                continue
+            if field_values != record.field_values:
+                record.field_values = field_values
+                batch.append(record)
+            if len(batch) >= batch_size:
+                changed += self.write(batch, options['dry_run'])
+                batch = []
+                self.stdout.write(f'Checked {checked} records...')
+        if batch:
+            changed += self.write(batch, options['dry_run'])
+
+        for record_id, error in invalid:
+            self.stdout.write(self.style.WARNING(f'Record {record_id}: {error}'))
+        verb = 'Would normalize' if options['dry_run'] else 'Normalized'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {changed} of {checked} records; {len(invalid)} do not fit their fields'))
+
+    def write(self, records, dry_run):
+        if not dry_run:
+            with transaction.atomic():
+                DataEntryRecord.objects.bulk_update(records, ['field_values'])
+                index_records(records)
+        return len(records)
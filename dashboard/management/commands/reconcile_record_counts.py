@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from dashboard.models import DataEntryRecord, DataEntryRecordCount
+from dashboard.counters import rebuild_counts
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per branch/department/sub-department record counters from the records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report counters that are off, do not rebuild')
+
+    def handle(self, *args, **options):
+        actual = {
+            (row['branch_id'], row['department_id'], row['sub_department_id']): row['total']
+            for row in (DataEntryRecord.objects.order_by()
+                        .values('branch_id', 'department_id', 'sub_department_id')
+                        .annotate(total=Count('id')))
+        }
+        stored = {
+            (branch_id, department_id, sub_department_id): count
+            for branch_id, department_id, sub_department_id, count in DataEntryRecordCount.objects.values_list(
+                'branch_id', 'department_id', 'sub_department_id', 'count')
+        }
+        drift = {key for key in actual.keys() | stored.keys() if actual.get(key, 0) != stored.get(key, 0)}
+        for branch_id, department_id, sub_department_id in sorted(drift):
+            key = (branch_id, department_id, sub_department_id)
+            self.stdout.write(f'Branch {branch_id} / department {department_id} / sub-department {sub_department_id}: '
+                              f'counted {stored.get(key, 0)}, actual {actual.get(key, 0)}')
+
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS(f'{len(drift)} counters are off'))
+            return
+
+        rows = rebuild_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} counters, {len(drift)} were off'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.models import DataEntryRecord
+from dashboard.record_index import index_records
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index rows of DataEntryRecords in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Records indexed per batch')
+        parser.add_argument('--sub-department', type=int, help='Only reindex records of this sub-department (pk)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = DataEntryRecord.objects.order_by('id').only('id', 'branch_id', 'department_id', 'sub_department_id', 'field_values')
+        if options['sub_department']:
+            queryset = queryset.filter(sub_department_id=options['sub_department'])
+
+        total = 0
+        batch = []
+        for record in queryset.iterator(chunk_size=batch_size):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                index_records(batch)
+                total += len(batch)
+                batch = []
+                self.stdout.write(f'Indexed {total} records...')
+        if batch:
+            index_records(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} records'))
@@ -0,0 +1,20 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from dashboard.jobs import run_workers
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (such as bulk uploads) until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Number of worker threads (default: BACKGROUND_JOBS["WORKERS"])')
+        parser.add_argument('--poll-interval', type=float, help='Seconds to wait between checks for queued jobs')
+        parser.add_argument('--once', action='store_true', help='Exit once no queued jobs are left')
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO)
+        self.stdout.write('Waiting for background jobs. Press Ctrl+C to stop.' if not options['once']
+                          else 'Running queued background jobs...')
+        run_workers(workers=options['workers'], poll_interval=options['poll_interval'], once=options['once'])
+        self.stdout.write(self.style.SUCCESS('Background job worker stopped'))
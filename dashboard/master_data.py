@@ -0,0 +1,145 @@
+import contextvars
+import threading
+
+from .models import Department, SubDepartment, DivisionBranch, BranchDepartmentLink
+from .access_cache import get_master_version
+
+# Business id field of each cached model, as used by bulk upload sheets
+BUSINESS_ID_FIELDS = {
+    DivisionBranch: 'division_id',
+    Department: 'department_id',
+    SubDepartment: 'sub_department_id',
+}
+
+
+class MasterData:
+    """
+    Snapshot of all branches, departments, sub-departments and branch
+    department links, indexed by id and by business id. Related objects are
+    wired to the cached instances, so following a foreign key between them
+    does not query. Treat the objects as read-only: they are shared by every
+    thread of the process.
+    """
+
+    def __init__(self, branches, departments, sub_departments, links):
+        self.by_id = {
+            DivisionBranch: {branch.id: branch for branch in branches},
+            Department: {department.id: department for department in departments},
+            SubDepartment: {sub_department.id: sub_department for sub_department in sub_departments},
+        }
+        self.by_business_id = {
+            model: {getattr(obj, field_name): obj for obj in self.by_id[model].values()}
+            for model, field_name in BUSINESS_ID_FIELDS.items()
+        }
+
+        self.sub_departments_by_department = {}
+        for sub_department in sub_departments:
+            sub_department.department = self.by_id[Department][sub_department.department_id]
+            self.sub_departments_by_department.setdefault(sub_department.department_id, []).append(sub_department)
+
+        self.links = links
+        self.links_by_branch = {}
+        for link in links:
+            link.branch = self.by_id[DivisionBranch][link.branch_id]
+            link.department = self.by_id[Department][link.department_id]
+            link.sub_department = self.by_id[SubDepartment].get(link.sub_department_id)
+            self.links_by_branch.setdefault(link.branch_id, []).append(link)
+
+    @classmethod
+    def load(cls):
+        # Each list keeps the model's default ordering
+        return cls(
+            list(DivisionBranch.objects.all()),
+            list(Department.objects.all()),
+            list(SubDepartment.objects.all()),
+            list(BranchDepartmentLink.objects.all()),
+        )
+
+    def get(self, model, pk):
+        """The cached object of model with primary key pk, or None."""
+        try:
+            return self.by_id[model].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def get_by_business_id(self, model, value):
+        """The cached object whose business id (division_id, department_id, ...) is value, or None."""
+        return self.by_business_id[model].get(value)
+
+    def filter(self, model, ids):
+        """Cached objects of model whose id is in ids, in the model's default ordering."""
+        ids = set(ids)
+        return [obj for pk, obj in self.by_id[model].items() if pk in ids]
+
+
+class MasterDataCache:
+    """
+    Read-through, per-process cache of MasterData. Every worker compares its
+    snapshot with the master data version in the shared cache, which the
+    post_save/post_delete handlers bump, and reloads when it has moved on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def get(self):
+        version = get_master_version()
+        data = self._data
+        if data is not None and self._version == version:
+            return data
+        with self._lock:
+            if self._data is None or self._version != version:
+                # Stamped with the version read before loading, so a change made
+                # while loading makes the next call load again
+                self._data = MasterData.load()
+                self._version = version
+            return self._data
+
+    def clear(self):
+        with self._lock:
+            self._data = None
+            self._version = None
+
+
+master_data_cache = MasterDataCache()
+
+# Memo of the request being handled: MasterDataMiddleware sets a dict that
+# holds the snapshot once resolved, so the version is read once per request
+_request_master_data = contextvars.ContextVar('request_master_data', default=None)
+
+
+def get_master_data():
+    memo = _request_master_data.get()
+    if memo is None:
+        return master_data_cache.get()
+    data = memo.get('data')
+    if data is None:
+        data = memo['data'] = master_data_cache.get()
+    return data
+
+
+def forget_request_master_data():
+    """Drop the snapshot of the current request, so a change it made is seen by its later reads."""
+    memo = _request_master_data.get()
+    if memo is not None:
+        memo.pop('data', None)
+
+
+class MasterDataMiddleware:
+    """
+    Resolves the master data at most once per request: the first
+    get_master_data() call checks the shared version, and later calls while
+    the request is handled reuse that snapshot.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_master_data.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _request_master_data.reset(token)
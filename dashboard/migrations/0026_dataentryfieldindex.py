@@ -0,0 +1,122 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:38
+
+import json
+import math
+from datetime import date, datetime
+
+import django.db.models.deletion
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+# Frozen copy of dashboard.record_index as of this migration, so later changes
+# to the app code do not change what the backfill writes
+MAX_INDEX_LENGTH = 255
+
+
+def normalize_text(value):
+    if value is None:
+        return ''
+    return str(value).strip().lower()[:MAX_INDEX_LENGTH]
+
+
+def parse_numeric(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip().replace(',', '')
+        if not text:
+            return None
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+    if math.isnan(number) or math.isinf(number):
+        return None
+    return number
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if len(text) < 10:
+        return None
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        try:
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            return None
+
+
+def field_index_values(field_values):
+    if not field_values:
+        return
+    stored = json.loads(json.dumps(field_values, cls=DjangoJSONEncoder))
+    if not isinstance(stored, dict):
+        return
+    for name, value in stored.items():
+        if not name or len(name) > MAX_INDEX_LENGTH:
+            continue
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        yield name, normalize_text(value), parse_numeric(value), parse_date(value)
+
+
+def backfill_field_index(apps, schema_editor):
+    DataEntryRecord = apps.get_model('dashboard', 'DataEntryRecord')
+    DataEntryFieldIndex = apps.get_model('dashboard', 'DataEntryFieldIndex')
+
+    rows = []
+    records = DataEntryRecord.objects.values_list('id', 'sub_department_id', 'field_values')
+    for record_id, sub_department_id, field_values in records.iterator(chunk_size=2000):
+        for name, text_value, numeric_value, date_value in field_index_values(field_values):
+            rows.append(DataEntryFieldIndex(
+                record_id=record_id,
+                sub_department_id=sub_department_id,
+                field_name=name,
+                text_value=text_value,
+                numeric_value=numeric_value,
+                date_value=date_value,
+            ))
+        if len(rows) >= 5000:
+            DataEntryFieldIndex.objects.bulk_create(rows)
+            rows = []
+    if rows:
+        DataEntryFieldIndex.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0025_activitylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataEntryFieldIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('text_value', models.CharField(blank=True, help_text='Lowercased, trimmed text of the value', max_length=255)),
+                ('numeric_value', models.FloatField(blank=True, null=True)),
+                ('date_value', models.DateField(blank=True, null=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_index', to='dashboard.dataentryrecord')),
+                ('sub_department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.subdepartment')),
+            ],
+            options={
+                'verbose_name': 'Data Entry Field Index',
+                'verbose_name_plural': 'Data Entry Field Index',
+                'indexes': [models.Index(fields=['sub_department', 'field_name', 'text_value', 'record'], name='dash_fieldidx_text'), models.Index(fields=['sub_department', 'field_name', 'numeric_value'], name='dash_fieldidx_numeric'), models.Index(fields=['sub_department', 'field_name', 'date_value'], name='dash_fieldidx_date')],
+                'unique_together': {('record', 'field_name')},
+            },
+        ),
+        migrations.RunPython(backfill_field_index, migrations.RunPython.noop),
+    ]
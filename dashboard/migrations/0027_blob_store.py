@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0026_dataentryfieldindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataentryfile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the contents in the blob store', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='logo',
+            name='logo_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='logo',
+            name='logo_size',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='logo',
+            name='logo_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='dataentryfile',
+            name='file_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='logo',
+            name='logo_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
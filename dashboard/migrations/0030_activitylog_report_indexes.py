@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+def backfill_filter_values(apps, schema_editor):
+    ActivityLog = apps.get_model('dashboard', 'ActivityLog')
+    ActivityLogFilterValue = apps.get_model('dashboard', 'ActivityLogFilterValue')
+
+    values = [ActivityLogFilterValue(kind='page', value=page)
+              for page in ActivityLog.objects.values_list('page', flat=True).distinct()]
+    values += [ActivityLogFilterValue(kind='model', value=model_name)
+               for model_name in ActivityLog.objects.exclude(model_name='').values_list('model_name', flat=True).distinct()]
+    ActivityLogFilterValue.objects.bulk_create(values, ignore_conflicts=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0029_activitylog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogFilterValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('page', 'Page'), ('model', 'Model')], max_length=10)),
+                ('value', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Activity Log Filter Value',
+                'verbose_name_plural': 'Activity Log Filter Values',
+                'ordering': ['kind', 'value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['created_at', 'id'], name='dash_log_created'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='dash_log_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['action', 'created_at', 'id'], name='dash_log_action_created'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='activitylogfiltervalue',
+            unique_together={('kind', 'value')},
+        ),
+        migrations.RunPython(backfill_filter_values, migrations.RunPython.noop),
+    ]
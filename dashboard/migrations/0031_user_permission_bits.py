@@ -0,0 +1,363 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:51
+
+import dashboard.models
+from django.db import migrations
+
+# The permissions in bit order as of this migration (dashboard.permissions.PERMISSIONS),
+# frozen so later additions there do not change what is packed here
+PERMISSION_NAMES = (
+    'can_access_data', 'can_access_data_entry', 'can_view_data_entry', 'can_create_data_entry',
+    'can_delete_data_entry', 'can_update_data_entry', 'can_access_data_edit', 'can_view_data_edit',
+    'can_create_data_edit', 'can_delete_data_edit', 'can_update_data_edit', 'can_access_enquiry',
+    'can_view_enquiry', 'can_create_enquiry', 'can_delete_enquiry', 'can_update_enquiry', 'can_access_setup',
+    'can_access_department', 'can_view_department', 'can_create_department', 'can_delete_department',
+    'can_update_department', 'can_access_sub_department', 'can_view_sub_department',
+    'can_create_sub_department', 'can_delete_sub_department', 'can_update_sub_department',
+    'can_access_division_branch', 'can_view_division_branch', 'can_create_division_branch',
+    'can_delete_division_branch', 'can_update_division_branch', 'can_access_branch_dep_link',
+    'can_view_branch_dep_link', 'can_create_branch_dep_link', 'can_delete_branch_dep_link',
+    'can_update_branch_dep_link', 'can_access_logo_upload', 'can_view_logo_upload', 'can_create_logo_upload',
+    'can_delete_logo_upload', 'can_update_logo_upload', 'can_access_bulk_upload', 'can_view_bulk_upload',
+    'can_create_bulk_upload', 'can_delete_bulk_upload', 'can_update_bulk_upload', 'can_access_user',
+    'can_access_users', 'can_view_users', 'can_create_users', 'can_delete_users', 'can_update_users',
+    'can_access_user_rights', 'can_view_user_rights', 'can_create_user_rights', 'can_delete_user_rights',
+    'can_update_user_rights', 'can_access_password_change', 'can_view_password_change',
+    'can_create_password_change', 'can_delete_password_change', 'can_update_password_change',
+    'can_access_report', 'can_access_log_report', 'can_view_log_report', 'can_create_log_report',
+    'can_delete_log_report', 'can_update_log_report', 'can_access_register', 'can_view_register',
+    'can_create_register', 'can_delete_register', 'can_update_register',
+)
+PERMISSION_BITS = {name: 1 << index for index, name in enumerate(PERMISSION_NAMES)}
+
+
+def pack_permissions(apps, schema_editor):
+    User = apps.get_model('dashboard', 'User')
+    for user in User.objects.only('id', *PERMISSION_BITS).iterator(chunk_size=500):
+        bits = 0
+        for name, bit in PERMISSION_BITS.items():
+            if getattr(user, name):
+                bits |= bit
+        # Stored as a hex string, the format of PermissionBitsField
+        User.objects.filter(id=user.id).update(permission_bits=format(bits, 'x'))
+
+
+def unpack_permissions(apps, schema_editor):
+    User = apps.get_model('dashboard', 'User')
+    for user in User.objects.only('id', 'permission_bits').iterator(chunk_size=500):
+        bits = user.permission_bits
+        bits = bits if isinstance(bits, int) else int(bits or '0', 16)
+        User.objects.filter(id=user.id).update(**{
+            name: bool(bits & bit) for name, bit in PERMISSION_BITS.items()
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0030_activitylog_report_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='permission_bits',
+            field=dashboard.models.PermissionBitsField(default=0, editable=False, max_length=32, verbose_name='page permissions'),
+        ),
+        migrations.RunPython(pack_permissions, unpack_permissions),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_branch_dep_link',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_bulk_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_data',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_data_edit',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_data_entry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_division_branch',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_enquiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_log_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_logo_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_password_change',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_register',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_setup',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_sub_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_user',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_user_rights',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_access_users',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_branch_dep_link',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_bulk_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_data_edit',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_data_entry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_division_branch',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_enquiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_log_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_logo_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_password_change',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_register',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_sub_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_user_rights',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_create_users',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_branch_dep_link',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_bulk_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_data_edit',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_data_entry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_division_branch',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_enquiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_log_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_logo_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_password_change',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_register',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_sub_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_user_rights',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_delete_users',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_branch_dep_link',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_bulk_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_data_edit',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_data_entry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_division_branch',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_enquiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_log_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_logo_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_password_change',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_register',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_sub_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_user_rights',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_update_users',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_branch_dep_link',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_bulk_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_data_edit',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_data_entry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_division_branch',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_enquiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_log_report',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_logo_upload',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_password_change',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_register',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_sub_department',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_user_rights',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='can_view_users',
+        ),
+    ]
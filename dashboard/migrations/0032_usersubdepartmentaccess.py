@@ -0,0 +1,62 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_access(apps, schema_editor):
+    UserSubDepartment = apps.get_model('dashboard', 'UserSubDepartment')
+    UserSubDepartmentAccess = apps.get_model('dashboard', 'UserSubDepartmentAccess')
+    DivisionBranch = apps.get_model('dashboard', 'DivisionBranch')
+    Department = apps.get_model('dashboard', 'Department')
+    SubDepartment = apps.get_model('dashboard', 'SubDepartment')
+
+    branch_ids = set(DivisionBranch.objects.values_list('id', flat=True))
+    department_ids = set(Department.objects.values_list('id', flat=True))
+    sub_department_ids = set(SubDepartment.objects.values_list('id', flat=True))
+
+    rows = []
+    for user_mappings in UserSubDepartment.objects.all():
+        triples = set()
+        for mapping in (user_mappings.mappings or {}).values():
+            try:
+                triple = (int(mapping['branch_id']), int(mapping['department_id']), int(mapping['subdepartment_id']))
+            except (KeyError, TypeError, ValueError):
+                continue
+            # Mappings may still point at rows that were deleted since
+            if triple[0] in branch_ids and triple[1] in department_ids and triple[2] in sub_department_ids:
+                triples.add(triple)
+        rows += [
+            UserSubDepartmentAccess(user_id=user_mappings.user_id, branch_id=branch_id,
+                                    department_id=department_id, sub_department_id=sub_department_id)
+            for branch_id, department_id, sub_department_id in sorted(triples)
+        ]
+    UserSubDepartmentAccess.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0031_user_permission_bits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSubDepartmentAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.divisionbranch')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.department')),
+                ('sub_department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.subdepartment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sub_department_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User SubDepartment Access',
+                'verbose_name_plural': 'User SubDepartment Access',
+                'indexes': [models.Index(fields=['user', 'sub_department'], name='dash_access_user_subdept'), models.Index(fields=['user', 'department'], name='dash_access_user_dept')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'branch', 'department', 'sub_department'), name='dash_access_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    DataEntryRecord = apps.get_model('dashboard', 'DataEntryRecord')
+    DataEntryRecordCount = apps.get_model('dashboard', 'DataEntryRecordCount')
+
+    totals = (DataEntryRecord.objects.order_by()
+              .values('branch_id', 'department_id', 'sub_department_id')
+              .annotate(total=models.Count('id')))
+    DataEntryRecordCount.objects.bulk_create([
+        DataEntryRecordCount(branch_id=row['branch_id'], department_id=row['department_id'],
+                             sub_department_id=row['sub_department_id'], count=row['total'])
+        for row in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0032_usersubdepartmentaccess'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataEntryRecordCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.divisionbranch')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.department')),
+                ('sub_department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.subdepartment')),
+            ],
+            options={
+                'verbose_name': 'Data Entry Record Count',
+                'verbose_name_plural': 'Data Entry Record Counts',
+                'unique_together': {('branch', 'department', 'sub_department')},
+            },
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
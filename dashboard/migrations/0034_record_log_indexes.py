@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0033_dataentryrecordcount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['page', 'created_at', 'id'], name='dash_log_page_created'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['model_name', 'created_at', 'id'], name='dash_log_model_created'),
+        ),
+        migrations.AddIndex(
+            model_name='dataentryrecord',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='dash_rec_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='dataentryrecord',
+            index=models.Index(fields=['user', 'branch', 'created_at', 'id'], name='dash_rec_user_branch'),
+        ),
+        migrations.AddIndex(
+            model_name='dataentryrecord',
+            index=models.Index(fields=['user', 'department', 'created_at', 'id'], name='dash_rec_user_dept'),
+        ),
+        migrations.AddIndex(
+            model_name='dataentryrecord',
+            index=models.Index(fields=['user', 'sub_department', 'created_at', 'id'], name='dash_rec_user_subdept'),
+        ),
+    ]
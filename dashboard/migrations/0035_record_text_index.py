@@ -0,0 +1,97 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:41
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+# Frozen copy of the dashboard.text_search index definitions as of this
+# migration, so later changes to the app code do not change what it creates
+TEXT_INDEX_TABLE = 'dashboard_record_text'
+
+
+def create_sql(vendor, record_table):
+    if vendor == 'sqlite':
+        return [
+            f"CREATE VIRTUAL TABLE {TEXT_INDEX_TABLE} USING fts5(field_values, scope_names, "
+            f"tokenize='unicode61 remove_diacritics 2')",
+        ]
+    if vendor == 'postgresql':
+        return [
+            f'CREATE TABLE {TEXT_INDEX_TABLE} ('
+            f'record_id bigint PRIMARY KEY REFERENCES {record_table} (id) '
+            f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'document tsvector NOT NULL)',
+            f'CREATE INDEX {TEXT_INDEX_TABLE}_document ON {TEXT_INDEX_TABLE} USING GIN (document)',
+        ]
+    return []
+
+
+def insert_documents(vendor, cursor, documents):
+    if vendor == 'sqlite':
+        cursor.executemany(f'INSERT INTO {TEXT_INDEX_TABLE} (rowid, field_values, scope_names) VALUES (%s, %s, %s)',
+                           documents)
+    else:
+        cursor.executemany(
+            f"INSERT INTO {TEXT_INDEX_TABLE} (record_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B'))",
+            documents)
+
+
+def record_document(field_values, names):
+    values = []
+    if field_values:
+        stored = json.loads(json.dumps(field_values, cls=DjangoJSONEncoder))
+        if isinstance(stored, dict):
+            values = [str(value) for value in stored.values() if value not in (None, '')]
+    return ' '.join(values), ' '.join(name for name in names if name)
+
+
+def create_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    DataEntryRecord = apps.get_model('dashboard', 'DataEntryRecord')
+    statements = create_sql(vendor, DataEntryRecord._meta.db_table)
+    if not statements:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+    names = {
+        model_name: dict(apps.get_model('dashboard', model_name).objects.values_list('id', 'name'))
+        for model_name in ('DivisionBranch', 'Department', 'SubDepartment')
+    }
+    records = DataEntryRecord.objects.values_list('id', 'branch_id', 'department_id', 'sub_department_id', 'field_values')
+    documents = []
+    with schema_editor.connection.cursor() as cursor:
+        for record_id, branch_id, department_id, sub_department_id, field_values in records.iterator(chunk_size=2000):
+            documents.append((record_id, *record_document(field_values, (
+                names['DivisionBranch'].get(branch_id, ''),
+                names['Department'].get(department_id, ''),
+                names['SubDepartment'].get(sub_department_id, ''),
+            ))))
+            if len(documents) >= 2000:
+                insert_documents(vendor, cursor, documents)
+                documents = []
+        if documents:
+            insert_documents(vendor, cursor, documents)
+
+
+def drop_text_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TEXT_INDEX_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0034_record_log_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('bulk_upload', 'Bulk Upload'), ('text_reindex', 'Full-Text Reindex')], max_length=50),
+        ),
+        migrations.RunPython(create_text_index, drop_text_index),
+    ]
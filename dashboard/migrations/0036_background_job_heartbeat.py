@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0035_record_text_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='attempts',
+            field=models.IntegerField(default=0, help_text='Number of times a worker claimed the job'),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='checkpoint',
+            field=models.IntegerField(blank=True, help_text="Position up to which the job's work is committed; a requeued job resumes after it", null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life of the worker running the job', null=True),
+        ),
+    ]
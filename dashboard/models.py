@@ -1,9 +1,35 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
+from io import BytesIO
+from .storage import get_blob_store
+from .permissions import PERMISSION_BITS, PERMISSION_LABELS, PERMISSION_NAMES, decode_page_tree, unpack
+
+class PermissionBitsField(models.CharField):
+    """
+    Stores a permission bitmask as a hex string: it has more bits than a
+    64-bit integer column holds. Python code always sees an int.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 32)
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return int(value, 16) if value else 0
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return value
+        return int(value, 16) if value else 0
+
+    def get_prep_value(self, value):
+        return format(self.to_python(value), 'x')
 
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
@@ -68,87 +94,9 @@ class User(AbstractUser):
     date_joined = models.DateTimeField(_('date joined'), auto_now_add=True)
     last_login = models.DateTimeField(_('last login'), auto_now=True)
 
-    # Data Management Permissions
-    can_access_data = models.BooleanField(default=False, verbose_name="Access Data Management")
-    can_access_data_entry = models.BooleanField(default=False, verbose_name="Access Data Entry")
-    can_view_data_entry = models.BooleanField(default=False, verbose_name="View Data Entry")
-    can_create_data_entry = models.BooleanField(default=False, verbose_name="Create Data Entry")
-    can_delete_data_entry = models.BooleanField(default=False, verbose_name="Delete Data Entry")
-    can_update_data_entry = models.BooleanField(default=False, verbose_name="Update Data Entry")
-    can_access_data_edit = models.BooleanField(default=False, verbose_name="Access Data Edit")
-    can_view_data_edit = models.BooleanField(default=False, verbose_name="View Data Edit")
-    can_create_data_edit = models.BooleanField(default=False, verbose_name="Create Data Edit")
-    can_delete_data_edit = models.BooleanField(default=False, verbose_name="Delete Data Edit")
-    can_update_data_edit = models.BooleanField(default=False, verbose_name="Update Data Edit")
-    can_access_enquiry = models.BooleanField(default=False, verbose_name="Access Enquiry")
-    can_view_enquiry = models.BooleanField(default=False, verbose_name="View Enquiry")
-    can_create_enquiry = models.BooleanField(default=False, verbose_name="Create Enquiry")
-    can_delete_enquiry = models.BooleanField(default=False, verbose_name="Delete Enquiry")
-    can_update_enquiry = models.BooleanField(default=False, verbose_name="Update Enquiry")
-
-    # Setup Permissions
-    can_access_setup = models.BooleanField(default=False, verbose_name="Access Setup")
-    can_access_department = models.BooleanField(default=False, verbose_name="Access Department")
-    can_view_department = models.BooleanField(default=False, verbose_name="View Department")
-    can_create_department = models.BooleanField(default=False, verbose_name="Create Department")
-    can_delete_department = models.BooleanField(default=False, verbose_name="Delete Department")
-    can_update_department = models.BooleanField(default=False, verbose_name="Update Department")
-    can_access_sub_department = models.BooleanField(default=False, verbose_name="Access Sub Department")
-    can_view_sub_department = models.BooleanField(default=False, verbose_name="View Sub Department")
-    can_create_sub_department = models.BooleanField(default=False, verbose_name="Create Sub Department")
-    can_delete_sub_department = models.BooleanField(default=False, verbose_name="Delete Sub Department")
-    can_update_sub_department = models.BooleanField(default=False, verbose_name="Update Sub Department")
-    can_access_division_branch = models.BooleanField(default=False, verbose_name="Access Division Branch")
-    can_view_division_branch = models.BooleanField(default=False, verbose_name="View Division Branch")
-    can_create_division_branch = models.BooleanField(default=False, verbose_name="Create Division Branch")
-    can_delete_division_branch = models.BooleanField(default=False, verbose_name="Delete Division Branch")
-    can_update_division_branch = models.BooleanField(default=False, verbose_name="Update Division Branch")
-    can_access_branch_dep_link = models.BooleanField(default=False, verbose_name="Access Branch Department Link")
-    can_view_branch_dep_link = models.BooleanField(default=False, verbose_name="View Branch Department Link")
-    can_create_branch_dep_link = models.BooleanField(default=False, verbose_name="Create Branch Department Link")
-    can_delete_branch_dep_link = models.BooleanField(default=False, verbose_name="Delete Branch Department Link")
-    can_update_branch_dep_link = models.BooleanField(default=False, verbose_name="Update Branch Department Link")
-    can_access_logo_upload = models.BooleanField(default=False, verbose_name="Access Logo Upload")
-    can_view_logo_upload = models.BooleanField(default=False, verbose_name="View Logo Upload")
-    can_create_logo_upload = models.BooleanField(default=False, verbose_name="Create Logo Upload")
-    can_delete_logo_upload = models.BooleanField(default=False, verbose_name="Delete Logo Upload")
-    can_update_logo_upload = models.BooleanField(default=False, verbose_name="Update Logo Upload")
-    can_access_bulk_upload = models.BooleanField(default=False, verbose_name="Access Bulk Upload")
-    can_view_bulk_upload = models.BooleanField(default=False, verbose_name="View Bulk Upload")
-    can_create_bulk_upload = models.BooleanField(default=False, verbose_name="Create Bulk Upload")
-    can_delete_bulk_upload = models.BooleanField(default=False, verbose_name="Delete Bulk Upload")
-    can_update_bulk_upload = models.BooleanField(default=False, verbose_name="Update Bulk Upload")
-
-    # User Management Permissions
-    can_access_user = models.BooleanField(default=False, verbose_name="Access User Management")
-    can_access_users = models.BooleanField(default=False, verbose_name="Access Users")
-    can_view_users = models.BooleanField(default=False, verbose_name="View Users")
-    can_create_users = models.BooleanField(default=False, verbose_name="Create Users")
-    can_delete_users = models.BooleanField(default=False, verbose_name="Delete Users")
-    can_update_users = models.BooleanField(default=False, verbose_name="Update Users")
-    can_access_user_rights = models.BooleanField(default=False, verbose_name="Access User Rights")
-    can_view_user_rights = models.BooleanField(default=False, verbose_name="View User Rights")
-    can_create_user_rights = models.BooleanField(default=False, verbose_name="Create User Rights")
-    can_delete_user_rights = models.BooleanField(default=False, verbose_name="Delete User Rights")
-    can_update_user_rights = models.BooleanField(default=False, verbose_name="Update User Rights")
-    can_access_password_change = models.BooleanField(default=False, verbose_name="Access Password Change")
-    can_view_password_change = models.BooleanField(default=False, verbose_name="View Password Change")
-    can_create_password_change = models.BooleanField(default=False, verbose_name="Create Password Change")
-    can_delete_password_change = models.BooleanField(default=False, verbose_name="Delete Password Change")
-    can_update_password_change = models.BooleanField(default=False, verbose_name="Update Password Change")
-
-    # Report Permissions
-    can_access_report = models.BooleanField(default=False, verbose_name="Access Reports")
-    can_access_log_report = models.BooleanField(default=False, verbose_name="Access Log Report")
-    can_view_log_report = models.BooleanField(default=False, verbose_name="View Log Report")
-    can_create_log_report = models.BooleanField(default=False, verbose_name="Create Log Report")
-    can_delete_log_report = models.BooleanField(default=False, verbose_name="Delete Log Report")
-    can_update_log_report = models.BooleanField(default=False, verbose_name="Update Log Report")
-    can_access_register = models.BooleanField(default=False, verbose_name="Access Register")
-    can_view_register = models.BooleanField(default=False, verbose_name="View Register")
-    can_create_register = models.BooleanField(default=False, verbose_name="Create Register")
-    can_delete_register = models.BooleanField(default=False, verbose_name="Delete Register")
-    can_update_register = models.BooleanField(default=False, verbose_name="Update Register")
+    # Page permissions, one bit per name in permissions.PERMISSIONS; read and
+    # written through has()/set_permission() or the can_* attributes
+    permission_bits = PermissionBitsField(_('page permissions'))
 
     objects = UserManager()
 
@@ -268,154 +216,32 @@ class User(AbstractUser):
         return self.first_name
 
     def get_page_permissions(self):
-        return {
-            'data_management': {
-                'access': self.can_access_data,
-                'pages': {
-                    'data_entry': {
-                        'access': self.can_access_data_entry,
-                        'permissions': {
-                            'view': self.can_view_data_entry,
-                            'create': self.can_create_data_entry,
-                            'delete': self.can_delete_data_entry,
-                            'update': self.can_update_data_entry
-                        }
-                    },
-                    'data_edit': {
-                        'access': self.can_access_data_edit,
-                        'permissions': {
-                            'view': self.can_view_data_edit,
-                            'create': self.can_create_data_edit,
-                            'delete': self.can_delete_data_edit,
-                            'update': self.can_update_data_edit
-                        }
-                    },
-                    'enquiry': {
-                        'access': self.can_access_enquiry,
-                        'permissions': {
-                            'view': self.can_view_enquiry,
-                            'create': self.can_create_enquiry,
-                            'delete': self.can_delete_enquiry,
-                            'update': self.can_update_enquiry
-                        }
-                    }
-                }
-            },
-            'setup': {
-                'access': self.can_access_setup,
-                'pages': {
-                    'department': {
-                        'access': self.can_access_department,
-                        'permissions': {
-                            'view': self.can_view_department,
-                            'create': self.can_create_department,
-                            'delete': self.can_delete_department,
-                            'update': self.can_update_department
-                        }
-                    },
-                    'sub_department': {
-                        'access': self.can_access_sub_department,
-                        'permissions': {
-                            'view': self.can_view_sub_department,
-                            'create': self.can_create_sub_department,
-                            'delete': self.can_delete_sub_department,
-                            'update': self.can_update_sub_department
-                        }
-                    },
-                    'division_branch': {
-                        'access': self.can_access_division_branch,
-                        'permissions': {
-                            'view': self.can_view_division_branch,
-                            'create': self.can_create_division_branch,
-                            'delete': self.can_delete_division_branch,
-                            'update': self.can_update_division_branch
-                        }
-                    },
-                    'branch_dep_link': {
-                        'access': self.can_access_branch_dep_link,
-                        'permissions': {
-                            'view': self.can_view_branch_dep_link,
-                            'create': self.can_create_branch_dep_link,
-                            'delete': self.can_delete_branch_dep_link,
-                            'update': self.can_update_branch_dep_link
-                        }
-                    },
-                    'logo_upload': {
-                        'access': self.can_access_logo_upload,
-                        'permissions': {
-                            'view': self.can_view_logo_upload,
-                            'create': self.can_create_logo_upload,
-                            'delete': self.can_delete_logo_upload,
-                            'update': self.can_update_logo_upload
-                        }
-                    },
-                    'bulk_upload': {
-                        'access': self.can_access_bulk_upload,
-                        'permissions': {
-                            'view': self.can_view_bulk_upload,
-                            'create': self.can_create_bulk_upload,
-                            'delete': self.can_delete_bulk_upload,
-                            'update': self.can_update_bulk_upload
-                        }
-                    }
-                }
-            },
-            'user_management': {
-                'access': self.can_access_user,
-                'pages': {
-                    'users': {
-                        'access': self.can_access_users,
-                        'permissions': {
-                            'view': self.can_view_users,
-                            'create': self.can_create_users,
-                            'delete': self.can_delete_users,
-                            'update': self.can_update_users
-                        }
-                    },
-                    'user_rights': {
-                        'access': self.can_access_user_rights,
-                        'permissions': {
-                            'view': self.can_view_user_rights,
-                            'create': self.can_create_user_rights,
-                            'delete': self.can_delete_user_rights,
-                            'update': self.can_update_user_rights
-                        }
-                    },
-                    'password_change': {
-                        'access': self.can_access_password_change,
-                        'permissions': {
-                            'view': self.can_view_password_change,
-                            'create': self.can_create_password_change,
-                            'delete': self.can_delete_password_change,
-                            'update': self.can_update_password_change
-                        }
-                    }
-                }
-            },
-            'reports': {
-                'access': self.can_access_report,
-                'pages': {
-                    'log_report': {
-                        'access': self.can_access_log_report,
-                        'permissions': {
-                            'view': self.can_view_log_report,
-                            'create': self.can_create_log_report,
-                            'delete': self.can_delete_log_report,
-                            'update': self.can_update_log_report
-                        }
-                    },
-                    'register': {
-                        'access': self.can_access_register,
-                        'permissions': {
-                            'view': self.can_view_register,
-                            'create': self.can_create_register,
-                            'delete': self.can_delete_register,
-                            'update': self.can_update_register
-                        }
-                    }
-                }
-            }
-        }
+        return decode_page_tree(self.permission_bits)
+
+    def has(self, perm):
+        """Return whether the user holds the can_* permission perm."""
+        return bool(self.permission_bits & PERMISSION_BITS[perm])
+
+    def set_permission(self, perm, value=True):
+        if value:
+            self.permission_bits |= PERMISSION_BITS[perm]
+        else:
+            self.permission_bits &= ~PERMISSION_BITS[perm]
+
+    def permission_names(self):
+        """Names of the can_* permissions the user holds."""
+        return unpack(self.permission_bits)
+
+def _permission_property(name):
+    return property(
+        lambda self: self.has(name),
+        lambda self, value: self.set_permission(name, value),
+        doc=PERMISSION_LABELS[name],
+    )
+
+# Keep user.can_* working for views, serializers and templates
+for _name in PERMISSION_NAMES:
+    setattr(User, _name, _permission_property(_name))
 
 class Department(models.Model):
     department_id = models.CharField(max_length=50, unique=True, help_text="Unique identifier for the department")
@@ -482,13 +308,30 @@ class BranchDepartmentLink(models.Model):
 class Logo(models.Model):
     name = models.CharField(max_length=255)
     organization_name = models.CharField(max_length=255)
-    logo_data = models.BinaryField()
+    # Legacy in-database copy, emptied by the migrate_blobs command
+    logo_data = models.BinaryField(null=True, blank=True)
+    logo_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    logo_size = models.IntegerField(default=0)
+    logo_type = models.CharField(max_length=100, blank=True)
     is_active = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_logos')
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='updated_logos')
 
+    def set_logo(self, content, content_type=''):
+        """Write the logo image to the blob store and point this row at it."""
+        self.logo_sha256, self.logo_size = get_blob_store().save(content)
+        self.logo_type = content_type
+        self.logo_data = None
+
+    def read_logo(self):
+        """Return the logo image bytes."""
+        if self.logo_sha256:
+            with get_blob_store().open(self.logo_sha256) as f:
+                return f.read()
+        return bytes(self.logo_data or b'')
+
     def save(self, *args, **kwargs):
         if self.is_active:
             # Deactivate all other logos
@@ -544,6 +387,86 @@ class UserSubDepartment(models.Model):
         self.mappings = {}
         self.save()
 
+    @staticmethod
+    def build_mappings(triples):
+        """Builds the mappings JSON for (branch_id, department_id, subdepartment_id) tuples"""
+        return {
+            f"{branch_id}_{department_id}_{subdepartment_id}": {
+                'branch_id': branch_id,
+                'department_id': department_id,
+                'subdepartment_id': subdepartment_id
+            }
+            for branch_id, department_id, subdepartment_id in triples
+        }
+
+    def mapping_triples(self):
+        """The (branch_id, department_id, subdepartment_id) tuples of the mappings."""
+        return [
+            (mapping.get('branch_id'), mapping.get('department_id'), mapping.get('subdepartment_id'))
+            for mapping in self.get_mappings().values()
+        ]
+
+    def sync_access(self):
+        """Rebuild the user's UserSubDepartmentAccess rows from the JSON mappings."""
+        UserSubDepartmentAccess.objects.replace_for_user(self.user_id, self.mapping_triples())
+
+class UserSubDepartmentAccessManager(models.Manager):
+    def valid_triples(self, triples):
+        """
+        Coerce (branch, department, sub_department) ids to ints and keep the
+        triples whose branch, department and sub-department all exist.
+        """
+        cleaned = set()
+        for triple in triples:
+            try:
+                cleaned.add(tuple(int(value) for value in triple))
+            except (TypeError, ValueError):
+                continue
+        if not cleaned:
+            return []
+        branch_ids = set(DivisionBranch.objects.filter(id__in={t[0] for t in cleaned}).values_list('id', flat=True))
+        department_ids = set(Department.objects.filter(id__in={t[1] for t in cleaned}).values_list('id', flat=True))
+        sub_department_ids = set(SubDepartment.objects.filter(id__in={t[2] for t in cleaned}).values_list('id', flat=True))
+        return sorted(t for t in cleaned if t[0] in branch_ids and t[1] in department_ids and t[2] in sub_department_ids)
+
+    def add_for_user(self, user_id, triples):
+        self.bulk_create([
+            self.model(user_id=user_id, branch_id=branch_id, department_id=department_id, sub_department_id=sub_department_id)
+            for branch_id, department_id, sub_department_id in self.valid_triples(triples)
+        ], ignore_conflicts=True)
+
+    def replace_for_user(self, user_id, triples):
+        self.filter(user_id=user_id).delete()
+        self.add_for_user(user_id, triples)
+
+class UserSubDepartmentAccess(models.Model):
+    """
+    Relational copy of UserSubDepartment.mappings: one row per (branch,
+    department, sub-department) a user may work with. Rebuilt whenever the
+    UserSubDepartment row is saved and used for access checks and scoping.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sub_department_access')
+    branch = models.ForeignKey(DivisionBranch, on_delete=models.CASCADE, related_name='+')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='+')
+    sub_department = models.ForeignKey(SubDepartment, on_delete=models.CASCADE, related_name='+')
+
+    objects = UserSubDepartmentAccessManager()
+
+    class Meta:
+        verbose_name = 'User SubDepartment Access'
+        verbose_name_plural = 'User SubDepartment Access'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'branch', 'department', 'sub_department'],
+                                    name='dash_access_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'sub_department'], name='dash_access_user_subdept'),
+            models.Index(fields=['user', 'department'], name='dash_access_user_dept'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.branch_id}/{self.department_id}/{self.sub_department_id}"
+
 class DataEntryRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_entries')
     branch = models.ForeignKey('DivisionBranch', on_delete=models.CASCADE)
@@ -557,15 +480,61 @@ class DataEntryRecord(models.Model):
         verbose_name = 'Data Entry Record'
         verbose_name_plural = 'Data Entry Records'
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first lists of a user's records, unfiltered and filtered by branch, department or sub-department
+            models.Index(fields=['user', 'created_at', 'id'], name='dash_rec_user_created'),
+            models.Index(fields=['user', 'branch', 'created_at', 'id'], name='dash_rec_user_branch'),
+            models.Index(fields=['user', 'department', 'created_at', 'id'], name='dash_rec_user_dept'),
+            models.Index(fields=['user', 'sub_department', 'created_at', 'id'], name='dash_rec_user_subdept'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.sub_department.name} - {self.created_at}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the record was counted, for DataEntryRecordCount
+        loaded = dict(zip(field_names, values))
+        if {'branch_id', 'department_id', 'sub_department_id'} <= loaded.keys():
+            instance._counted_scope = (loaded['branch_id'], loaded['department_id'], loaded['sub_department_id'])
+        return instance
+
+    def counter_key(self):
+        return (self.branch_id, self.department_id, self.sub_department_id)
+
+    # The post_save/post_delete handlers keep DataEntryRecordCount in step, inside the same transaction
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+class DataEntryRecordCount(models.Model):
+    """Number of DataEntryRecords per (branch, department, sub_department), kept up to date on write."""
+    branch = models.ForeignKey('DivisionBranch', on_delete=models.CASCADE, related_name='+')
+    department = models.ForeignKey('Department', on_delete=models.CASCADE, related_name='+')
+    sub_department = models.ForeignKey('SubDepartment', on_delete=models.CASCADE, related_name='+')
+    count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Data Entry Record Count'
+        verbose_name_plural = 'Data Entry Record Counts'
+        unique_together = [('branch', 'department', 'sub_department')]
+
+    def __str__(self):
+        return f"{self.branch_id}/{self.department_id}/{self.sub_department_id}: {self.count}"
+
 class DataEntryFile(models.Model):
     record = models.ForeignKey(DataEntryRecord, on_delete=models.CASCADE, related_name='files')
     file_name = models.CharField(max_length=255)
     file_type = models.CharField(max_length=100)
-    file_data = models.BinaryField()
+    # Legacy in-database copy, emptied by the migrate_blobs command
+    file_data = models.BinaryField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the contents in the blob store")
     file_size = models.IntegerField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -577,6 +546,40 @@ class DataEntryFile(models.Model):
     def __str__(self):
         return self.file_name
 
+    @classmethod
+    def from_content(cls, record, file_name, file_type, content):
+        """Write content to the blob store and return an unsaved file row for it."""
+        sha256, size = get_blob_store().save(content)
+        return cls(record=record, file_name=file_name, file_type=file_type, sha256=sha256, file_size=size)
+
+    def open(self):
+        """Open the file contents for reading."""
+        if self.sha256:
+            return get_blob_store().open(self.sha256)
+        return BytesIO(bytes(self.file_data or b''))
+
+class DataEntryFieldIndex(models.Model):
+    """Typed, indexed copy of a single DataEntryRecord.field_values entry used by search."""
+    record = models.ForeignKey(DataEntryRecord, on_delete=models.CASCADE, related_name='field_index')
+    sub_department = models.ForeignKey('SubDepartment', on_delete=models.CASCADE, related_name='+')
+    field_name = models.CharField(max_length=255)
+    text_value = models.CharField(max_length=255, blank=True, help_text="Lowercased, trimmed text of the value")
+    numeric_value = models.FloatField(null=True, blank=True)
+    date_value = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Data Entry Field Index'
+        verbose_name_plural = 'Data Entry Field Index'
+        unique_together = [('record', 'field_name')]
+        indexes = [
+            models.Index(fields=['sub_department', 'field_name', 'text_value', 'record'], name='dash_fieldidx_text'),
+            models.Index(fields=['sub_department', 'field_name', 'numeric_value'], name='dash_fieldidx_numeric'),
+            models.Index(fields=['sub_department', 'field_name', 'date_value'], name='dash_fieldidx_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.record_id} - {self.field_name}"
+
 class ActivityLog(models.Model):
     ACTION_TYPES = (
         ('view', 'View'),
@@ -595,12 +598,108 @@ class ActivityLog(models.Model):
     details = models.JSONField(default=dict, help_text="Additional details about the action")
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is made, not when a buffered writer inserts it
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = 'Activity Log'
         verbose_name_plural = 'Activity Logs'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages of the log report, unfiltered and filtered by user, action, page or model
+            models.Index(fields=['created_at', 'id'], name='dash_log_created'),
+            models.Index(fields=['user', 'created_at', 'id'], name='dash_log_user_created'),
+            models.Index(fields=['action', 'created_at', 'id'], name='dash_log_action_created'),
+            models.Index(fields=['page', 'created_at', 'id'], name='dash_log_page_created'),
+            models.Index(fields=['model_name', 'created_at', 'id'], name='dash_log_model_created'),
+        ]
 
     def __str__(self):
         return f"{self.user.username if self.user else 'Anonymous'} - {self.action} - {self.model_name} - {self.created_at}"
+
+class ActivityLogFilterValue(models.Model):
+    """Distinct page and model names seen in ActivityLog, listed in the log report filters."""
+    KIND_CHOICES = (
+        ('page', 'Page'),
+        ('model', 'Model'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name = 'Activity Log Filter Value'
+        verbose_name_plural = 'Activity Log Filter Values'
+        unique_together = [('kind', 'value')]
+        ordering = ['kind', 'value']
+
+    def __str__(self):
+        return f"{self.kind}: {self.value}"
+
+class BackgroundJob(models.Model):
+    """A unit of work queued in the database and executed by the run_jobs worker."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    KIND_CHOICES = (
+        ('bulk_upload', 'Bulk Upload'),
+        ('text_reindex', 'Full-Text Reindex'),
+    )
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='background_jobs')
+    payload = models.JSONField(default=dict, help_text="Input of the job handler")
+    total = models.IntegerField(default=0, help_text="Number of items to process, once known")
+    processed = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, help_text="Per-item error messages")
+    result = models.JSONField(default=dict, help_text="Final output of the job handler")
+    message = models.TextField(blank=True, help_text="Reason the job failed")
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last sign of life of the worker running the job")
+    attempts = models.IntegerField(default=0, help_text="Number of times a worker claimed the job")
+    checkpoint = models.IntegerField(null=True, blank=True,
+                                     help_text="Position up to which the job's work is committed; a requeued job resumes after it")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='dash_job_status_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} - {self.status}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def as_dict(self):
+        """Status representation returned by the job polling endpoints."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'progress': round(100 * self.processed / self.total) if self.total else (100 if self.is_finished else 0),
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'result': self.result,
+            'message': self.message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def encode_cursor(created_at, pk, direction):
+    """Encode a (created_at, id) position into an opaque URL-safe token."""
+    payload = json.dumps({'c': created_at.isoformat(), 'i': pk, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor into (created_at, id, direction)."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        created_at = datetime.fromisoformat(payload['c'])
+        pk = int(payload['i'])
+        direction = payload['d']
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise NotFound('Invalid cursor')
+    if direction not in ('next', 'prev'):
+        raise NotFound('Invalid cursor')
+    return created_at, pk, direction
+
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    """
+    Return one page of queryset ordered newest first by (created_at, id).
+
+    The page is located with a WHERE on the (created_at, id) position in the
+    cursor instead of an OFFSET, so every page costs the same as the first.
+    Returns (items, next_cursor, previous_cursor).
+    """
+    direction = 'next'
+    if cursor:
+        created_at, pk, direction = decode_cursor(cursor)
+        if direction == 'next':
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        else:
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+
+    if direction == 'next':
+        items = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        has_next, has_previous = has_more, bool(cursor)
+    else:
+        items = list(queryset.order_by('created_at', 'id')[:page_size + 1])
+        has_more = len(items) > page_size
+        items = list(reversed(items[:page_size]))
+        has_next, has_previous = True, has_more
+
+    next_cursor = None
+    previous_cursor = None
+    if items and has_next:
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].pk, 'next')
+    if items and has_previous:
+        previous_cursor = encode_cursor(items[0].created_at, items[0].pk, 'prev')
+    return items, next_cursor, previous_cursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (created_at, id) with opaque next/previous tokens.
+    The exact total is only computed when ?include_count=true is passed.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'per_page'
+    count_query_param = 'include_count'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() == 'true':
+            self.count = queryset.count()
+        cursor = request.query_params.get(self.cursor_query_param) or None
+        items, self.next_cursor, self.previous_cursor = keyset_page(queryset, cursor, self.get_page_size(request))
+        return items
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'results': data,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
@@ -0,0 +1,149 @@
+"""
+Packed representation of the User.can_* page permissions.
+
+Each permission owns one bit of User.permission_bits. Bit numbers are stored
+in the database, so new permissions must only ever be appended to PERMISSIONS.
+"""
+
+# (name, label) in bit order
+PERMISSIONS = (
+    ('can_access_data', 'Access Data Management'),
+    ('can_access_data_entry', 'Access Data Entry'),
+    ('can_view_data_entry', 'View Data Entry'),
+    ('can_create_data_entry', 'Create Data Entry'),
+    ('can_delete_data_entry', 'Delete Data Entry'),
+    ('can_update_data_entry', 'Update Data Entry'),
+    ('can_access_data_edit', 'Access Data Edit'),
+    ('can_view_data_edit', 'View Data Edit'),
+    ('can_create_data_edit', 'Create Data Edit'),
+    ('can_delete_data_edit', 'Delete Data Edit'),
+    ('can_update_data_edit', 'Update Data Edit'),
+    ('can_access_enquiry', 'Access Enquiry'),
+    ('can_view_enquiry', 'View Enquiry'),
+    ('can_create_enquiry', 'Create Enquiry'),
+    ('can_delete_enquiry', 'Delete Enquiry'),
+    ('can_update_enquiry', 'Update Enquiry'),
+    ('can_access_setup', 'Access Setup'),
+    ('can_access_department', 'Access Department'),
+    ('can_view_department', 'View Department'),
+    ('can_create_department', 'Create Department'),
+    ('can_delete_department', 'Delete Department'),
+    ('can_update_department', 'Update Department'),
+    ('can_access_sub_department', 'Access Sub Department'),
+    ('can_view_sub_department', 'View Sub Department'),
+    ('can_create_sub_department', 'Create Sub Department'),
+    ('can_delete_sub_department', 'Delete Sub Department'),
+    ('can_update_sub_department', 'Update Sub Department'),
+    ('can_access_division_branch', 'Access Division Branch'),
+    ('can_view_division_branch', 'View Division Branch'),
+    ('can_create_division_branch', 'Create Division Branch'),
+    ('can_delete_division_branch', 'Delete Division Branch'),
+    ('can_update_division_branch', 'Update Division Branch'),
+    ('can_access_branch_dep_link', 'Access Branch Department Link'),
+    ('can_view_branch_dep_link', 'View Branch Department Link'),
+    ('can_create_branch_dep_link', 'Create Branch Department Link'),
+    ('can_delete_branch_dep_link', 'Delete Branch Department Link'),
+    ('can_update_branch_dep_link', 'Update Branch Department Link'),
+    ('can_access_logo_upload', 'Access Logo Upload'),
+    ('can_view_logo_upload', 'View Logo Upload'),
+    ('can_create_logo_upload', 'Create Logo Upload'),
+    ('can_delete_logo_upload', 'Delete Logo Upload'),
+    ('can_update_logo_upload', 'Update Logo Upload'),
+    ('can_access_bulk_upload', 'Access Bulk Upload'),
+    ('can_view_bulk_upload', 'View Bulk Upload'),
+    ('can_create_bulk_upload', 'Create Bulk Upload'),
+    ('can_delete_bulk_upload', 'Delete Bulk Upload'),
+    ('can_update_bulk_upload', 'Update Bulk Upload'),
+    ('can_access_user', 'Access User Management'),
+    ('can_access_users', 'Access Users'),
+    ('can_view_users', 'View Users'),
+    ('can_create_users', 'Create Users'),
+    ('can_delete_users', 'Delete Users'),
+    ('can_update_users', 'Update Users'),
+    ('can_access_user_rights', 'Access User Rights'),
+    ('can_view_user_rights', 'View User Rights'),
+    ('can_create_user_rights', 'Create User Rights'),
+    ('can_delete_user_rights', 'Delete User Rights'),
+    ('can_update_user_rights', 'Update User Rights'),
+    ('can_access_password_change', 'Access Password Change'),
+    ('can_view_password_change', 'View Password Change'),
+    ('can_create_password_change', 'Create Password Change'),
+    ('can_delete_password_change', 'Delete Password Change'),
+    ('can_update_password_change', 'Update Password Change'),
+    ('can_access_report', 'Access Reports'),
+    ('can_access_log_report', 'Access Log Report'),
+    ('can_view_log_report', 'View Log Report'),
+    ('can_create_log_report', 'Create Log Report'),
+    ('can_delete_log_report', 'Delete Log Report'),
+    ('can_update_log_report', 'Update Log Report'),
+    ('can_access_register', 'Access Register'),
+    ('can_view_register', 'View Register'),
+    ('can_create_register', 'Create Register'),
+    ('can_delete_register', 'Delete Register'),
+    ('can_update_register', 'Update Register'),
+)
+
+PERMISSION_NAMES = tuple(name for name, label in PERMISSIONS)
+PERMISSION_LABELS = dict(PERMISSIONS)
+PERMISSION_BITS = {name: 1 << index for index, name in enumerate(PERMISSION_NAMES)}
+ALL_PERMISSIONS = (1 << len(PERMISSIONS)) - 1
+
+# Menu sections of get_page_permissions: (section, access permission, pages)
+PAGE_SECTIONS = (
+    ('data_management', 'can_access_data', ('data_entry', 'data_edit', 'enquiry')),
+    ('setup', 'can_access_setup', ('department', 'sub_department', 'division_branch',
+                                   'branch_dep_link', 'logo_upload', 'bulk_upload')),
+    ('user_management', 'can_access_user', ('users', 'user_rights', 'password_change')),
+    ('reports', 'can_access_report', ('log_report', 'register')),
+)
+PAGE_ACTIONS = ('view', 'create', 'delete', 'update')
+
+
+def _compile_page_tree():
+    """Flatten PAGE_SECTIONS into bit positions so decoding is a single pass over a list of flags."""
+    index = {name: position for position, name in enumerate(PERMISSION_NAMES)}
+    compiled = []
+    for section, access, pages in PAGE_SECTIONS:
+        compiled.append((section, index[access], tuple(
+            (page, index[f'can_access_{page}'], tuple((action, index[f'can_{action}_{page}']) for action in PAGE_ACTIONS))
+            for page in pages
+        )))
+    return tuple(compiled)
+
+
+PAGE_TREE = _compile_page_tree()
+
+
+def pack(names):
+    """Return the bitmask with the bits of the given permission names set; unknown names are ignored."""
+    bits = 0
+    for name in names:
+        bits |= PERMISSION_BITS.get(name, 0)
+    return bits
+
+
+def unpack(bits):
+    """Return the names of the permissions set in bits, in bit order."""
+    return [name for name, bit in PERMISSION_BITS.items() if bits & bit]
+
+
+def has(bits, name):
+    return bool(bits & PERMISSION_BITS[name])
+
+
+def decode_page_tree(bits):
+    """Build the nested get_page_permissions dict from a bitmask."""
+    flags = [bool(bits >> position & 1) for position in range(len(PERMISSION_NAMES))]
+    return {
+        section: {
+            'access': flags[access],
+            'pages': {
+                page: {
+                    'access': flags[page_access],
+                    'permissions': {action: flags[position] for action, position in actions},
+                }
+                for page, page_access, actions in pages
+            },
+        }
+        for section, access, pages in PAGE_TREE
+    }
@@ -0,0 +1,188 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def budget_settings():
+    config = {
+        'MODE': 'off',
+        'DEFAULT_MAX_QUERIES': 50,
+        'MAX_REPEATS': 3,
+    }
+    config.update(getattr(settings, 'QUERY_BUDGET', {}))
+    return config
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request runs more queries than its budget allows."""
+
+
+class QueryBudget:
+    """
+    Limits for one view: max_queries per request, and max_repeats for how often
+    the same SELECT may run with different parameters (the N+1 signature).
+    None falls back to DEFAULT_MAX_QUERIES / MAX_REPEATS of settings.QUERY_BUDGET.
+    """
+
+    def __init__(self, max_queries=None, max_repeats=None):
+        self.max_queries = max_queries
+        self.max_repeats = max_repeats
+
+    def resolved(self, config):
+        return QueryBudget(
+            self.max_queries if self.max_queries is not None else config['DEFAULT_MAX_QUERIES'],
+            self.max_repeats if self.max_repeats is not None else config['MAX_REPEATS'],
+        )
+
+
+def query_budget(max_queries=None, max_repeats=None):
+    """
+    Declare the query budget of a view function, APIView handler or viewset
+    action. Put it above the other decorators of a view function: api_view
+    does not copy attributes of the function it wraps.
+    """
+    def decorator(view):
+        view.query_budget = QueryBudget(max_queries, max_repeats)
+        return view
+    return decorator
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?|\d+)\s*,)+\s*(?:%s|\?|\d+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """The shape of a statement: literals and IN (...) lists collapsed, so only parameters differ."""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(...)', shape.replace('%s', '?'))
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts queries and how often each SELECT shape runs."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            # Writes repeat legitimately (one INSERT per uploaded file, one UPDATE per counter)
+            if sql.lstrip()[:6].upper() == 'SELECT':
+                self.shapes[normalize_sql(sql)] += 1
+
+    def repeated(self, max_repeats):
+        """(shape, times) of every SELECT shape run more than max_repeats times, most frequent first."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times > max_repeats]
+
+    def problems(self, budget):
+        """Descriptions of every way the recorded queries break budget."""
+        problems = []
+        if self.count > budget.max_queries:
+            problems.append(f'{self.count} queries, budget is {budget.max_queries}')
+        for shape, times in self.repeated(budget.max_repeats):
+            problems.append(f'{times} runs of the same query (max {budget.max_repeats}): {shape[:300]}')
+        return problems
+
+
+def view_query_budget(view_func, request):
+    """
+    The QueryBudget declared for the view handling request: on the viewset
+    action or APIView handler, then on the view function, then as the
+    default_query_budget of the view class.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is not None:
+        actions = getattr(view_func, 'actions', None) or {}
+        method = request.method.lower()
+        handler = getattr(view_class, actions.get(method, method), None)
+        if getattr(handler, 'query_budget', None) is not None:
+            return handler.query_budget
+    if getattr(view_func, 'query_budget', None) is not None:
+        return view_func.query_budget
+    return getattr(view_class, 'default_query_budget', None) or QueryBudget()
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries of every request and compares them with the budget
+    declared next to its view (see query_budget). settings.QUERY_BUDGET['MODE']
+    is 'log' to log offending requests, 'strict' to raise QueryBudgetExceeded
+    (meant for tests and development) or 'off'. Queries made while a streamed
+    response is sent count towards its request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = budget_settings()
+        if config['MODE'] == 'off':
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', None) or QueryBudget()
+
+        if response.streaming:
+            response.streaming_content = self.streamed(response.streaming_content, request, recorder, budget, config)
+        else:
+            self.check(request, recorder, budget, config)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = view_query_budget(view_func, request)
+
+    def streamed(self, content, request, recorder, budget, config):
+        with connection.execute_wrapper(recorder):
+            yield from content
+        self.check(request, recorder, budget, config)
+
+    def check(self, request, recorder, budget, config):
+        problems = recorder.problems(budget.resolved(config))
+        if not problems:
+            return
+        message = f'{request.method} {request.path} is over its query budget: ' + '; '.join(problems)
+        if config['MODE'] == 'strict':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin for checking the queries of a block of code."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries=None, max_repeats=None):
+        """
+        Fail when the block runs more than max_queries queries, or repeats a
+        SELECT shape more than max_repeats times (defaults from settings).
+        """
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            yield recorder
+        problems = recorder.problems(QueryBudget(max_queries, max_repeats).resolved(budget_settings()))
+        if problems:
+            self.fail('Query budget exceeded: ' + '; '.join(problems))
+
+
+def strict_query_budgets(test):
+    """Run a test (function or TestCase class) with the middleware in strict mode."""
+    from django.test import override_settings
+    return override_settings(QUERY_BUDGET={**budget_settings(), 'MODE': 'strict'})(test)
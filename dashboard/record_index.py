@@ -0,0 +1,159 @@
+import json
+import math
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Length
+
+from .models import DataEntryFieldIndex, DataEntryRecord
+from .text_search import index_text
+
+# Longest field name / text value kept in the index (matches the model columns)
+MAX_INDEX_LENGTH = 255
+
+# Number of records whose index rows are rebuilt per statement
+INDEX_BATCH_SIZE = 500
+
+
+def normalize_text(value):
+    """Return the lowercased, trimmed text used for indexed matching."""
+    if value is None:
+        return ''
+    return str(value).strip().lower()[:MAX_INDEX_LENGTH]
+
+
+def parse_numeric(value):
+    """Return value as a finite float, or None if it is not a number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = str(value).strip().replace(',', '')
+        if not text:
+            return None
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+    if math.isnan(number) or math.isinf(number):
+        return None
+    return number
+
+
+def parse_date(value):
+    """Return value as a date if it is an ISO formatted date/datetime, else None."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    if len(text) < 10:
+        return None
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        try:
+            return date.fromisoformat(text[:10])
+        except ValueError:
+            return None
+
+
+def field_index_values(field_values):
+    """
+    Yield (field_name, text_value, numeric_value, date_value) for every entry
+    of a field_values dict. Values are first passed through the same JSON
+    encoder the model uses, so the index sees exactly what is stored.
+    """
+    if not field_values:
+        return
+    stored = json.loads(json.dumps(field_values, cls=DjangoJSONEncoder))
+    if not isinstance(stored, dict):
+        return
+    for name, value in stored.items():
+        if not name or len(name) > MAX_INDEX_LENGTH:
+            continue
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        yield name, normalize_text(value), parse_numeric(value), parse_date(value)
+
+
+def build_field_index_rows(record):
+    """Build (unsaved) DataEntryFieldIndex rows for a saved record."""
+    return [
+        DataEntryFieldIndex(
+            record_id=record.pk,
+            sub_department_id=record.sub_department_id,
+            field_name=name,
+            text_value=text_value,
+            numeric_value=numeric_value,
+            date_value=date_value,
+        )
+        for name, text_value, numeric_value, date_value in field_index_values(record.field_values)
+    ]
+
+
+def index_records(records):
+    """Replace the secondary index and full-text index rows of the given saved records."""
+    records = [record for record in records if record.pk]
+    for start in range(0, len(records), INDEX_BATCH_SIZE):
+        batch = records[start:start + INDEX_BATCH_SIZE]
+        rows = []
+        for record in batch:
+            rows.extend(build_field_index_rows(record))
+        with transaction.atomic():
+            DataEntryFieldIndex.objects.filter(record_id__in=[record.pk for record in batch]).delete()
+            DataEntryFieldIndex.objects.bulk_create(rows, batch_size=INDEX_BATCH_SIZE)
+    index_text(records)
+
+
+def field_contains(field_name, value, sub_department_id=None):
+    """
+    Return a Q on record ids for records whose field_name contains value
+    (case-insensitive).
+
+    The match runs on the indexed text_value, but a contains match has a
+    leading wildcard, so no index can seek to it: with the sub-department
+    known it scans that sub-department's rows of field_name in the
+    (sub_department, field_name, text_value, record) covering index, and
+    without one it scans the whole index table. Values longer than
+    MAX_INDEX_LENGTH are indexed truncated, so records with such a value are
+    also matched against the full value in field_values.
+    """
+    text = str(value).strip().lower()
+    rows = DataEntryFieldIndex.objects.filter(field_name=field_name)
+    if sub_department_id:
+        rows = rows.filter(sub_department_id=sub_department_id)
+    long_rows = rows.annotate(text_length=Length('text_value')).filter(text_length__gte=MAX_INDEX_LENGTH)
+    long_matches = (DataEntryRecord.objects
+                    .annotate(field_text=KeyTextTransform(field_name, 'field_values'))
+                    .filter(id__in=long_rows.values('record_id'), field_text__icontains=text)
+                    .values('id'))
+    if len(text) > MAX_INDEX_LENGTH:
+        # Only a value too long to be indexed in full can contain it
+        return Q(id__in=long_matches)
+    return Q(id__in=rows.filter(text_value__contains=text).values('record_id')) | Q(id__in=long_matches)
+
+
+def field_range(field_names, column, bounds, sub_department_id=None):
+    """
+    Return a record id subquery for records whose field (stored under any of
+    field_names) has its column (numeric_value, date_value or text_value)
+    within bounds, a dict of lookups such as {'gte': 10, 'lte': 20}. With the
+    sub-department known the range is one scan of its typed index.
+    """
+    rows = DataEntryFieldIndex.objects.filter(field_name__in=field_names)
+    if sub_department_id:
+        rows = rows.filter(sub_department_id=sub_department_id)
+    return rows.filter(**{f'{column}__{lookup}': value for lookup, value in bounds.items()}).values('record_id')
+
+
+def field_sort_value(field_names, column):
+    """Subquery of a record's indexed column for the field stored under any of field_names, to order records by."""
+    rows = DataEntryFieldIndex.objects.filter(record_id=OuterRef('pk'), field_name__in=field_names)
+    return Subquery(rows.values(column)[:1])
@@ -0,0 +1,200 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import SubDepartment
+from .master_data import get_master_data
+from .field_schema import get_field_schema, to_number, to_date
+from .record_index import normalize_text, field_contains, field_range, field_sort_value
+
+# Range operators of search parameters: field_<name>__<operator> and created_at__<operator>.
+# between takes two values separated by a comma, both bounds included
+RANGE_OPERATORS = ('gte', 'lte', 'gt', 'lt', 'between')
+
+# DataEntryFieldIndex column and bound converter of each field data_type
+INDEX_COLUMNS = {
+    'numeric': ('numeric_value', to_number),
+    'date': ('date_value', to_date),
+    'alphanumeric': ('text_value', normalize_text),
+}
+
+
+class SearchQueryError(ValueError):
+    """A search parameter cannot be applied; reported to the client as a bad request."""
+
+
+def split_operator(key):
+    """(name, operator) of a parameter such as amount__gte; operator is None for plain parameters."""
+    name, _, operator = key.rpartition('__')
+    if name and operator in RANGE_OPERATORS:
+        return name, operator
+    return key, None
+
+
+def range_values(key, operator, value):
+    """The bound values of one range parameter, as given."""
+    values = [item.strip() for item in value.split(',')] if operator == 'between' else [value.strip()]
+    if len(values) != (2 if operator == 'between' else 1) or not all(values):
+        raise SearchQueryError(f'{key} takes two values separated by a comma')
+    return values
+
+
+def range_data_type(field_name, data_types, conditions):
+    """
+    The data_type to compare a range on: the declared one when it is numeric
+    or date. Otherwise (declared as text, declared differently by different
+    sub-departments, or not at all) the type all the bounds parse as, since
+    the index keeps the number and date of every value. Text is never compared
+    by range.
+    """
+    if len(data_types) == 1 and data_types[0] in ('numeric', 'date'):
+        return data_types[0]
+    bounds = [bound for key, operator, value in conditions for bound in range_values(key, operator, value)]
+    for data_type in ('numeric', 'date'):
+        try:
+            for bound in bounds:
+                INDEX_COLUMNS[data_type][1](bound)
+            return data_type
+        except (TypeError, ValueError):
+            continue
+    if len(data_types) > 1:
+        raise SearchQueryError(f'field_{field_name} is a number in some sub-departments and a date or text in '
+                               f'others; select a sub-department with subdepartment-filter')
+    raise SearchQueryError(f'field_{field_name} ranges take numbers or dates')
+
+
+def range_bounds(key, operator, value, convert):
+    """The lookups of one range parameter, with its values passed through convert."""
+    try:
+        values = [convert(item) for item in range_values(key, operator, value)]
+    except (TypeError, ValueError) as e:
+        raise SearchQueryError(f'{key}: {e}')
+    if operator == 'between':
+        return {'gte': values[0], 'lte': values[1]}
+    return {operator: values[0]}
+
+
+def search_field(field_name, sub_department_id=None):
+    """
+    (stored names, data_types) of a searched field, as declared by the
+    sub-department, or by every sub-department when none is selected.
+    data_types lists each declared type once; it is empty for undeclared fields.
+    """
+    master_data = get_master_data()
+    if sub_department_id:
+        sub_departments = [master_data.get(SubDepartment, sub_department_id)]
+    else:
+        sub_departments = master_data.by_id[SubDepartment].values()
+    names = set()
+    data_types = set()
+    for sub_department in sub_departments:
+        declared = get_field_schema(sub_department).declared(field_name) if sub_department else None
+        if declared:
+            names.add(declared[0])
+            data_types.add(declared[1])
+    names.add(field_name)
+    return sorted(names), sorted(data_types)
+
+
+def created_at_bound(key, value, operator):
+    """The created_at lookups of one bound; a date covers its whole day."""
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return {operator: moment}
+    if day is None:
+        raise SearchQueryError(f'{key}: Enter a date as YYYY-MM-DD or a date and time')
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = start + timedelta(days=1)
+    return {
+        'gte': {'gte': start},
+        'gt': {'gte': end},
+        'lte': {'lt': end},
+        'lt': {'lt': start},
+    }[operator]
+
+
+def filter_records(queryset, params, sub_department_id=None):
+    """
+    Apply the field and created_at filters of search parameters to a
+    DataEntryRecord queryset:
+
+    - field_<name>=value: the field contains value (case-insensitive)
+    - field_<name>__gte / __lte / __gt / __lt / __between=low,high: the field
+      is within range, compared as the number or date its sub-department
+      declares it as, or that the bounds are
+    - created_at__gte / __lte / __gt / __lt / __between: created within range
+
+    Ranges are answered from the typed columns of DataEntryFieldIndex; the
+    bounds given for one field are combined into a single index scan.
+    """
+    ranges = {}
+    for key, value in params.items():
+        if not value:
+            continue
+        name, operator = split_operator(key)
+        if name == 'created_at' and operator:
+            if operator == 'between':
+                low, _, high = value.partition(',')
+                if not low or not high:
+                    raise SearchQueryError(f'{key} takes two values separated by a comma')
+                bounds = {**created_at_bound(key, low.strip(), 'gte'), **created_at_bound(key, high.strip(), 'lte')}
+            else:
+                bounds = created_at_bound(key, value, operator)
+            queryset = queryset.filter(**{f'created_at__{lookup}': bound for lookup, bound in bounds.items()})
+        elif name.startswith('field_') and len(name) > len('field_'):
+            field_name = name[len('field_'):]
+            if operator is None:
+                queryset = queryset.filter(field_contains(field_name, value, sub_department_id))
+            else:
+                ranges.setdefault(field_name, []).append((key, operator, value))
+
+    for field_name, conditions in ranges.items():
+        field_names, data_types = search_field(field_name, sub_department_id)
+        column, convert = INDEX_COLUMNS[range_data_type(field_name, data_types, conditions)]
+        bounds = {}
+        for key, operator, value in conditions:
+            bounds.update(range_bounds(key, operator, value, convert))
+        queryset = queryset.filter(id__in=field_range(field_names, column, bounds, sub_department_id))
+    return queryset
+
+
+def search_ordering(params):
+    """The order_by parameter as (descending, field name or None for created_at), or None when not given."""
+    order_by = params.get('order_by', '').strip()
+    if not order_by:
+        return None
+    descending = order_by.startswith('-')
+    name = order_by.lstrip('-')
+    if name == 'created_at':
+        return descending, None
+    if name.startswith('field_') and len(name) > len('field_'):
+        return descending, name[len('field_'):]
+    raise SearchQueryError('order_by must be created_at or field_<name>, with a leading - for descending order')
+
+
+def order_records(queryset, ordering, sub_department_id=None):
+    """
+    Order a DataEntryRecord queryset as search_ordering() describes: by
+    created_at, or by the typed index value of a field with records lacking it
+    last. Ties are broken by id in the same direction.
+    """
+    descending, field_name = ordering
+    if field_name is None:
+        return queryset.order_by('-created_at', '-id') if descending else queryset.order_by('created_at', 'id')
+    field_names, data_types = search_field(field_name, sub_department_id)
+    if len(data_types) > 1:
+        raise SearchQueryError(f'field_{field_name} has a different type in different sub-departments; '
+                               f'select a sub-department with subdepartment-filter to order by it')
+    column = INDEX_COLUMNS[data_types[0] if data_types else 'alphanumeric'][0]
+    queryset = queryset.annotate(sort_value=field_sort_value(field_names, column))
+    if descending:
+        return queryset.order_by(F('sort_value').desc(nulls_last=True), '-id')
+    return queryset.order_by(F('sort_value').asc(nulls_last=True), 'id')
@@ -1,8 +1,47 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core.validators import RegexValidator
-from .models import User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, DataEntryRecord, DataEntryFile, UserSubDepartment, ActivityLog
+from .models import User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, DataEntryRecord, DataEntryFile, ActivityLog
+from django.urls import reverse
 import re
+import base64
+from .access_scope import scope_department_ids, scope_sub_department_ids
+from .master_data import get_master_data
+from .field_schema import FieldValueError, normalize_field_values
+
+
+def context_master_data(context):
+    """The MasterData a view resolved into the serializer context, or the cached one."""
+    return context.get('master_data') or get_master_data()
+
+
+class MasterDataNameField(serializers.ReadOnlyField):
+    """Name of the branch, department or sub-department whose id is the source, read from the master data cache."""
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        obj = context_master_data(self.context).get(self.model, value) if value is not None else None
+        return obj.name if obj else None
+
+
+class MasterDataRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that resolves branches, departments and sub-departments from the master data cache."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = context_master_data(self.context).get(self.get_queryset().model, data)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
@@ -318,30 +357,14 @@ class DepartmentSerializer(serializers.ModelSerializer):
             print("No request context found")
             return []
 
-        # Get user's sub-department mappings
-        user_mappings = UserSubDepartment.objects.filter(user=request.user).first()
-        if not user_mappings:
-            print(f"No user mappings found for user {request.user.id}")
-            return []
-
-        mappings = user_mappings.get_mappings()
-        if not mappings:
-            print(f"No mappings found for user {request.user.id}")
-            return []
-
-        # Get sub-departments for this department from mappings
-        sub_department_ids = set()
-        for mapping in mappings.values():
-            if str(mapping['department_id']) == str(obj.id):
-                sub_department_ids.add(mapping['subdepartment_id'])
-                print(f"Added sub-department {mapping['subdepartment_id']} for department {obj.id}")
-
-        print(f"Found sub-department IDs for department {obj.id}: {sub_department_ids}")
+        # Get the sub-departments of this department the user is mapped to
+        sub_departments_by_department = self.context.get('sub_departments_by_department')
+        if sub_departments_by_department is not None:
+            # Already loaded for the whole tree by dashboard.hierarchy
+            sub_departments = sub_departments_by_department.get(obj.id, [])
+        else:
+            sub_departments = SubDepartment.objects.filter(id__in=scope_sub_department_ids(request.user, obj.id))
 
-        # Get sub-departments
-        sub_departments = SubDepartment.objects.filter(id__in=sub_department_ids)
-        print(f"Found {sub_departments.count()} sub-departments for department {obj.id}")
-        
         serializer = SubDepartmentSerializer(sub_departments, many=True)
         return serializer.data
 
@@ -378,7 +401,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         return attrs
 
 class SubDepartmentSerializer(serializers.ModelSerializer):
-    department_name = serializers.CharField(source='department.name', read_only=True)
+    department_name = MasterDataNameField(Department, source='department_id')
     can_update = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
     can_view = serializers.SerializerMethodField()
@@ -558,9 +581,9 @@ class DivisionBranchSerializer(serializers.ModelSerializer):
         return attrs 
 
 class BranchDepartmentLinkSerializer(serializers.ModelSerializer):
-    branch_name = serializers.CharField(source='branch.name', read_only=True)
-    department_name = serializers.CharField(source='department.name', read_only=True)
-    sub_department_name = serializers.CharField(source='sub_department.name', read_only=True)
+    branch_name = MasterDataNameField(DivisionBranch, source='branch_id')
+    department_name = MasterDataNameField(Department, source='department_id')
+    sub_department_name = MasterDataNameField(SubDepartment, source='sub_department_id')
 
     class Meta:
         model = BranchDepartmentLink
@@ -569,11 +592,17 @@ class BranchDepartmentLinkSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at'] 
 
 class LogoSerializer(serializers.ModelSerializer):
+    logo_data = serializers.SerializerMethodField()
+
     class Meta:
         model = Logo
         fields = ['id', 'name', 'organization_name', 'logo_data', 'is_active', 'created_at', 'updated_at', 'created_by', 'updated_by']
         read_only_fields = ['created_at', 'updated_at', 'created_by', 'updated_by']
 
+    def get_logo_data(self, obj):
+        # Base64 of the image, read from the blob store
+        return base64.b64encode(obj.read_logo()).decode('utf-8')
+
     def create(self, validated_data):
         print("LogoSerializer create method")
         print(f"Validated data: {validated_data}")
@@ -599,43 +628,34 @@ class BranchSerializer(serializers.ModelSerializer):
         if not request:
             return []
 
-        # Get user's sub-department mappings
-        user_mappings = UserSubDepartment.objects.filter(user=request.user).first()
-        if not user_mappings:
-            print(f"No user mappings found for user {request.user.id}")
-            return []
-
-        mappings = user_mappings.get_mappings()
-        if not mappings:
-            print(f"No mappings found for user {request.user.id}")
-            return []
-
-        # Get departments for this branch from mappings
-        department_ids = set()
-        for mapping in mappings.values():
-            if str(mapping['branch_id']) == str(obj.id):
-                department_ids.add(mapping['department_id'])
-                print(f"Added department {mapping['department_id']} for branch {obj.id}")
+        # Get departments of this branch the user is mapped to, with their sub-departments
+        departments_by_branch = self.context.get('departments_by_branch')
+        if departments_by_branch is not None:
+            departments = departments_by_branch.get(obj.id, [])
+        else:
+            departments = Department.objects.filter(id__in=scope_department_ids(request.user, obj.id))
 
-        print(f"Found department IDs for branch {obj.id}: {department_ids}")
-
-        # Get departments with their sub-departments
-        departments = Department.objects.filter(id__in=department_ids)
-        print(f"Found {departments.count()} departments for branch {obj.id}")
-        
-        serializer = DepartmentSerializer(departments, many=True, context={'request': request})
+        serializer = DepartmentSerializer(departments, many=True, context=self.context)
         return serializer.data
 
 class DataEntryFileSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
     class Meta:
         model = DataEntryFile
-        fields = ['id', 'file_name', 'file_type', 'file_size', 'uploaded_at']
+        fields = ['id', 'file_name', 'file_type', 'file_size', 'uploaded_at', 'download_url']
+
+    def get_download_url(self, obj):
+        return reverse('data-entry-download', kwargs={'pk': obj.record_id, 'file_id': obj.id})
 
 class DataEntryRecordSerializer(serializers.ModelSerializer):
     files = DataEntryFileSerializer(many=True, read_only=True)
-    branch_name = serializers.CharField(source='branch.name', read_only=True)
-    department_name = serializers.CharField(source='department.name', read_only=True)
-    sub_department_name = serializers.CharField(source='sub_department.name', read_only=True)
+    branch = MasterDataRelatedField(queryset=DivisionBranch.objects.all())
+    department = MasterDataRelatedField(queryset=Department.objects.all())
+    sub_department = MasterDataRelatedField(queryset=SubDepartment.objects.all())
+    branch_name = MasterDataNameField(DivisionBranch, source='branch_id')
+    department_name = MasterDataNameField(Department, source='department_id')
+    sub_department_name = MasterDataNameField(SubDepartment, source='sub_department_id')
     user = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
@@ -645,6 +665,19 @@ class DataEntryRecordSerializer(serializers.ModelSerializer):
                  'files', 'created_at', 'updated_at']
         read_only_fields = ['user', 'created_at', 'updated_at'] 
 
+    def validate(self, attrs):
+        # Store field values as the types the sub-department declares; moving a record re-checks them
+        sub_department = attrs.get('sub_department')
+        if sub_department is None and self.instance is not None:
+            sub_department = context_master_data(self.context).get(SubDepartment, self.instance.sub_department_id)
+        if sub_department is not None and ('field_values' in attrs or 'sub_department' in attrs):
+            field_values = attrs.get('field_values', getattr(self.instance, 'field_values', None)) or {}
+            try:
+                attrs['field_values'] = normalize_field_values(sub_department, field_values)
+            except FieldValueError as e:
+                raise serializers.ValidationError({'field_values': e.errors})
+        return attrs
+
 class ActivityLogSerializer(serializers.ModelSerializer):
     user_name = serializers.SerializerMethodField()
     
@@ -1,9 +1,19 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from django.contrib.auth.models import Group
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.utils import timezone
+from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
-from .models import ActivityLog, User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, DataEntryRecord
+from .models import ActivityLog, User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, DataEntryRecord, UserSubDepartment, UserSubDepartmentAccess
+from .record_index import index_records
+from .text_search import unindex_text
+from .jobs import enqueue_job
+from .counters import adjust_counts
+from .activity_log import write_log
+from .access_cache import bump_user_version, bump_master_version
+from .field_schema import field_schema_cache
+from .master_data import forget_request_master_data
 
 def get_client_ip(request):
     """Get the client's IP address from the request."""
@@ -15,16 +25,14 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-def log_activity(user, action, page, model_name=None, object_id=None, details=None, request=None):
-    """Create an activity log entry."""
-    ip_address = None
-    user_agent = None
-    
+def log_activity(user, action, page, model_name=None, object_id=None, details=None, request=None,
+                 ip_address=None, user_agent=None):
+    """Create an activity log entry. ip_address/user_agent are used when there is no request, e.g. in background jobs."""
     if request:
         ip_address = get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
     
-    ActivityLog.objects.create(
+    write_log(ActivityLog(
         user=user,
         action=action,
         page=page,
@@ -33,7 +41,7 @@ def log_activity(user, action, page, model_name=None, object_id=None, details=No
         details=details or {},
         ip_address=ip_address,
         user_agent=user_agent
-    )
+    ))
 
 # Model signals
 @receiver(post_save, sender=User)
@@ -115,6 +123,22 @@ def log_data_entry_activity(sender, instance, created, **kwargs):
         request=request
     )
 
+@receiver(post_save, sender=DataEntryRecord)
+def index_data_entry_record(sender, instance, **kwargs):
+    # Keep the field_values search index in sync; rows are removed by cascade on delete
+    index_records([instance])
+
+@receiver(post_save, sender=DataEntryRecord)
+def count_data_entry_record(sender, instance, created, **kwargs):
+    key = instance.counter_key()
+    previous = getattr(instance, '_counted_scope', None)
+    if created:
+        adjust_counts({key: 1})
+    elif previous is not None and previous != key:
+        # Moved to another branch, department or sub-department
+        adjust_counts({previous: -1, key: 1})
+    instance._counted_scope = key
+
 # Delete signals
 @receiver(post_delete, sender=User)
 def log_user_deletion(sender, instance, **kwargs):
@@ -172,6 +196,15 @@ def log_division_branch_deletion(sender, instance, **kwargs):
         request=request
     )
 
+@receiver(post_delete, sender=DataEntryRecord)
+def uncount_data_entry_record(sender, instance, **kwargs):
+    adjust_counts({getattr(instance, '_counted_scope', None) or instance.counter_key(): -1})
+
+@receiver(post_delete, sender=DataEntryRecord)
+def unindex_data_entry_record(sender, instance, **kwargs):
+    # The full-text table is not a model, so it is not covered by the cascade
+    unindex_text([instance.pk])
+
 @receiver(post_delete, sender=DataEntryRecord)
 def log_data_entry_deletion(sender, instance, **kwargs):
     # Try to get the request from the instance
@@ -213,4 +246,104 @@ def log_user_logout(sender, request, user, **kwargs):
         object_id=user.id,
         details={'username': user.username},
         request=request
-    ) 
\ No newline at end of file
+    ) 
+# Access cache signals
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_access(sender, instance, **kwargs):
+    bump_user_version(instance.id)
+
+# Registered before invalidate_user_scope so the access rows are current once the cache moves on
+@receiver(post_save, sender=UserSubDepartment)
+def sync_user_scope(sender, instance, **kwargs):
+    instance.sync_access()
+
+@receiver(post_delete, sender=UserSubDepartment)
+def clear_user_scope(sender, instance, **kwargs):
+    UserSubDepartmentAccess.objects.filter(user_id=instance.user_id).delete()
+
+@receiver(post_save, sender=UserSubDepartment)
+@receiver(post_delete, sender=UserSubDepartment)
+def invalidate_user_scope(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=SubDepartment)
+@receiver(post_delete, sender=SubDepartment)
+@receiver(post_save, sender=DivisionBranch)
+@receiver(post_delete, sender=DivisionBranch)
+@receiver(post_save, sender=BranchDepartmentLink)
+@receiver(post_delete, sender=BranchDepartmentLink)
+def invalidate_master_data(sender, instance, **kwargs):
+    bump_master_version()
+    forget_request_master_data()
+    # Again once committed, in case another worker reloaded the old rows in between
+    transaction.on_commit(bump_master_version)
+
+@receiver(post_save, sender=SubDepartment)
+@receiver(post_delete, sender=SubDepartment)
+def forget_field_schema(sender, instance, **kwargs):
+    field_schema_cache.forget(instance.pk)
+
+# Record field of each master data model whose name is in the full-text index
+TEXT_INDEXED_NAMES = {
+    DivisionBranch: 'branch_id',
+    Department: 'department_id',
+    SubDepartment: 'sub_department_id',
+}
+
+@receiver(pre_save, sender=Department)
+@receiver(pre_save, sender=SubDepartment)
+@receiver(pre_save, sender=DivisionBranch)
+def remember_indexed_name(sender, instance, **kwargs):
+    if instance.pk:
+        instance._indexed_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=SubDepartment)
+@receiver(post_save, sender=DivisionBranch)
+def reindex_renamed_scope(sender, instance, created, **kwargs):
+    # Records carry the name in their full-text row; rewrite them in the background
+    if created or getattr(instance, '_indexed_name', None) in (None, instance.name):
+        return
+    payload = {TEXT_INDEXED_NAMES[sender]: instance.pk}
+    transaction.on_commit(lambda: enqueue_job('text_reindex', None, payload))
+
+def through_user_ids(through, **lookups):
+    """Ids of the users of the rows of a User.groups / User.user_permissions table matching lookups."""
+    return set(through.objects.filter(**lookups).values_list('user_id', flat=True))
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_django_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Changed from the permission or group side; post_clear has no pk_set, so the users are read before
+        instance._cleared_user_ids = through_user_ids(sender, **{instance._meta.model_name: instance})
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        bump_user_version(instance.id)
+    else:
+        # Changed from the permission or group side; pk_set holds the users
+        user_ids = instance.__dict__.pop('_cleared_user_ids', ()) if action == 'post_clear' else pk_set
+        for user_id in user_ids or ():
+            bump_user_version(user_id)
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_member_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    # Every member of the changed groups holds the group's permissions
+    if action == 'pre_clear':
+        if reverse:
+            # The groups of a permission are gone by post_clear
+            instance._cleared_group_ids = set(sender.objects.filter(permission=instance).values_list('group_id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        group_ids = [instance.pk]
+    else:
+        group_ids = instance.__dict__.pop('_cleared_group_ids', ()) if action == 'post_clear' else pk_set
+    for user_id in through_user_ids(User.groups.through, group_id__in=group_ids or ()):
+        bump_user_version(user_id)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Size of the pieces blobs are read and written in
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_chunks(content, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of content, which may be bytes, a Django File or a binary file object."""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        yield bytes(content)
+    elif hasattr(content, 'chunks'):
+        yield from content.chunks(chunk_size)
+    else:
+        while True:
+            chunk = content.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class BlobStore:
+    """Interface of the content-addressed stores that hold uploaded file contents."""
+
+    def save(self, content):
+        """Store content and return its (sha256, size)."""
+        raise NotImplementedError
+
+    def open(self, sha256):
+        """Return a binary file object for the blob, raising FileNotFoundError if missing."""
+        raise NotImplementedError
+
+    def exists(self, sha256):
+        raise NotImplementedError
+
+    def size(self, sha256):
+        raise NotImplementedError
+
+    def delete(self, sha256):
+        raise NotImplementedError
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Stores blobs in a local directory under their SHA-256 hex digest, fanned
+    out as <location>/ab/cd/abcd... so no directory grows too large.
+    """
+
+    def __init__(self, location):
+        self.location = str(location)
+
+    def path(self, sha256):
+        if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+            raise ValueError(f'Invalid blob hash: {sha256!r}')
+        return os.path.join(self.location, sha256[:2], sha256[2:4], sha256)
+
+    def save(self, content):
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.location, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in iter_chunks(content):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp_file.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self.path(sha256)
+            if os.path.exists(path):
+                # Identical content is already stored
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return sha256, size
+
+    def open(self, sha256):
+        return open(self.path(sha256), 'rb')
+
+    def exists(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def size(self, sha256):
+        return os.path.getsize(self.path(sha256))
+
+    def delete(self, sha256):
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_blob_store():
+    """Return the blob store configured by settings.BLOB_STORE."""
+    config = getattr(settings, 'BLOB_STORE', {})
+    backend = import_string(config.get('BACKEND', 'dashboard.storage.FileSystemBlobStore'))
+    options = config.get('OPTIONS', {'location': os.path.join(settings.BASE_DIR, 'blobs')})
+    return backend(**options)
@@ -1,3 +1,1155 @@
-from django.test import TestCase
+import base64
+import csv
+import functools
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+import pandas as pd
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, UserSubDepartment,
+                     DataEntryRecord, DataEntryFile, DataEntryFieldIndex, ActivityLog, ActivityLogFilterValue, Logo,
+                     BackgroundJob)
+from . import bulk_upload, permissions
+from .activity_log import BufferedLogWriter, write_entries, write_log
+from .counters import record_counts, total_records
+from .field_schema import FieldSchema, FieldValueError, to_date, to_number
+from .access_scope import has_access
+from .access_cache import get_master_version, get_permission_set, get_user_version
+from .master_data import MasterDataMiddleware, get_master_data, master_data_cache
+from .jobs import beat, claim_next_job, process_id, requeue_stale_jobs, run_job
+from .query_budget import QueryBudgetExceeded, QueryBudgetTestMixin, strict_query_budgets
+from .storage import get_blob_store
+
+# Settings every test runs with: no shared file cache, activity log entries
+# written in the request, fast password hashing and a blob store of its own
+# (see DashboardTestCase)
+TEST_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'ACTIVITY_LOG': {'MODE': 'sync'},
+    'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+}
+
+
+def upload_archive(rows, files):
+    """A bulk upload ZIP: the sheet of rows (column name to values) and files under data/."""
+    sheet = io.BytesIO()
+    pd.DataFrame(rows).to_excel(sheet, index=False)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('upload/sheet.xlsx', sheet.getvalue())
+        for name, content in files.items():
+            zip_file.writestr(f'upload/data/{name}', content)
+    return SimpleUploadedFile('upload.zip', archive.getvalue(), content_type='application/zip')
+
+
+@override_settings(**TEST_SETTINGS)
+class DashboardTestCase(TestCase):
+    """
+    A user mapped to two branch / department / sub-department combinations,
+    logged in, with every data entry right.
+    """
+
+    def setUp(self):
+        blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, blob_dir, ignore_errors=True)
+        blob_settings = override_settings(BLOB_STORE={
+            'BACKEND': 'dashboard.storage.FileSystemBlobStore', 'OPTIONS': {'location': blob_dir}})
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
+        get_blob_store.cache_clear()
+        self.addCleanup(get_blob_store.cache_clear)
+        cache.clear()
+        master_data_cache.clear()
+
+        self.user = User.objects.create_user(email='clerk@example.com', username='clerk', password='pw',
+                                             first_name='Data', last_name='Clerk')
+        for name in ('can_view_data_edit', 'can_update_data_edit', 'can_delete_data_edit', 'can_create_data_entry',
+                     'can_view_log_report', 'can_view_register', 'can_access_user_rights'):
+            setattr(self.user, name, True)
+        self.user.save()
+
+        self.branch = DivisionBranch.objects.create(division_id=1, name='North', address='1 Main Road')
+        self.department = Department.objects.create(department_id='101', name='Accounts')
+        fields = [
+            {'name': 'Amount', 'data_type': 'numeric', 'requirement': 'optional'},
+            {'name': 'Invoice', 'data_type': 'alphanumeric', 'requirement': 'optional'},
+            {'name': 'Due', 'data_type': 'date', 'requirement': 'optional'},
+        ]
+        self.sub_department = SubDepartment.objects.create(
+            department=self.department, sub_department_id='1001', name='Payables', fields=fields)
+        self.other_sub_department = SubDepartment.objects.create(
+            department=self.department, sub_department_id='1002', name='Receivables', fields=fields)
+        mappings = UserSubDepartment.objects.create(user=self.user)
+        for sub_department in (self.sub_department, self.other_sub_department):
+            BranchDepartmentLink.objects.create(branch=self.branch, department=self.department,
+                                                sub_department=sub_department)
+            mappings.add_mapping(self.branch.id, self.department.id, sub_department.id)
+        self.client.force_login(self.user)
+
+    def make_record(self, sub_department=None, **field_values):
+        return DataEntryRecord.objects.create(
+            user=self.user, branch=self.branch, department=self.department,
+            sub_department=sub_department or self.sub_department, field_values=field_values)
+
+
+@strict_query_budgets
+class QueryBudgetTests(QueryBudgetTestMixin, DashboardTestCase):
+    """The main read endpoints stay within their query budgets however many rows they show."""
+
+    def setUp(self):
+        super().setUp()
+        for index in range(20):
+            self.make_record(Amount=index, Invoice=f'INV-{index}')
+        for index in range(5):
+            user = User.objects.create_user(email=f'user{index}@example.com', username=f'user{index}', password='pw')
+            UserSubDepartment.objects.create(user=user).add_mapping(
+                self.branch.id, self.department.id, self.sub_department.id)
+            ActivityLog.objects.create(user=user, action='view', page='Data Entry', model_name='DataEntryRecord',
+                                       object_id=str(index))
+
+    def test_search(self):
+        response = self.client.get(reverse('data-entry-search'), {'per_page': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_get_hierarchy(self):
+        response = self.client.get(reverse('data-entry-get-hierarchy'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_log_report_export(self):
+        response = self.client.get(reverse('log_report'), {'download': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        # Streamed rows are counted against the view's budget while they are sent
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertGreaterEqual(len(rows), 6)
+
+    def test_user_branch_departments(self):
+        for user in User.objects.exclude(id=self.user.id):
+            response = self.client.get(reverse('user_branch_departments', args=[user.id]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_destroy(self):
+        record = self.make_record(Invoice='INV-1')
+        for number in range(3):
+            sha256, file_size = get_blob_store().save(io.BytesIO(f'file {number}'.encode()))
+            DataEntryFile.objects.create(record=record, file_name=f'file{number}.txt', file_type='text/plain',
+                                         sha256=sha256, file_size=file_size)
+        response = self.client.delete(reverse('data-entry-detail', args=[record.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(DataEntryFile.objects.filter(record_id=record.id).exists())
+        log = ActivityLog.objects.get(action='delete', object_id=str(record.id))
+        self.assertEqual(log.details, {'branch': 'North', 'department': 'Accounts', 'sub_department': 'Payables'})
+
+    def test_planted_n_plus_one_is_caught(self):
+        # A name field reading its branch from the database for every row
+        def name_per_row(field, value):
+            return DivisionBranch.objects.get(pk=value).name
+
+        with mock.patch('dashboard.serializers.MasterDataNameField.to_representation', name_per_row):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'runs of the same query'):
+                self.client.get(reverse('data-entry-search'), {'per_page': 20})
+
+    def test_assert_query_budget(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget(max_repeats=3):
+                for record in DataEntryRecord.objects.all():
+                    record.user.username
+        with self.assertQueryBudget(max_queries=1):
+            list(DataEntryRecord.objects.select_related('user'))
+
+
+class KeysetPaginationTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.records = [self.make_record(Invoice=f'INV-{index}') for index in range(11)]
+        # Records created in the same instant are told apart by id
+        same_time = self.records[4].created_at
+        DataEntryRecord.objects.filter(id__in=[record.id for record in self.records[3:8]]).update(created_at=same_time)
+        self.expected = list(DataEntryRecord.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def page(self, cursor=None):
+        params = {'pagination': 'cursor', 'per_page': 3}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('data-entry-search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_round_trip(self):
+        pages = [self.page()]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        seen = [result['id'] for page in pages for result in page['results']]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 4)
+
+        # And back again from the last page
+        back = [pages[-1]]
+        while back[-1]['previous']:
+            back.append(self.page(back[-1]['previous']))
+        self.assertEqual([[result['id'] for result in page['results']] for page in reversed(back)],
+                         [[result['id'] for result in page['results']] for page in pages])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('data-entry-search'), {'pagination': 'cursor', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_order_by(self):
+        response = self.client.get(reverse('data-entry-search'), {'pagination': 'cursor', 'order_by': 'field_Amount'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RangeFilterTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for invoice, amount, due in (('A', '100', '2024-01-05'), ('B', '250.5', '2024-01-31'),
+                                     ('C', '1000', '2024-02-01'), ('D', '9', '2023-12-31')):
+            self.make_record(Invoice=invoice, Amount=amount, Due=due)
+        self.make_record(Invoice='E')
+
+    def invoices(self, **params):
+        response = self.client.get(reverse('data-entry-search'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['field_values']['Invoice'] for result in response.json()['results']]
+
+    def test_numeric_ranges(self):
+        self.assertEqual(sorted(self.invoices(field_Amount__gte='100', field_Amount__lte='300')), ['A', 'B'])
+        self.assertEqual(sorted(self.invoices(field_Amount__between='9,100')), ['A', 'D'])
+        self.assertEqual(sorted(self.invoices(field_Amount__gt='100')), ['B', 'C'])
+
+    def test_date_ranges(self):
+        params = {'field_Due__between': '2024-01-01,2024-01-31', 'subdepartment-filter': self.sub_department.id}
+        self.assertEqual(sorted(self.invoices(**params)), ['A', 'B'])
+        self.assertEqual(self.invoices(field_Due__lt='01/01/2024'), ['D'])
+
+    def test_order_by_field(self):
+        self.assertEqual(self.invoices(order_by='field_Amount'), ['D', 'A', 'B', 'C', 'E'])
+        self.assertEqual(self.invoices(order_by='-field_Amount'), ['C', 'B', 'A', 'D', 'E'])
+
+    def test_invalid_ranges(self):
+        for params in ({'field_Amount__gte': 'lots'}, {'field_Amount__between': '1'},
+                       {'field_Invoice__gte': 'B'}, {'created_at__gte': 'yesterday'}, {'order_by': 'owner'}):
+            response = self.client.get(reverse('data-entry-search'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_types_differing_between_sub_departments(self):
+        self.other_sub_department.fields = [{'name': 'Amount', 'data_type': 'date', 'requirement': 'optional'}]
+        self.other_sub_department.save()
+        # Compared as numbers, never as text ("9" > "100")
+        self.assertEqual(sorted(self.invoices(field_Amount__gte='100')), ['A', 'B', 'C'])
+        response = self.client.get(reverse('data-entry-search'), {'field_Amount__gte': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('subdepartment-filter', response.json()['error'])
+
+
+class RecordCountTests(DashboardTestCase):
+
+    def counts(self):
+        return {(sub_department_id, count) for branch_id, department_id, sub_department_id, count in record_counts()}
+
+    def test_counts_follow_create_move_and_delete(self):
+        response = self.client.post(reverse('data-entry-list'), {
+            'branch': self.branch.id, 'department': self.department.id, 'sub_department': self.sub_department.id,
+            'field_values': json.dumps({'Invoice': 'INV-1'})})
+        self.assertEqual(response.status_code, 201, response.content)
+        record_id = response.json()['id']
+        self.make_record(Invoice='INV-2')
+        self.assertEqual(self.counts(), {(self.sub_department.id, 2)})
+
+        data = {'data': json.dumps({'sub_department': self.other_sub_department.id})}
+        response = self.client.put(reverse('data-entry-detail', args=[record_id]),
+                                   encode_multipart(BOUNDARY, data), content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.counts(), {(self.sub_department.id, 1), (self.other_sub_department.id, 1)})
+
+        response = self.client.delete(reverse('data-entry-detail', args=[record_id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts(), {(self.sub_department.id, 1)})
+        self.assertEqual(total_records(), DataEntryRecord.objects.count())
+
+
+class BatchCreateTests(DashboardTestCase):
+
+    def entry(self, sub_department=None, **field_values):
+        return {'branch': self.branch.id, 'department': self.department.id,
+                'sub_department': (sub_department or self.sub_department).id, 'field_values': field_values}
+
+    def post(self, records):
+        return self.client.post(reverse('data-entry-batch-create'), {'records': records},
+                                content_type='application/json')
+
+    def test_batch_create(self):
+        response = self.post([self.entry(Amount='1,200'), self.entry(self.other_sub_department, Due='05/03/2024')])
+        self.assertEqual(response.status_code, 201, response.content)
+        records = DataEntryRecord.objects.in_bulk(response.json()['ids'])
+        self.assertEqual([records[record_id].field_values for record_id in response.json()['ids']],
+                         [{'Amount': 1200}, {'Due': '2024-03-05'}])
+        self.assertEqual(total_records(), 2)
+
+    def test_partial_errors_create_nothing(self):
+        records = [self.entry(Amount='1'), self.entry(Amount='many'), {**self.entry(), 'branch': 999}]
+        response = self.post(records)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([error['index'] for error in errors], [1, 2])
+        self.assertIn('Amount', errors[0]['error'])
+        self.assertFalse(DataEntryRecord.objects.exists())
+        self.assertEqual(total_records(), 0)
+
+
+class DownloadFileTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.record = self.make_record(Invoice='INV-1')
+        self.file = DataEntryFile.from_content(self.record, 'invoice.txt', 'text/plain', b'invoice')
+        self.file.save()
+
+    def download(self, record_id, **params):
+        return self.client.get(reverse('data-entry-download-file', args=[record_id]), params)
+
+    def test_download_file(self):
+        response = self.download(self.record.id, file_id=self.file.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'invoice')
+        self.assertEqual(self.download(self.record.id).status_code, 200)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.download(self.record.id, file_id='x').status_code, 400)
+        self.assertEqual(self.download(self.record.id, file_id=self.file.id + 1).status_code, 404)
+        self.assertEqual(self.download(self.record.id + 1).status_code, 404)
+
+
+class MasterDataTests(DashboardTestCase):
+
+    def test_version_read_once_per_request(self):
+        for index in range(5):
+            self.make_record(self.other_sub_department if index % 2 else None, Invoice=f'INV-{index}')
+        with mock.patch('dashboard.master_data.get_master_version', wraps=get_master_version) as version:
+            response = self.client.get(reverse('data-entry-search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(version.call_count, 1)
+
+    def test_changes_seen_within_the_request(self):
+        def view(request):
+            names = [get_master_data().get(SubDepartment, self.sub_department.id).name]
+            self.sub_department.name = 'Payables East'
+            self.sub_department.save()
+            names.append(get_master_data().get(SubDepartment, self.sub_department.id).name)
+            return names
+
+        self.assertEqual(MasterDataMiddleware(view)(None), ['Payables', 'Payables East'])
+
+
+class DjangoPermissionInvalidationTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='auditor', email='auditor@example.com', password='secret')
+        self.permission = Permission.objects.get(codename='view_logo')
+        self.group = Group.objects.create(name='Auditors')
+        self.group.user_set.add(self.user, self.other)
+
+    def check(self, change, users):
+        """Fail unless change() moves the cache version of exactly these users."""
+        everyone = (self.user, self.other)
+        before = {user.id: get_user_version(user.id) for user in everyone}
+        change()
+        bumped = {user.id for user in everyone if get_user_version(user.id) != before[user.id]}
+        self.assertEqual(bumped, {user.id for user in users})
+
+    def test_user_side(self):
+        self.check(lambda: self.user.user_permissions.add(self.permission), [self.user])
+        self.check(lambda: self.user.user_permissions.clear(), [self.user])
+
+    def test_permission_side(self):
+        self.check(lambda: self.permission.user_set.add(self.user, self.other), [self.user, self.other])
+        self.check(lambda: self.permission.user_set.clear(), [self.user, self.other])
+
+    def test_group_side(self):
+        self.check(lambda: self.group.user_set.remove(self.other), [self.other])
+        self.check(lambda: self.group.user_set.clear(), [self.user])
+
+    def test_group_permissions(self):
+        self.check(lambda: self.group.permissions.add(self.permission), [self.user, self.other])
+        self.assertIn('view_logo', get_permission_set(self.user)['codenames'])
+        self.check(lambda: self.permission.group_set.clear(), [self.user, self.other])
+        self.assertNotIn('view_logo', get_permission_set(self.user)['codenames'])
+        self.check(lambda: self.group.permissions.set([self.permission]), [self.user, self.other])
+        self.check(lambda: self.group.permissions.clear(), [self.user, self.other])
+
+
+class LogoTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name in ('can_view_logo_upload', 'can_create_logo_upload', 'can_update_logo_upload'):
+            setattr(self.user, name, True)
+        self.user.save()
+        response = self.client.post(reverse('logo-list'), {
+            'name': 'Main', 'organization_name': 'CDMS', 'logo_data': self.data_uri(b'first')},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.logo_id = response.json()['id']
+
+    def data_uri(self, content, content_type='image/png'):
+        return f'data:{content_type};base64,' + base64.b64encode(content).decode()
+
+    def update(self, data):
+        return self.client.patch(reverse('logo-detail', args=[self.logo_id]), data, content_type='application/json')
+
+    def test_update_replaces_the_image(self):
+        response = self.update({'logo_data': self.data_uri(b'second', 'image/svg+xml')})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(base64.b64decode(response.json()['logo_data']), b'second')
+        logo = Logo.objects.get(pk=self.logo_id)
+        self.assertEqual((logo.read_logo(), logo.logo_type), (b'second', 'image/svg+xml'))
+
+    def test_update_keeps_the_image(self):
+        response = self.update({'organization_name': 'CDMS Ltd'})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Logo.objects.get(pk=self.logo_id).read_logo(), b'first')
+
+    def test_update_rejects_bad_images(self):
+        for logo_data in ('', 'not an image', 'data:image/png;base64,@@@'):
+            self.assertEqual(self.update({'logo_data': logo_data}).status_code, 400, logo_data)
+        self.assertEqual(Logo.objects.get(pk=self.logo_id).read_logo(), b'first')
+
+
+class FieldSearchTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.short = self.make_record(Invoice='INV-2024-0042')
+        self.long_value = 'x' * 300 + ' Late Fee ' + 'y' * 20
+        self.long = self.make_record(Invoice=self.long_value)
+        self.make_record(self.other_sub_department, Invoice='other')
+
+    def ids(self, **params):
+        response = self.client.get(reverse('data-entry-search'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(result['id'] for result in response.json()['results'])
+
+    def test_contains(self):
+        self.assertEqual(self.ids(field_Invoice='2024-00'), [self.short.id])
+        self.assertEqual(self.ids(field_Invoice='inv-2024', **{'subdepartment-filter': self.sub_department.id}),
+                         [self.short.id])
+        self.assertEqual(self.ids(field_Invoice='missing'), [])
+
+    def test_values_longer_than_the_index(self):
+        self.assertEqual(self.ids(field_Invoice='late fee'), [self.long.id])
+        self.assertEqual(self.ids(field_Invoice='x' * 250), [self.long.id])
+        self.assertEqual(self.ids(field_Invoice=self.long_value[10:]), [self.long.id])
+        self.assertEqual(self.ids(field_Invoice='x' * 301), [])
+
+
+class WorkerStopped(BaseException):
+    """Stands in for a worker process dying mid-job: not caught by the job runner."""
+
+
+class BulkUploadJobTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.can_create_bulk_upload = True
+        self.user.save()
+
+    def upload(self, count, bad_rows=()):
+        branch_ids = [999 if number in bad_rows else self.branch.division_id for number in range(count)]
+        response = self.client.post(reverse('process_bulk_upload'), {'zipFile': upload_archive({
+            'Branch ID': branch_ids,
+            'Department ID': [self.department.department_id] * count,
+            'Sub Department ID': [self.sub_department.sub_department_id] * count,
+            'File Name': ['invoice.pdf'] * count,
+            'Field:Invoice': [f'INV-{number}' for number in range(count)],
+        }, {'invoice.pdf': b'%PDF-1.4'})})
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['job_id']
+
+    def status(self, job_id):
+        return self.client.get(reverse('bulk_upload_job_status', args=[job_id]))
+
+    def test_upload_runs_as_a_job(self):
+        job_id = self.upload(3, bad_rows=[1])
+        self.assertEqual(self.status(job_id).json()['status'], 'queued')
+        self.assertFalse(DataEntryRecord.objects.exists())
+
+        job = claim_next_job('test:0')
+        self.assertEqual((job.id, job.status, job.attempts), (job_id, 'running', 1))
+        run_job(job)
+
+        status = self.status(job_id).json()
+        self.assertEqual(status['status'], 'succeeded', status)
+        self.assertEqual((status['success_count'], status['error_count'], status['total']), (2, 1, 3))
+        self.assertIn('Row 3', status['errors'][0])
+        records = DataEntryRecord.objects.order_by('id')
+        self.assertEqual([record.field_values for record in records], [{'Invoice': 'INV-0'}, {'Invoice': 'INV-2'}])
+        for file_obj in DataEntryFile.objects.filter(record__in=records):
+            with file_obj.open() as f:
+                self.assertEqual((file_obj.file_name, f.read()), ('invoice.pdf', b'%PDF-1.4'))
+        self.assertEqual(DataEntryFile.objects.count(), 2)
+        self.assertEqual(total_records(), 2)
+
+    def test_resume_from_checkpoint(self):
+        job_id = self.upload(8, bad_rows=[4])
+        insert_rows = bulk_upload.insert_rows
+        calls = []
+
+        def stop_on_third_batch(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 3:
+                raise WorkerStopped()
+            return insert_rows(*args, **kwargs)
+
+        # Batches of rows 2-4, 5-8 (without the bad row 6) and 9; the worker stops in the third
+        with mock.patch.object(bulk_upload, 'create_records', functools.partial(bulk_upload.create_records, batch_size=3)):
+            with mock.patch.object(bulk_upload, 'insert_rows', stop_on_third_batch), self.assertRaises(WorkerStopped):
+                run_job(claim_next_job('test:0'))
+            job = BackgroundJob.objects.get(id=job_id)
+            self.assertEqual((job.status, job.checkpoint, job.success_count, job.error_count), ('running', 8, 6, 1))
+            self.assertEqual(DataEntryRecord.objects.count(), 6)
+
+            BackgroundJob.objects.filter(id=job_id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(requeue_stale_jobs(stale_after=60), 1)
+            job = claim_next_job('test:1')
+            self.assertEqual((job.id, job.attempts, job.success_count), (job_id, 2, 6))
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded', job.message)
+        self.assertEqual((job.success_count, job.error_count, job.processed), (7, 1, 8))
+        invoices = sorted(DataEntryRecord.objects.values_list('field_values__Invoice', flat=True))
+        self.assertEqual(invoices, [f'INV-{number}' for number in range(8) if number != 4])
+        self.assertEqual(DataEntryFile.objects.count(), 7)
+        self.assertEqual(total_records(), 7)
+
+    def test_stale_jobs(self):
+        job_id = self.upload(1)
+        job = claim_next_job(f'{process_id()}:0')
+        self.assertEqual(beat(process_id()), 1)
+        self.assertEqual(requeue_stale_jobs(stale_after=60), 0)
+
+        # Without a checkpoint a requeued job starts over
+        BackgroundJob.objects.filter(id=job_id).update(
+            success_count=1, heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale_jobs(stale_after=60), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.success_count), ('queued', '', 0))
+
+        # One whose worker stopped in every attempt is given up on
+        BackgroundJob.objects.filter(id=job_id).update(
+            status='running', attempts=3, heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale_jobs(stale_after=60, max_attempts=3), 1)
+        self.assertEqual(BackgroundJob.objects.get(id=job_id).status, 'failed')
+
+    def test_status_of_another_users_job(self):
+        job_id = self.upload(1)
+        other = User.objects.create_user(email='other@example.com', username='other', password='pw')
+        other.can_view_bulk_upload = True
+        other.save()
+        self.client.force_login(other)
+        self.assertEqual(self.status(job_id).status_code, 404)
+        self.assertEqual(self.client.get(reverse('bulk_upload_jobs')).json()['jobs'], [])
+
+
+class BulkUploadRowTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.can_create_bulk_upload = True
+        self.user.save()
+
+    def run_upload(self, rows):
+        count = len(rows['File Name'])
+        rows = {'Branch ID': [self.branch.division_id] * count,
+                'Department ID': [self.department.department_id] * count, **rows}
+        response = self.client.post(reverse('process_bulk_upload'),
+                                    {'zipFile': upload_archive(rows, {'invoice.pdf': b'%PDF-1.4'})})
+        self.assertEqual(response.status_code, 202, response.content)
+        run_job(claim_next_job('test:0'))
+        job = BackgroundJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual(job.status, 'succeeded', job.message)
+        return job
+
+    def test_unknown_ids_are_row_errors(self):
+        job = self.run_upload({
+            'Sub Department ID': ['1001', '9999', '1002', '1001'],
+            'File Name': ['invoice.pdf', 'invoice.pdf', 'invoice.pdf', 'missing.pdf'],
+            'Field:Amount': [1, 2, 3, 4],
+        })
+        self.assertEqual((job.success_count, job.error_count), (2, 2))
+        self.assertEqual(job.errors, [
+            'Row 3: Invalid ID in row 3: SubDepartment matching query does not exist.',
+            'Row 5: File not found: missing.pdf',
+        ])
+        self.assertEqual(sorted(DataEntryRecord.objects.values_list('sub_department_id', 'field_values__Amount')),
+                         [(self.sub_department.id, 1), (self.other_sub_department.id, 3)])
+
+    def test_new_field_columns(self):
+        rows = {
+            'Sub Department ID': ['1001', '1001', '1002'],
+            'File Name': ['invoice.pdf'] * 3,
+            'Field:invoice': ['A', 'B', 'C'],
+            'Field:Reference': ['R1', 'R2', 'R3'],
+        }
+        self.run_upload(rows)
+        self.run_upload(rows)
+        for sub_department in SubDepartment.objects.all():
+            names = [field['name'] for field in sub_department.fields]
+            self.assertEqual(names, ['Amount', 'Invoice', 'Due', 'reference'])
+        # The sheet's spelling of a declared field is stored as declared
+        self.assertEqual(DataEntryRecord.objects.filter(field_values__Invoice='A').count(), 2)
+
+    def test_bad_row_retried_alone(self):
+        insert_rows = bulk_upload.insert_rows
+
+        def reject_invoice_2(user, rows, archive):
+            if any(row.field_values.get('Invoice') == 'INV-2' for row in rows):
+                raise ValueError('Rejected')
+            return insert_rows(user, rows, archive)
+
+        with mock.patch.object(bulk_upload, 'insert_rows', reject_invoice_2):
+            job = self.run_upload({
+                'Sub Department ID': ['1001'] * 4,
+                'File Name': ['invoice.pdf'] * 4,
+                'Field:Invoice': [f'INV-{number}' for number in range(4)],
+            })
+        self.assertEqual((job.success_count, job.error_count, job.errors), (3, 1, ['Row 4: Rejected']))
+        records = DataEntryRecord.objects.all()
+        self.assertEqual(sorted(record.field_values['Invoice'] for record in records), ['INV-0', 'INV-1', 'INV-3'])
+        # What the DataEntryRecord signal handlers do for single saves is done in bulk
+        self.assertEqual(DataEntryFieldIndex.objects.filter(field_name='Invoice').count(), 3)
+        self.assertEqual(DataEntryFile.objects.count(), 3)
+        self.assertEqual(list(record_counts()), [(self.branch.id, self.department.id, self.sub_department.id, 3)])
+        self.assertEqual(ActivityLog.objects.filter(page='Data Entry', action='create').count(), 3)
+        self.assertEqual(self.client.get(reverse('data-entry-search'), {'q': 'inv-3'}).json()['count'], 1)
+
+
+class IdleThread:
+    """Stands in for the log writer thread, so queued entries stay queued until flushed."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+    def join(self, timeout=None):
+        pass
+
+
+@mock.patch('dashboard.activity_log.threading.Thread', IdleThread)
+class BufferedLogWriterTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.writer = BufferedLogWriter()
+        ActivityLog.objects.all().delete()
+
+    def entry(self, page='Data Entry', **kwargs):
+        return ActivityLog(**{'user': self.user, 'action': 'view', 'page': page, **kwargs})
+
+    def pages(self):
+        return sorted(ActivityLog.objects.values_list('page', flat=True))
+
+    def test_flush_writes_queued_entries(self):
+        for page in ('Home', 'Register', 'Data Entry'):
+            self.writer.put(self.entry(page, model_name='DataEntryRecord'))
+        self.assertEqual(self.pages(), [])
+        self.writer.flush()
+        self.assertEqual(self.pages(), ['Data Entry', 'Home', 'Register'])
+        self.assertLessEqual({('page', 'Home'), ('page', 'Register'), ('model', 'DataEntryRecord')},
+                             set(ActivityLogFilterValue.objects.values_list('kind', 'value')))
+
+    def test_shutdown_flushes(self):
+        self.writer.put(self.entry('Home'))
+        self.writer.shutdown()
+        self.assertEqual(self.pages(), ['Home'])
+
+    def test_overflow(self):
+        with override_settings(ACTIVITY_LOG={'MODE': 'buffered', 'MAX_QUEUE_SIZE': 2, 'OVERFLOW': 'sync'}):
+            for page in ('A', 'B', 'C'):
+                self.writer.put(self.entry(page))
+        # The entry that did not fit was written directly
+        self.assertEqual(self.pages(), ['C'])
+        self.writer.flush()
+        self.assertEqual(self.pages(), ['A', 'B', 'C'])
+
+        ActivityLog.objects.all().delete()
+        writer = BufferedLogWriter()
+        with override_settings(ACTIVITY_LOG={'MODE': 'buffered', 'MAX_QUEUE_SIZE': 2, 'OVERFLOW': 'drop'}):
+            with self.assertLogs('dashboard.activity_log', 'WARNING'):
+                for page in ('A', 'B', 'C'):
+                    writer.put(self.entry(page))
+            writer.flush()
+        self.assertEqual(self.pages(), ['A', 'B'])
+
+    def test_bad_entry_loses_only_itself(self):
+        with self.assertLogs('dashboard.activity_log', 'ERROR'):
+            write_entries([self.entry('A'), self.entry('B', action=None), self.entry('C')])
+        self.assertEqual(self.pages(), ['A', 'C'])
+
+    def test_restarts_in_a_forked_process(self):
+        self.writer.put(self.entry('Parent'))
+        inherited = self.writer._queue
+        self.writer._pid = -1  # As seen from a child process
+        self.writer.flush()
+        self.writer.put(self.entry('Child'))
+        self.assertIsNot(self.writer._queue, inherited)
+        self.writer.flush()
+        self.assertEqual(self.pages(), ['Child'])
+
+    @override_settings(ACTIVITY_LOG={'MODE': 'buffered'})
+    def test_write_log_waits_for_commit(self):
+        with mock.patch('dashboard.activity_log.writer', self.writer):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                try:
+                    with transaction.atomic():
+                        write_log(self.entry('Rolled back'))
+                        raise ValueError()
+                except ValueError:
+                    pass
+            self.assertEqual(callbacks, [])
+            self.assertIsNone(self.writer._queue)
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                write_log(self.entry('Committed'))
+            self.assertEqual(len(callbacks), 1)
+            self.writer.flush()
+        self.assertEqual(self.pages(), ['Committed'])
+
+
+class LogReportTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ActivityLog.objects.all().delete()
+        now = timezone.now()
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.user, action='view', page=('Data Entry', 'Register')[number % 2],
+                        model_name=('DataEntryRecord', 'SubDepartment')[number % 3 == 0],
+                        # Every five share a timestamp, so pages must be told apart by id
+                        created_at=now - timedelta(minutes=number // 5))
+            for number in range(120)
+        ])
+        self.created = set(ActivityLog.objects.values_list('id', flat=True))
+
+    def report(self, url=None, **params):
+        response = self.client.get(url or reverse('log_report'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_pages_cover_every_log_once(self):
+        context = self.report()
+        seen = [log.id for log in context['logs']]
+        pages = 1
+        while context['next_url']:
+            context = self.report(reverse('log_report') + context['next_url'])
+            seen.extend(log.id for log in context['logs'])
+            pages += 1
+        # The report logs its own views; only the first one is older than the pages walked
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen) - self.created, {max(seen)})
+        self.assertLessEqual(self.created, set(seen))
+        self.assertEqual(pages, 3)
+        ordered = list(ActivityLog.objects.filter(id__in=seen).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, ordered)
+
+        previous = self.report(reverse('log_report') + context['previous_url'])
+        self.assertEqual(len(previous['logs']), 50)
+
+    def test_filters(self):
+        self.assertEqual(len(self.report(page='Register')['logs']), 50)
+        self.assertTrue(all(log.page == 'Register' for log in self.report(page='Register')['logs']))
+        # Text that is not a dropdown value still matches as a substring
+        self.assertEqual({log.page for log in self.report(page='entr')['logs']}, {'Data Entry'})
+        self.assertEqual({log.model_name for log in self.report(model='subdep')['logs']}, {'SubDepartment'})
+        self.assertEqual(len(self.report(page='Register', model='SubDepartment')['logs']), 20)
+
+    def test_filter_values_follow_new_logs(self):
+        self.assertNotIn('Bulk Upload', self.report()['pages'])
+        write_log(ActivityLog(user=self.user, action='create', page='Bulk Upload', model_name='BackgroundJob'))
+        context = self.report()
+        self.assertIn('Bulk Upload', context['pages'])
+        self.assertIn('BackgroundJob', context['models'])
+        self.assertEqual(ActivityLogFilterValue.objects.filter(kind='page', value='Bulk Upload').count(), 1)
+
+
+class ExportTests(DashboardTestCase):
+
+    def download(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_register_csv(self):
+        self.make_record(Invoice='INV-1')
+        self.make_record(Invoice='INV-2')
+        self.make_record(self.other_sub_department, Invoice='INV-3')
+        rows = list(csv.reader(io.StringIO(self.download('register', download='csv').decode())))
+        self.assertEqual(rows, [
+            ['Branch/Division', 'Department', 'Sub-Department', 'Number of Records'],
+            [f'{self.branch.id} - North', f'{self.department.id} - Accounts', f'{self.sub_department.id} - Payables', '2'],
+            [f'{self.branch.id} - North', f'{self.department.id} - Accounts',
+             f'{self.other_sub_department.id} - Receivables', '1'],
+        ])
+
+    def test_register_excel(self):
+        self.make_record(Invoice='INV-1')
+        sheet = openpyxl.load_workbook(io.BytesIO(self.download('register', download='excel'))).active
+        self.assertEqual([cell.value for cell in sheet[1]],
+                         ['Branch/Division', 'Department', 'Sub-Department', 'Number of Records'])
+        self.assertEqual(sheet.cell(row=2, column=4).value, 1)
+        self.assertEqual(sheet.max_row, 2)
+
+    def test_log_report_csv(self):
+        ActivityLog.objects.all().delete()
+        ActivityLog.objects.create(user=self.user, action='create', page='Data Entry', model_name='DataEntryRecord',
+                                   object_id='7', details={'branch': 'North'}, ip_address='10.0.0.1')
+        ActivityLog.objects.create(user=None, action='delete', page='Register', model_name='Register')
+        rows = list(csv.reader(io.StringIO(self.download('log_report', download='csv', page='Data Entry').decode())))
+        self.assertEqual(rows[0][:6], ['Timestamp (IST)', 'User', 'Action', 'Page', 'Model', 'Object ID'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][1:], ['Data Clerk', 'create', 'Data Entry', 'DataEntryRecord', '7',
+                                       '{"branch": "North"}', '10.0.0.1', ''])
+
+        rows = list(csv.reader(io.StringIO(self.download('log_report', download='csv', action='delete').decode())))
+        self.assertEqual(rows[1][1:4], ['System', 'delete', 'Register'])
+
+
+class PermissionBitsTests(DashboardTestCase):
+
+    def test_set_permission_round_trip(self):
+        self.user.set_permission('can_create_register')
+        self.user.set_permission('can_view_register', False)
+        self.user.save()
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(user.has('can_create_register'))
+        self.assertTrue(user.can_create_register)
+        self.assertFalse(user.can_view_register)
+        self.assertTrue(user.can_view_log_report)
+        self.assertEqual(permissions.pack(user.permission_names()), user.permission_bits)
+
+    def test_pack_and_unpack(self):
+        bits = permissions.pack(['can_access_data', 'can_update_register', 'no_such_permission'])
+        self.assertEqual(permissions.unpack(bits), ['can_access_data', 'can_update_register'])
+        self.assertTrue(permissions.has(bits, 'can_update_register'))
+        self.assertFalse(permissions.has(bits, 'can_view_register'))
+        self.assertEqual(permissions.unpack(permissions.ALL_PERMISSIONS), list(permissions.PERMISSION_NAMES))
+
+    def test_decode_page_tree(self):
+        tree = permissions.decode_page_tree(permissions.pack(['can_access_report', 'can_access_register',
+                                                              'can_view_register']))
+        self.assertTrue(tree['reports']['access'])
+        self.assertEqual(tree['reports']['pages']['register'], {
+            'access': True,
+            'permissions': {'view': True, 'create': False, 'delete': False, 'update': False},
+        })
+        self.assertFalse(tree['reports']['pages']['log_report']['access'])
+        self.assertFalse(tree['setup']['access'])
+        self.assertEqual(set(tree), {'data_management', 'setup', 'user_management', 'reports'})
+
+
+class AccessScopeTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other_branch = DivisionBranch.objects.create(division_id=2, name='South', address='2 Main Road')
+        self.other_department = Department.objects.create(department_id='102', name='Sales')
+        self.foreign_sub_department = SubDepartment.objects.create(
+            department=self.other_department, sub_department_id='2001', name='Retail', fields=[])
+        BranchDepartmentLink.objects.create(branch=self.other_branch, department=self.department,
+                                            sub_department=self.sub_department)
+
+    def test_mapped_triple(self):
+        self.assertTrue(has_access(self.user, self.branch.id, self.department.id, self.sub_department.id))
+        self.assertTrue(has_access(self.user, branch_id=str(self.branch.id)))
+        self.assertTrue(has_access(self.user, department_id=self.department.id))
+
+    def test_denied_triples(self):
+        # linked in the hierarchy, but not mapped to the user
+        self.assertFalse(has_access(self.user, self.other_branch.id, self.department.id, self.sub_department.id))
+        self.assertFalse(has_access(self.user, self.branch.id, self.other_department.id,
+                                    self.foreign_sub_department.id))
+        self.assertFalse(has_access(self.user, self.branch.id, self.department.id, self.foreign_sub_department.id))
+        self.assertFalse(has_access(self.user, branch_id=self.other_branch.id))
+        self.assertFalse(has_access(self.user, self.branch.id, 'abc', self.sub_department.id))
+
+    def test_denied_sub_department_fields(self):
+        url = reverse('data-entry-get-subdepartment-fields')
+        response = self.client.get(url, {'sub_department_id': self.foreign_sub_department.id})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'error': 'You do not have access to this sub-department'})
+
+        response = self.client.get(url, {'sub_department_id': self.sub_department.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([field['name'] for field in response.json()['fields']], ['Amount', 'Invoice', 'Due'])
+
+
+class HierarchyTests(DashboardTestCase):
+
+    def get_hierarchy(self, **headers):
+        return self.client.get(reverse('data-entry-get-hierarchy'), headers=headers)
+
+    def test_not_modified(self):
+        response = self.get_hierarchy()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        [branch] = response.json()
+        self.assertEqual(branch['name'], 'North')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        response = self.get_hierarchy(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_mapping_change_changes_etag(self):
+        etag = self.get_hierarchy()['ETag']
+
+        UserSubDepartment.objects.get(user=self.user).remove_mapping(
+            self.branch.id, self.department.id, self.other_sub_department.id)
+        response = self.get_hierarchy(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn('Receivables', json.dumps(response.json()))
+        self.assertIn('Payables', json.dumps(response.json()))
+
+
+class UserRightsTreeTests(DashboardTestCase):
+
+    def url(self):
+        return reverse('user_branch_departments', args=[self.user.id])
+
+    def assigned(self, tree):
+        return {
+            (branch['id'], department['id'], sub_department['id']): sub_department['assigned']
+            for branch in tree['branches']
+            for department in branch['departments']
+            for sub_department in department['subdepartments']
+        }
+
+    def test_tree_marks_assigned_sub_departments(self):
+        UserSubDepartment.objects.get(user=self.user).remove_mapping(
+            self.branch.id, self.department.id, self.other_sub_department.id)
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.assigned(response.json()), {
+            (self.branch.id, self.department.id, self.sub_department.id): True,
+            (self.branch.id, self.department.id, self.other_sub_department.id): False,
+        })
+
+    def test_tree_queries_do_not_grow_with_branches(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url())
+        for division_id in range(2, 6):
+            branch = DivisionBranch.objects.create(division_id=division_id, name=f'Branch {division_id}', address='-')
+            for sub_department in (self.sub_department, self.other_sub_department):
+                BranchDepartmentLink.objects.create(branch=branch, department=self.department,
+                                                    sub_department=sub_department)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url())
+        self.assertEqual(len(response.json()['branches']), 5)
+        self.assertEqual(len(large), len(small))
+
+    def test_post_replaces_mappings(self):
+        response = self.client.post(self.url(), {'subdepartments': [
+            {'branch_id': self.branch.id, 'department_id': self.department.id,
+             'subdepartment_id': self.other_sub_department.id},
+            {'branch_id': self.branch.id, 'department_id': None, 'subdepartment_id': self.sub_department.id},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        mappings = UserSubDepartment.objects.get(user=self.user)
+        self.assertEqual(mappings.mapping_triples(),
+                         [(self.branch.id, self.department.id, self.other_sub_department.id)])
+        self.assertFalse(has_access(self.user, sub_department_id=self.sub_department.id))
+        self.assertTrue(has_access(self.user, sub_department_id=self.other_sub_department.id))
+
+
+class BenchmarkIndexesCommandTests(DashboardTestCase):
+
+    def index_names(self):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, DataEntryRecord._meta.db_table))
+
+    def test_reports_and_rolls_back(self):
+        self.make_record(Invoice='INV-1')
+        out = io.StringIO()
+        call_command('benchmark_indexes', seed_records=30, seed_logs=30, repeat=1, batch_size=10, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('31 records', output)
+        self.assertIn('Query plans without indexes', output)
+        for name in ('records of user', 'records of user by sub-department', 'logs by page', 'logs by model'):
+            self.assertIn(name, output.split('Median latency (ms)')[1])
+        # the seeded rows and the dropped indexes are rolled back
+        self.assertEqual(DataEntryRecord.objects.count(), 1)
+        self.assertFalse(ActivityLog.objects.filter(page='Dashboard Home').exists())
+        self.assertTrue({'dash_rec_user_created', 'dash_rec_user_subdept'} <= self.index_names())
+
+    def test_unknown_user(self):
+        with self.assertRaisesMessage(CommandError, 'User 999 does not exist'):
+            call_command('benchmark_indexes', user=999, stdout=io.StringIO())
+
+
+@override_settings(**TEST_SETTINGS)
+class GenerateSyntheticDataCommandTests(TransactionTestCase):
+    """Runs in committed transactions, as the command writes its chunks from worker threads."""
+
+    def setUp(self):
+        blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, blob_dir, ignore_errors=True)
+        blob_settings = override_settings(BLOB_STORE={
+            'BACKEND': 'dashboard.storage.FileSystemBlobStore', 'OPTIONS': {'location': blob_dir}})
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
+        get_blob_store.cache_clear()
+        self.addCleanup(get_blob_store.cache_clear)
+        cache.clear()
+
+    def test_small_organization(self):
+        call_command('generate_synthetic_data', branches=2, departments=3, sub_departments=2, fields=3,
+                     departments_per_branch=2, users=3, mappings_per_user=3, records=25, logs=15,
+                     blob_pool=2, file_size=1, chunk_size=10, workers=1, stdout=io.StringIO())
+
+        self.assertEqual(DivisionBranch.objects.count(), 2)
+        self.assertEqual(SubDepartment.objects.count(), 6)
+        self.assertEqual(BranchDepartmentLink.objects.count(), 8)
+        self.assertEqual(DataEntryFile.objects.count(), 25)
+        self.assertEqual(ActivityLog.objects.filter(details__synthetic=True).count(), 15)
+        self.assertEqual(total_records(), 25)
+
+        # every record is inside its user's mappings and dated in the past
+        for record in DataEntryRecord.objects.all():
+            self.assertTrue(has_access(record.user, record.branch_id, record.department_id, record.sub_department_id))
+        first_created = DataEntryRecord.objects.earliest('created_at').created_at
+        self.assertLess(first_created, timezone.now() - timedelta(days=7))
+        self.assertFalse(DataEntryRecord.objects.exclude(updated_at=F('created_at')).exists())
+        self.assertIs(DataEntryRecord._meta.get_field('created_at').auto_now_add, True)
+
+    def test_prefix_in_use(self):
+        Department.objects.create(department_id='SYN-0001', name='Taken')
+        with self.assertRaisesMessage(CommandError, 'Data with prefix SYN already exists'):
+            call_command('generate_synthetic_data', stdout=io.StringIO())
+
+
+class TextSearchTests(DashboardTestCase):
+
+    def search(self, text):
+        response = self.client.get(reverse('data-entry-search'), {'q': text, 'per_page': 50})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_field_values_and_scope_names(self):
+        acme = self.make_record(Invoice='ACME-77', Amount='12')
+        globex = self.make_record(self.other_sub_department, Invoice='GLOBEX-9')
+
+        self.assertEqual(self.search('acme'), [acme.id])
+        self.assertEqual(self.search('globex 9'), [globex.id])
+        self.assertEqual(self.search('receivables'), [globex.id])
+        self.assertEqual(set(self.search('north accounts')), {acme.id, globex.id})
+        self.assertEqual(self.search('acme receivables'), [])
+
+    def test_exact_match_ranks_above_prefix(self):
+        exact = self.make_record(Invoice='port')
+        prefix = self.make_record(Invoice='portland')
+        self.make_record(Invoice='harbour')
+        self.assertEqual(self.search('port'), [exact.id, prefix.id])
+
+    def test_rename_is_reindexed_by_job(self):
+        record = self.make_record(Invoice='INV-1')
+        self.make_record(self.other_sub_department, Invoice='INV-2')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub_department.name = 'Creditors'
+            self.sub_department.save()
+        self.assertEqual(self.search('creditors'), [])
+
+        job = claim_next_job('test:0')
+        self.assertEqual((job.kind, job.payload), ('text_reindex', {'sub_department_id': self.sub_department.id}))
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.success_count), ('succeeded', 1))
+        self.assertEqual(self.search('creditors'), [record.id])
+        self.assertEqual(self.search('payables'), [])
+
+
+class FieldSchemaTests(SimpleTestCase):
+
+    def test_to_number(self):
+        self.assertEqual(to_number('1,234.50'), 1234.5)
+        self.assertEqual(to_number(' 7 '), 7)
+        self.assertEqual(to_number(1042.0), 1042)
+        for value in ('abc', '', True):
+            with self.assertRaisesMessage(ValueError, 'Enter a number'):
+                to_number(value)
+
+    def test_to_date_is_day_first(self):
+        for value in ('05/03/2024', '05-03-2024', '05.03.2024', '2024-03-05', '2024/03/05'):
+            self.assertEqual(to_date(value), '2024-03-05')
+        for value in ('31/02/2024', '03/2024', 'soon'):
+            with self.assertRaisesMessage(ValueError, 'Enter a date as YYYY-MM-DD'):
+                to_date(value)
+
+    def test_normalize(self):
+        schema = FieldSchema([
+            {'name': 'Amount', 'data_type': 'numeric', 'requirement': 'essential'},
+            {'name': 'Due', 'data_type': 'date', 'requirement': 'optional'},
+            {'name': 'Invoice', 'data_type': 'alphanumeric', 'requirement': 'optional'},
+        ])
+        self.assertEqual(schema.normalize({'amount': '1,200', ' DUE ': '05/03/2024', 'Invoice': 1042.0, 'Note': ' x ',
+                                           'Empty': ''}),
+                         {'Amount': 1200, 'Due': '2024-03-05', 'Invoice': '1042', 'Note': 'x'})
+
+        with self.assertRaises(FieldValueError) as caught:
+            schema.normalize({'Due': 'soon'})
+        self.assertEqual(caught.exception.errors, {'Due': 'Enter a date as YYYY-MM-DD',
+                                                   'Amount': 'This field is required'})
+        with self.assertRaises(FieldValueError):
+            schema.normalize(['Amount'])
+
+
+class FieldValueNormalizationTests(DashboardTestCase):
+
+    def create(self, field_values):
+        return self.client.post(reverse('data-entry-list'), {
+            'branch': self.branch.id, 'department': self.department.id, 'sub_department': self.sub_department.id,
+            'field_values': json.dumps(field_values)})
+
+    def test_create_stores_declared_types(self):
+        response = self.create({'amount': '1,200.50', 'Due': '05/03/2024', 'Invoice': 'INV-1'})
+        self.assertEqual(response.status_code, 201, response.content)
+        record = DataEntryRecord.objects.get(pk=response.json()['id'])
+        self.assertEqual(record.field_values, {'Amount': 1200.5, 'Due': '2024-03-05', 'Invoice': 'INV-1'})
+
+    def test_create_rejects_bad_values(self):
+        response = self.create({'Amount': 'twelve'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Enter a number', response.content.decode())
+        self.assertFalse(DataEntryRecord.objects.exists())
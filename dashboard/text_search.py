@@ -0,0 +1,218 @@
+import json
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import DataEntryRecord, DivisionBranch, Department, SubDepartment
+from .master_data import get_master_data
+
+# Full-text index of DataEntryRecords: one row per record with its field values
+# and the names of its branch, department and sub-department. Created by
+# migration 0035 as an FTS5 table on SQLite and a GIN indexed tsvector on PostgreSQL.
+TEXT_INDEX_TABLE = 'dashboard_record_text'
+
+# Records written per statement when (re)indexing
+TEXT_INDEX_BATCH_SIZE = 500
+
+_TOKEN = re.compile(r'\w+')
+
+
+def record_document(field_values, names):
+    """
+    The two indexed texts of a record: its field values, and the names of
+    its branch, department and sub-department (names is an iterable).
+    """
+    values = []
+    if field_values:
+        # The same JSON the model stores, so dates and decimals read as they are displayed
+        stored = json.loads(json.dumps(field_values, cls=DjangoJSONEncoder))
+        if isinstance(stored, dict):
+            values = [str(value) for value in stored.values() if value not in (None, '')]
+    return ' '.join(values), ' '.join(name for name in names if name)
+
+
+def parse_query(text):
+    """Split a search box entry into terms, each a list of word tokens; empty terms are dropped."""
+    terms = []
+    for term in (text or '').split():
+        tokens = _TOKEN.findall(term.lower())
+        if tokens:
+            terms.append(tokens)
+    return terms
+
+
+class SQLiteTextIndex:
+    """FTS5 table keyed by record id (rowid); ranked with bm25, field values weigh twice the names."""
+
+    def match_query(self, terms):
+        # Every term must match, as a phrase of its tokens whose last token may be a prefix.
+        # The exact phrase is an alternative too, so exact matches score above prefix-only ones
+        phrases = ['"' + ' '.join(tokens) + '"' for tokens in terms]
+        return ' AND '.join(f'({phrase} OR {phrase}*)' for phrase in phrases)
+
+    def replace(self, cursor, documents):
+        cursor.executemany(f'DELETE FROM {TEXT_INDEX_TABLE} WHERE rowid = %s', [(pk,) for pk, _, _ in documents])
+        cursor.executemany(f'INSERT INTO {TEXT_INDEX_TABLE} (rowid, field_values, scope_names) VALUES (%s, %s, %s)',
+                           documents)
+
+    def delete(self, cursor, record_ids):
+        cursor.executemany(f'DELETE FROM {TEXT_INDEX_TABLE} WHERE rowid = %s', [(pk,) for pk in record_ids])
+
+    def matching_ids(self, query):
+        return RawSQL(f'SELECT rowid FROM {TEXT_INDEX_TABLE} WHERE {TEXT_INDEX_TABLE} MATCH %s', (query,))
+
+    def ranked_ids_sql(self, query, ids_sql, ids_params, limit, offset):
+        # bm25 is lower for better matches. The unary + keeps the IN out of the FTS5 lookup:
+        # otherwise the match is run again for every candidate id, which is orders of magnitude slower
+        return (f'SELECT rowid FROM {TEXT_INDEX_TABLE} WHERE {TEXT_INDEX_TABLE} MATCH %s AND +rowid IN ({ids_sql}) '
+                f'ORDER BY bm25({TEXT_INDEX_TABLE}, 2.0, 1.0), rowid DESC LIMIT %s OFFSET %s',
+                (query, *ids_params, limit, offset))
+
+
+class PostgreSQLTextIndex:
+    """tsvector column with a GIN index; field values are weighted A and names B for ts_rank."""
+
+    def match_query(self, terms):
+        # Tokens are plain words, so they are safe in to_tsquery syntax; the last of each term may be
+        # a prefix, with the exact term as an alternative so exact matches rank above prefix-only ones
+        return ' & '.join(
+            f"({' & '.join(tokens)} | {' & '.join(tokens[:-1] + [tokens[-1] + ':*'])})" for tokens in terms)
+
+    def replace(self, cursor, documents):
+        cursor.executemany(
+            f"INSERT INTO {TEXT_INDEX_TABLE} (record_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B')) "
+            f"ON CONFLICT (record_id) DO UPDATE SET document = EXCLUDED.document",
+            documents)
+
+    def delete(self, cursor, record_ids):
+        # Also removed by the foreign key cascade
+        cursor.execute(f'DELETE FROM {TEXT_INDEX_TABLE} WHERE record_id = ANY(%s)', (list(record_ids),))
+
+    def matching_ids(self, query):
+        return RawSQL(f"SELECT record_id FROM {TEXT_INDEX_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+                      (query,))
+
+    def ranked_ids_sql(self, query, ids_sql, ids_params, limit, offset):
+        return (f"SELECT record_id FROM {TEXT_INDEX_TABLE} WHERE document @@ to_tsquery('simple', %s) "
+                f"AND record_id IN ({ids_sql}) "
+                f"ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC, record_id DESC LIMIT %s OFFSET %s",
+                (query, *ids_params, query, limit, offset))
+
+
+TEXT_INDEX_BACKENDS = {
+    'sqlite': SQLiteTextIndex,
+    'postgresql': PostgreSQLTextIndex,
+}
+
+
+def get_text_index(using=None):
+    """The full-text index of the database backend, or None when it has none."""
+    vendor = (using or connection).vendor
+    backend = TEXT_INDEX_BACKENDS.get(vendor)
+    return backend() if backend else None
+
+
+def scope_names(records):
+    """[branch, department, sub-department] names of each record by id, from the master data cache."""
+    master_data = get_master_data()
+    fields = ((DivisionBranch, 'branch_id'), (Department, 'department_id'), (SubDepartment, 'sub_department_id'))
+    names = {}
+    for model, field in fields:
+        ids = {getattr(record, field) for record in records}
+        names[model] = {pk: obj.name for pk in ids if (obj := master_data.get(model, pk)) is not None}
+        missing = ids - names[model].keys()
+        if missing:
+            # Created since the cache was loaded, e.g. earlier in the same transaction
+            names[model].update(model.objects.filter(id__in=missing).values_list('id', 'name'))
+    return {record.pk: [names[model].get(getattr(record, field), '') for model, field in fields]
+            for record in records}
+
+
+def index_text(records):
+    """Replace the full-text index rows of the given saved records."""
+    text_index = get_text_index()
+    records = [record for record in records if record.pk]
+    if text_index is None or not records:
+        return
+    for start in range(0, len(records), TEXT_INDEX_BATCH_SIZE):
+        batch = records[start:start + TEXT_INDEX_BATCH_SIZE]
+        names = scope_names(batch)
+        documents = [(record.pk, *record_document(record.field_values, names[record.pk])) for record in batch]
+        with transaction.atomic(), connection.cursor() as cursor:
+            text_index.replace(cursor, documents)
+
+
+def unindex_text(record_ids):
+    """Remove the full-text index rows of deleted records."""
+    text_index = get_text_index()
+    if text_index is None or not record_ids:
+        return
+    with connection.cursor() as cursor:
+        text_index.delete(cursor, record_ids)
+
+
+def text_search(queryset, text):
+    """
+    Restrict a DataEntryRecord queryset to records matching every term of
+    text, each as a prefix so results come while typing. Without a full-text
+    index on the database, falls back to icontains on field_values.
+    """
+    terms = parse_query(text)
+    if not terms:
+        return queryset
+    text_index = get_text_index()
+    if text_index is None:
+        for term in text.split():
+            queryset = queryset.filter(field_values__icontains=term)
+        return queryset
+    return queryset.filter(id__in=text_index.matching_ids(text_index.match_query(terms)))
+
+
+def ranked_page(queryset, text, start, end):
+    """
+    The records of queryset matching text at positions start:end of the
+    ranking, best match first and the latest id first among equals. The index is
+    scanned once for the whole page, rather than ranking record by record.
+    Returns None when there is nothing to rank by; order the queryset as usual then.
+    """
+    terms = parse_query(text)
+    text_index = get_text_index()
+    if not terms or text_index is None:
+        return None
+    ids_sql, ids_params = queryset.order_by().values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(*text_index.ranked_ids_sql(
+            text_index.match_query(terms), ids_sql, ids_params, max(end - start, 0), start))
+        ids = [row[0] for row in cursor.fetchall()]
+    records = queryset.in_bulk(ids)
+    return [records[pk] for pk in ids if pk in records]
+
+
+def run_text_reindex_job(job, progress):
+    """
+    Rebuild the full-text rows of the records of a renamed branch, department
+    or sub-department; the payload maps one of branch_id, department_id or
+    sub_department_id to its id.
+    """
+    filters = {key: value for key, value in job.payload.items()
+               if key in ('branch_id', 'department_id', 'sub_department_id')}
+    if len(filters) != 1:
+        raise ValueError('The payload needs exactly one of branch_id, department_id or sub_department_id')
+    records = (DataEntryRecord.objects.filter(**filters).order_by('id')
+               .only('id', 'branch_id', 'department_id', 'sub_department_id', 'field_values'))
+    progress.set_total(records.count())
+
+    batch = []
+    for record in records.iterator(chunk_size=TEXT_INDEX_BATCH_SIZE):
+        batch.append(record)
+        if len(batch) >= TEXT_INDEX_BATCH_SIZE:
+            index_text(batch)
+            progress.success(len(batch))
+            batch = []
+    if batch:
+        index_text(batch)
+        progress.success(len(batch))
+    return {'reindexed': job.success_count}
@@ -43,6 +43,8 @@ urlpatterns = [
     path('dashboard/setup/logo-upload/', views.logo_upload, name='logo_upload'),
     path('dashboard/setup/bulk-upload/', views.bulk_upload, name='bulk_upload'),
     path('process-bulk-upload/', views.process_bulk_upload, name='process_bulk_upload'),
+    path('bulk-upload/jobs/', views.bulk_upload_jobs, name='bulk_upload_jobs'),
+    path('bulk-upload/jobs/<int:job_id>/', views.bulk_upload_job_status, name='bulk_upload_job_status'),
     path('bulk-upload/template/', views.download_bulk_upload_template, name='download_bulk_upload_template'),
     
     # User URLs
@@ -11,10 +11,12 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate, login
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
-from .serializers import UserSerializer, LoginSerializer, RegisterSerializer, DepartmentSerializer, SubDepartmentSerializer, DivisionBranchSerializer, BranchDepartmentLinkSerializer, LogoSerializer, DataEntryRecordSerializer, BranchSerializer, ActivityLogSerializer
-from .models import User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, UserSubDepartment, DataEntryRecord, DataEntryFile, ActivityLog
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from .serializers import UserSerializer, LoginSerializer, RegisterSerializer, DepartmentSerializer, SubDepartmentSerializer, DivisionBranchSerializer, BranchDepartmentLinkSerializer, LogoSerializer, DataEntryRecordSerializer, ActivityLogSerializer
+from .models import User, Department, SubDepartment, DivisionBranch, BranchDepartmentLink, Logo, UserSubDepartment, DataEntryRecord, DataEntryFile, ActivityLog, BackgroundJob, ActivityLogFilterValue
 from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Count
+from django.db.models import Q
 from rest_framework.decorators import api_view, action
 from django.core.exceptions import PermissionDenied
 import json
@@ -24,20 +26,29 @@ from django.core.paginator import Paginator
 from django.views.decorators.http import require_http_methods
 from django.http import Http404
 import base64
-from django.urls import path
+from django.urls import path, reverse
 from django.db import transaction
 from datetime import datetime
 from django.utils import timezone
-from .signals import log_activity
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from django.utils.http import parse_etags
+from .signals import log_activity, get_client_ip
+from .jobs import enqueue_job
+from .storage import get_blob_store
+from .record_search import SearchQueryError, filter_records, search_ordering, order_records
+from .text_search import text_search, ranked_page
+from .batch_entry import BatchError, read_batch, plan_batch, insert_batch
+from .pagination import KeysetPagination, keyset_page
+from .downloads import serve_data_entry_file, PassthroughRenderer
+from .exports import export_response, EXPORT_CHUNK_SIZE
+from .access_cache import get_permission_set, bump_user_version
+from .access_scope import has_access, access_denied_message, scope_rows
+from .hierarchy import get_hierarchy as get_user_hierarchy
+from .master_data import get_master_data
+from .counters import total_records as total_record_count, record_counts as record_counts_by_scope
+from .query_budget import QueryBudget, query_budget
 import pandas as pd
 from io import BytesIO
-import tempfile
 import zipfile
-import os
-import mimetypes
 
 # Create your views here.
 
@@ -46,7 +57,7 @@ def login_view(request):
     try:
         active_logo = Logo.objects.filter(is_active=True).first()
         context = {
-            'logo_data': base64.b64encode(active_logo.logo_data).decode('utf-8') if active_logo else None,
+            'logo_data': base64.b64encode(active_logo.read_logo()).decode('utf-8') if active_logo else None,
             'organization_name': active_logo.organization_name if active_logo else 'Organization Name'
         }
     except Exception as e:
@@ -74,6 +85,7 @@ def logout_view(request):
     logout(request)
     return redirect('login_view')
 
+@query_budget(max_queries=15)
 @login_required
 def dashboard_home(request):
     # Log the view action
@@ -92,21 +104,14 @@ def dashboard_home(request):
     users = User.objects.all()
     total_users = users.count()
     
-    # Records count
-    records = DataEntryRecord.objects.all()
-    total_records = records.count()
+    # Records count, from the maintained counters
+    total_records = total_record_count()
     
-    # Departments count
-    departments = Department.objects.all()
-    total_departments = departments.count()
-    
-    # Sub-Departments count
-    sub_departments = SubDepartment.objects.all()
-    total_sub_departments = sub_departments.count()
-    
-    # Branches count
-    branches = DivisionBranch.objects.all()
-    total_branches = branches.count()
+    # Departments, sub-departments and branches, from the master data cache
+    master_data = get_master_data()
+    total_departments = len(master_data.by_id[Department])
+    total_sub_departments = len(master_data.by_id[SubDepartment])
+    total_branches = len(master_data.by_id[DivisionBranch])
     
 
     # Add user data and counts to the context
@@ -131,6 +136,7 @@ def create_user(request):
         return render(request, 'dashboard/403.html')
     return render(request, 'dashboard/create_user.html')
 
+@query_budget(max_queries=15)
 @login_required
 def register(request):
     if not request.user.can_view_register:
@@ -145,28 +151,27 @@ def register(request):
         request=request
     )
     
-    # Get record counts for each sub-department with IDs
-    record_counts = DataEntryRecord.objects.values(
-        'branch__id',
-        'branch__name',
-        'department__id',
-        'department__name',
-        'sub_department__id',
-        'sub_department__name'
-    ).annotate(
-        count=Count('id')
-    ).order_by('branch__name', 'department__name', 'sub_department__name')
+    # Get record counts for each sub-department from the maintained counters,
+    # with names from the master data cache
+    master_data = get_master_data()
+    record_counts = []
+    for branch_id, dept_id, sub_dept_id, count in record_counts_by_scope():
+        branch = master_data.get(DivisionBranch, branch_id)
+        dept = master_data.get(Department, dept_id)
+        sub_dept = master_data.get(SubDepartment, sub_dept_id)
+        if branch and dept and sub_dept:
+            record_counts.append((branch, dept, sub_dept, count))
+    record_counts.sort(key=lambda item: (item[0].name, item[1].name, item[2].name))
     
     # Organize the data by branch and department
     organized_data = {}
-    for record in record_counts:
-        branch_id = record['branch__id']
-        branch_name = record['branch__name']
-        dept_id = record['department__id']
-        dept_name = record['department__name']
-        sub_dept_id = record['sub_department__id']
-        sub_dept_name = record['sub_department__name']
-        count = record['count']
+    for branch, dept, sub_dept, count in record_counts:
+        branch_id = branch.id
+        branch_name = branch.name
+        dept_id = dept.id
+        dept_name = dept.name
+        sub_dept_id = sub_dept.id
+        sub_dept_name = sub_dept.name
         
         if branch_id not in organized_data:
             organized_data[branch_id] = {
@@ -184,28 +189,20 @@ def register(request):
             'count': count
         }
     
-    # Handle Excel download
-    if request.GET.get('download') == 'excel':
+    # Handle Excel/CSV download
+    download = request.GET.get('download')
+    if download in ('excel', 'csv'):
+        file_type = 'CSV' if download == 'csv' else 'Excel'
         # Log the download action
         log_activity(
             user=request.user,
             action='download',
             page='Register',
             model_name='Register',
-            details={'file_type': 'Excel', 'file_name': 'record_counts.xlsx'},
+            details={'file_type': file_type, 'file_name': 'record_counts.csv' if download == 'csv' else 'record_counts.xlsx'},
             request=request
         )
         
-        # Create a new workbook and select the active sheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Record Counts"
-        
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
         # Define headers
         headers = [
             'Branch/Division',
@@ -214,37 +211,18 @@ def register(request):
             'Number of Records'
         ]
         
-        # Write headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Write data
-        row = 2
-        for branch_id, branch_data in organized_data.items():
-            for dept_id, dept_data in branch_data['departments'].items():
-                for sub_dept_id, sub_dept_data in dept_data['sub_departments'].items():
-                    ws.cell(row=row, column=1, value=f"{branch_id} - {branch_data['name']}")
-                    ws.cell(row=row, column=2, value=f"{dept_id} - {dept_data['name']}")
-                    ws.cell(row=row, column=3, value=f"{sub_dept_id} - {sub_dept_data['name']}")
-                    ws.cell(row=row, column=4, value=sub_dept_data['count'])
-                    row += 1
-        
-        # Adjust column widths
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col)].width = 30
-        
-        # Create the response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=record_counts.xlsx'
+        def rows():
+            for branch_id, branch_data in organized_data.items():
+                for dept_id, dept_data in branch_data['departments'].items():
+                    for sub_dept_id, sub_dept_data in dept_data['sub_departments'].items():
+                        yield [
+                            f"{branch_id} - {branch_data['name']}",
+                            f"{dept_id} - {dept_data['name']}",
+                            f"{sub_dept_id} - {sub_dept_data['name']}",
+                            sub_dept_data['count'],
+                        ]
         
-        # Save the workbook to the response
-        wb.save(response)
-        return response
+        return export_response(download, 'record_counts', 'Record Counts', headers, rows(), column_width=30)
     
     context = {
         'organized_data': organized_data,
@@ -351,8 +329,7 @@ class PagePermissionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        permissions = user.get_page_permissions()
+        permissions = get_permission_set(request.user)['page_permissions']
         return Response(permissions)
 
 # Data Views
@@ -598,6 +575,7 @@ def users(request):
     }
     return render(request, 'dashboard/user/users.html', context)
 
+@query_budget(max_queries=6)
 @login_required
 def user_list(request):
     """API endpoint for listing and creating users"""
@@ -643,6 +621,7 @@ def user_list(request):
             print(f"Error creating user: {str(e)}")  # Debug log
             return JsonResponse({'error': str(e)}, status=400)
 
+@query_budget(max_queries=6)
 @login_required
 def user_detail(request, pk):
     """API endpoint for retrieving, updating and deleting a user"""
@@ -672,6 +651,7 @@ def user_detail(request, pk):
         user.delete()
         return JsonResponse({'message': 'User deleted successfully'}, status=204)
 
+@query_budget(max_queries=25)
 @login_required
 def user_rights(request):
     """User rights management page view"""
@@ -707,9 +687,7 @@ def user_rights(request):
             print("Cleared existing user permissions")  # Debug log
             
             # Reset all permission fields to False
-            for field in user._meta.fields:
-                if field.name.startswith('can_'):
-                    setattr(user, field.name, False)
+            user.permission_bits = 0
             print("Reset all permission fields to False")  # Debug log
             
             # Define permission hierarchy
@@ -771,7 +749,8 @@ def user_rights(request):
             
             # Save the user to update the permission fields
             user.save()
-            print(f"Saved user {user.username} with permissions: {[f.name for f in user._meta.fields if f.name.startswith('can_') and getattr(user, f.name)]}")  # Debug log
+            bump_user_version(user.id)
+            print(f"Saved user {user.username} with permissions: {user.permission_names()}")  # Debug log
             
             return JsonResponse({'status': 'success'})
         except User.DoesNotExist:
@@ -791,6 +770,7 @@ def user_rights(request):
     print(f"Rendering user rights page for user {request.user.username}")  # Debug log
     return render(request, 'dashboard/user/user_rights.html', context)
 
+@query_budget(max_queries=6)
 @login_required
 def get_user_permissions(request, user_id):
     """Get permissions for a specific user"""
@@ -805,28 +785,10 @@ def get_user_permissions(request, user_id):
         user = User.objects.get(id=user_id)
         print(f"Found user: {user.username}")  # Debug log
         
-        permissions = []
-        
-        # Get all field-based permissions
-        for field in user._meta.fields:
-            if field.name.startswith('can_'):
-                # Check if the field is a permission field
-                if getattr(user, field.name):
-                    permissions.append(field.name)
-                    print(f"Found permission {field.name} for user {user.username}")  # Debug log
-        
-        # Get all model-based permissions
-        for perm in user.user_permissions.all():
-            if perm.codename not in permissions:
-                permissions.append(perm.codename)
-                print(f"Found model permission {perm.codename}")  # Debug log
-        
-        # Get all group-based permissions
-        for group in user.groups.all():
-            for perm in group.permissions.all():
-                if perm.codename not in permissions:
-                    permissions.append(perm.codename)
-                    print(f"Found group permission {perm.codename}")  # Debug log
+        # Field-based permissions, then model and group permissions not already listed
+        permission_set = get_permission_set(user)
+        permissions = list(permission_set['names'])
+        permissions += [codename for codename in permission_set['codenames'] if codename not in permissions]
         
         print(f"Returning permissions: {permissions}")  # Debug log
         return JsonResponse({'permissions': permissions})
@@ -838,6 +800,10 @@ def get_user_permissions(request, user_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 # Report Views
+# Activity rows shown per log report page
+LOG_REPORT_PAGE_SIZE = 50
+
+@query_budget(max_queries=10)
 @login_required
 def log_report(request):
     if not request.user.can_view_log_report:
@@ -878,20 +844,22 @@ def log_report(request):
         logs = logs.filter(user_id=user_id)
     if action:
         logs = logs.filter(action=action)
-    if page:
-        logs = logs.filter(page__icontains=page)
-    if model:
-        logs = logs.filter(model_name__icontains=model)
     
     # Get all users for filter dropdown
-    users = User.objects.all()
+    users = User.objects.only('id', 'username', 'first_name', 'last_name').order_by('username')
     
-    # Get unique pages and models for filter dropdowns (using distinct to avoid duplicates)
-    pages = ActivityLog.objects.values_list('page', flat=True).distinct().order_by('page')
-    models = ActivityLog.objects.values_list('model_name', flat=True).distinct().order_by('model_name')
+    # Page and model names for the filter dropdowns are kept in a lookup table by the logger
+    pages = list(ActivityLogFilterValue.objects.filter(kind='page').values_list('value', flat=True))
+    models = list(ActivityLogFilterValue.objects.filter(kind='model').values_list('value', flat=True))
     
-    # Handle Excel download
-    if download == 'excel':
+    # A dropdown value is matched exactly; other text (e.g. typed into the URL) still matches as a substring
+    if page:
+        logs = logs.filter(page=page) if page in pages else logs.filter(page__icontains=page)
+    if model:
+        logs = logs.filter(model_name=model) if model in models else logs.filter(model_name__icontains=model)
+    
+    # Handle Excel/CSV download
+    if download in ('excel', 'csv'):
         # Log the download action
         log_activity(
             user=request.user,
@@ -899,8 +867,8 @@ def log_report(request):
             page='Log Report',
             model_name='ActivityLog',
             details={
-                'file_type': 'Excel',
-                'file_name': 'activity_logs.xlsx',
+                'file_type': 'CSV' if download == 'csv' else 'Excel',
+                'file_name': 'activity_logs.csv' if download == 'csv' else 'activity_logs.xlsx',
                 'filters': {
                     'start_date': start_date,
                     'end_date': end_date,
@@ -913,57 +881,51 @@ def log_report(request):
             request=request
         )
         
-        # Create a new workbook and select the active sheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Activity Logs"
-        
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
         # Define headers
         headers = [
             'Timestamp (IST)', 'User', 'Action', 'Page', 'Model', 
             'Object ID', 'Details', 'IP Address', 'User Agent'
         ]
         
-        # Write headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Write data
-        for row, log in enumerate(logs.order_by('-created_at'), 2):
-            ws.cell(row=row, column=1, value=log.created_at.astimezone(timezone.get_fixed_timezone(330)).strftime('%Y-%m-%d %H:%M:%S'))
-            ws.cell(row=row, column=2, value=log.user.get_full_name() if log.user else 'System')
-            ws.cell(row=row, column=3, value=log.action)
-            ws.cell(row=row, column=4, value=log.page)
-            ws.cell(row=row, column=5, value=log.model_name)
-            ws.cell(row=row, column=6, value=log.object_id)
-            ws.cell(row=row, column=7, value=json.dumps(log.details, indent=2))
-            ws.cell(row=row, column=8, value=log.ip_address)
-            ws.cell(row=row, column=9, value=log.user_agent)
+        ist = timezone.get_fixed_timezone(330)
         
-        # Adjust column widths
-        for col in range(1, len(headers) + 1):
-            ws.column_dimensions[get_column_letter(col)].width = 20
-        
-        # Create the response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=activity_logs.xlsx'
+        def rows():
+            # Plain tuples read in chunks, so neither the rows nor the users are loaded all at once
+            values = logs.order_by('-created_at', '-id').values_list(
+                'created_at', 'user_id', 'user__first_name', 'user__last_name', 'action', 'page',
+                'model_name', 'object_id', 'details', 'ip_address', 'user_agent')
+            for (created_at, log_user_id, first_name, last_name, log_action, log_page,
+                    model_name, object_id, details, ip_address, user_agent) in values.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield [
+                    created_at.astimezone(ist).strftime('%Y-%m-%d %H:%M:%S'),
+                    f'{first_name} {last_name}'.strip() if log_user_id else 'System',
+                    log_action,
+                    log_page,
+                    model_name,
+                    object_id,
+                    json.dumps(details),
+                    ip_address,
+                    user_agent,
+                ]
         
-        # Save the workbook to the response
-        wb.save(response)
-        return response
+        return export_response(download, 'activity_logs', 'Activity Logs', headers, rows())
+    
+    # One page of logs, located by a (created_at, id) cursor so deep pages cost the same as the first
+    try:
+        page_logs, next_cursor, previous_cursor = keyset_page(
+            logs.select_related('user'), request.GET.get('cursor') or None, LOG_REPORT_PAGE_SIZE)
+    except NotFound:
+        page_logs, next_cursor, previous_cursor = keyset_page(logs.select_related('user'), None, LOG_REPORT_PAGE_SIZE)
+    
+    def page_url(cursor):
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f'?{params.urlencode()}'
     
     context = {
-        'logs': logs.order_by('-created_at'),
+        'logs': page_logs,
+        'next_url': page_url(next_cursor) if next_cursor else None,
+        'previous_url': page_url(previous_cursor) if previous_cursor else None,
         'users': users,
         'pages': pages,
         'models': models,
@@ -976,6 +938,7 @@ def log_report(request):
     }
     return render(request, 'dashboard/report/log_report.html', context)
 
+@query_budget(max_queries=6)
 @api_view(['GET'])
 @permission_required('dashboard.view_users')
 def users_api(request):
@@ -1003,6 +966,7 @@ class DepartmentViewSet(mixins.ListModelMixin,
             raise PermissionDenied("You don't have permission to view departments")
         return Department.objects.all()
 
+    @query_budget(max_queries=10)
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
         page = self.request.query_params.get('page', 1)
@@ -1011,7 +975,21 @@ class DepartmentViewSet(mixins.ListModelMixin,
         paginator = Paginator(queryset, per_page)
         page_obj = paginator.get_page(page)
         
-        serializer = self.get_serializer(page_obj, many=True)
+        # The user's sub-departments of every department on the page in one query, instead of one per department
+        mapped = {}
+        for department_id, sub_department_id in scope_rows(request.user).filter(
+                department_id__in=[department.id for department in page_obj]).values_list('department_id', 'sub_department_id'):
+            mapped.setdefault(department_id, set()).add(sub_department_id)
+        sub_departments = get_master_data().filter(SubDepartment, set().union(*mapped.values()))
+        sub_departments_by_department = {
+            department_id: [sub_department for sub_department in sub_departments if sub_department.id in sub_department_ids]
+            for department_id, sub_department_ids in mapped.items()
+        }
+        
+        serializer = self.get_serializer(page_obj, many=True, context={
+            **self.get_serializer_context(),
+            'sub_departments_by_department': sub_departments_by_department,
+        })
         return Response({
             'departments': serializer.data,
             'total_pages': paginator.num_pages,
@@ -1041,7 +1019,14 @@ class DepartmentViewSet(mixins.ListModelMixin,
         instance._request = self.request
         instance.delete()
 
-class SubDepartmentViewSet(mixins.ListModelMixin,
+class MasterDataContextMixin:
+    """Resolves the master data once for the serializers of a request, which name branches and departments from it."""
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'master_data': get_master_data()}
+
+class SubDepartmentViewSet(MasterDataContextMixin,
+                          mixins.ListModelMixin,
                           mixins.CreateModelMixin,
                           mixins.DestroyModelMixin,
                           mixins.UpdateModelMixin,
@@ -1148,7 +1133,7 @@ class DivisionBranchViewSet(viewsets.ModelViewSet):
         instance._request = self.request
         instance.delete()
 
-class BranchDepartmentLinkViewSet(viewsets.ModelViewSet):
+class BranchDepartmentLinkViewSet(MasterDataContextMixin, viewsets.ModelViewSet):
     queryset = BranchDepartmentLink.objects.all()
     serializer_class = BranchDepartmentLinkSerializer
     permission_classes = [IsAuthenticated]
@@ -1204,6 +1189,19 @@ class BranchDepartmentLinkViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You don't have permission to delete branch department links")
         instance.delete()
 
+def decode_logo_data(logo_data):
+    """(image bytes, content type) of a data:image/...;base64 URI; raises ValidationError."""
+    if not logo_data or not isinstance(logo_data, str):
+        raise serializers.ValidationError("Invalid logo data format")
+    if not logo_data.startswith('data:image/'):
+        raise serializers.ValidationError("Invalid image data format")
+    try:
+        header, base64_data = logo_data.split(',', 1)
+        logo_binary = base64.b64decode(base64_data, validate=True)
+    except ValueError as e:
+        raise serializers.ValidationError(f"Error decoding image data: {str(e)}")
+    return logo_binary, header.split(';')[0][len('data:'):]
+
 class LogoViewSet(viewsets.ModelViewSet):
     queryset = Logo.objects.all()
     serializer_class = LogoSerializer
@@ -1232,31 +1230,16 @@ class LogoViewSet(viewsets.ModelViewSet):
             print("Starting perform_create")
             print(f"Request data: {self.request.data}")
             
-            # Get logo data and check its format
-            logo_data = self.request.data.get('logo_data')
-            print(f"Logo data type: {type(logo_data)}")
-            print(f"Logo data length: {len(logo_data) if logo_data else 0}")
-            
-            if not logo_data or not isinstance(logo_data, str):
-                raise serializers.ValidationError("Invalid logo data format")
-                
-            # Check if it's a valid base64 string
-            if not logo_data.startswith('data:image/'):
-                raise serializers.ValidationError("Invalid image data format")
-                
-            # Split the base64 string and get the actual data
-            try:
-                base64_data = logo_data.split(',')[1]
-                print(f"Base64 data length: {len(base64_data)}")
-                logo_binary = base64.b64decode(base64_data)
-                print(f"Decoded binary data length: {len(logo_binary)}")
-            except Exception as e:
-                print(f"Error decoding base64: {str(e)}")
-                raise serializers.ValidationError(f"Error decoding image data: {str(e)}")
+            logo_binary, content_type = decode_logo_data(self.request.data.get('logo_data'))
             
-            # Save the logo
+            # Store the image in the blob store and save the logo
+            logo = Logo()
+            logo.set_logo(logo_binary, content_type)
             serializer.save(
-                logo_data=logo_binary,
+                logo_data=None,
+                logo_sha256=logo.logo_sha256,
+                logo_size=logo.logo_size,
+                logo_type=logo.logo_type,
                 created_by=self.request.user,
                 updated_by=self.request.user
             )
@@ -1271,11 +1254,27 @@ class LogoViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You don't have permission to update logos")
         return super().update(request, *args, **kwargs)
 
+    def perform_update(self, serializer):
+        if 'logo_data' not in self.request.data:
+            serializer.save()
+            return
+        # A new image replaces the stored one, as on create
+        logo_binary, content_type = decode_logo_data(self.request.data.get('logo_data'))
+        logo = Logo()
+        logo.set_logo(logo_binary, content_type)
+        serializer.save(
+            logo_data=None,
+            logo_sha256=logo.logo_sha256,
+            logo_size=logo.logo_size,
+            logo_type=logo.logo_type,
+        )
+
     def destroy(self, request, *args, **kwargs):
         if not request.user.can_delete_logo_upload:
             raise PermissionDenied("You don't have permission to delete logos")
         return super().destroy(request, *args, **kwargs)
 
+@query_budget(max_queries=15)
 @api_view(['GET', 'POST'])
 def user_branch_departments(request, user_id):
     try:
@@ -1284,10 +1283,13 @@ def user_branch_departments(request, user_id):
         return Response({'error': 'User not found'}, status=404)
 
     if request.method == 'GET':
-        # Get all branches with their departments and subdepartments
-        branches = DivisionBranch.objects.all()
-        user_mappings = UserSubDepartment.objects.filter(user=user).first()
-        mappings = user_mappings.get_mappings() if user_mappings else {}
+        # Get all branches with their departments and subdepartments from the
+        # master data cache, grouped in memory
+        master_data = get_master_data()
+        branches = master_data.by_id[DivisionBranch].values()
+        links_by_branch = master_data.links_by_branch
+        subdepartments_by_department = master_data.sub_departments_by_department
+        assigned_triples = set(scope_rows(user).values_list('branch_id', 'department_id', 'sub_department_id'))
 
         response_data = {
             'branches': []
@@ -1300,9 +1302,8 @@ def user_branch_departments(request, user_id):
                 'departments': []
             }
 
-            # Get departments linked to this branch
-            branch_dept_links = BranchDepartmentLink.objects.filter(branch=branch)
-            for link in branch_dept_links:
+            # Departments linked to this branch, one entry per link
+            for link in links_by_branch.get(branch.id, []):
                 dept = link.department
                 dept_data = {
                     'id': dept.id,
@@ -1310,12 +1311,10 @@ def user_branch_departments(request, user_id):
                     'subdepartments': []
                 }
 
-                # Get subdepartments for this department
-                subdepartments = SubDepartment.objects.filter(department=dept)
-                for subdept in subdepartments:
+                # Subdepartments of this department
+                for subdept in subdepartments_by_department.get(dept.id, []):
                     # Check if this subdepartment is assigned to the user
-                    key = f"{branch.id}_{dept.id}_{subdept.id}"
-                    assigned = key in mappings
+                    assigned = (branch.id, dept.id, subdept.id) in assigned_triples
 
                     subdept_data = {
                         'id': subdept.id,
@@ -1335,40 +1334,49 @@ def user_branch_departments(request, user_id):
             data = request.data
             subdepartments = data.get('subdepartments', [])
 
-            # Get or create user mapping
-            user_mapping, created = UserSubDepartment.objects.get_or_create(user=user)
-            
-            # Clear existing mappings
-            user_mapping.clear_mappings()
-
-            # Add new mappings
+            # Compute the new mapping set
+            triples = []
             for mapping in subdepartments:
                 branch_id = mapping.get('branch_id')
                 department_id = mapping.get('department_id')
                 subdepartment_id = mapping.get('subdepartment_id')
 
                 if all([branch_id, department_id, subdepartment_id]):
-                    user_mapping.add_mapping(branch_id, department_id, subdepartment_id)
+                    triples.append((branch_id, department_id, subdepartment_id))
+
+            # Replace the existing mappings with a single write
+            UserSubDepartment.objects.update_or_create(
+                user=user, defaults={'mappings': UserSubDepartment.build_mappings(triples)})
 
+            bump_user_version(user.id)
             return Response({'message': 'Branch-department mappings updated successfully'})
 
         except Exception as e:
             return Response({'error': str(e)}, status=400)
 
-class DataEntryViewSet(viewsets.ModelViewSet):
+class DataEntryViewSet(MasterDataContextMixin, viewsets.ModelViewSet):
     serializer_class = DataEntryRecordSerializer
     permission_classes = [IsAuthenticated]
+    default_query_budget = QueryBudget(max_queries=12)
 
     def get_queryset(self):
         if not self.request.user.can_view_data_edit:
             raise PermissionDenied("You don't have permission to view data entries")
-        return DataEntryRecord.objects.filter(user=self.request.user)
+        queryset = DataEntryRecord.objects.filter(user=self.request.user)
+        if self.action == 'list':
+            # Files are serialized with every record
+            queryset = queryset.prefetch_related('files')
+        elif self.action == 'destroy':
+            # The deletion log entry names the record's user, branch, department and sub-department
+            queryset = queryset.select_related('user', 'branch', 'department', 'sub_department')
+        return queryset
 
     def retrieve(self, request, *args, **kwargs):
         if not request.user.can_view_data_edit:
             raise PermissionDenied("You don't have permission to view data entries")
         return super().retrieve(request, *args, **kwargs)
 
+    @query_budget(max_queries=25)
     def update(self, request, *args, **kwargs):
         if not request.user.can_update_data_edit:
             raise PermissionDenied("You don't have permission to update data entries")
@@ -1396,23 +1404,31 @@ class DataEntryViewSet(viewsets.ModelViewSet):
                 # Delete existing files
                 record.files.all().delete()
                 # Create new file
-                DataEntryFile.objects.create(
-                    record=record,
-                    file_name=new_file.name,
-                    file_type=new_file.content_type,
-                    file_data=new_file.read(),
-                    file_size=new_file.size
-                )
+                DataEntryFile.from_content(record, new_file.name, new_file.content_type, new_file).save()
             
             return Response(serializer.data)
         except Exception as e:
             return Response({'error': str(e)}, status=400)
 
+    @query_budget(max_queries=16)
     def destroy(self, request, *args, **kwargs):
         if not request.user.can_delete_data_edit:
             raise PermissionDenied("You don't have permission to delete data entries")
         return super().destroy(request, *args, **kwargs)
 
+    def _search_results(self, records):
+        # Serialize results with permissions
+        serializer = self.get_serializer(records, many=True)
+        results = serializer.data
+
+        # Add permission flags to each result
+        for result in results:
+            result['can_view'] = self.request.user.can_view_data_edit
+            result['can_update'] = self.request.user.can_update_data_edit
+            result['can_delete'] = self.request.user.can_delete_data_edit
+        return results
+
+    @query_budget(max_queries=10)
     @action(detail=False, methods=['get'])
     def search(self, request):
         try:
@@ -1423,11 +1439,11 @@ class DataEntryViewSet(viewsets.ModelViewSet):
             branch_id = request.query_params.get('division-filter')
             department_id = request.query_params.get('department-filter')
             sub_department_id = request.query_params.get('subdepartment-filter')
-            page = int(request.query_params.get('page', 1))
-            per_page = int(request.query_params.get('per_page', 10))
+            use_cursor = 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor'
 
             # Start with base queryset
-            queryset = DataEntryRecord.objects.filter(user=request.user)
+            # Files are serialized with every result, so fetch them in one query per page
+            queryset = DataEntryRecord.objects.filter(user=request.user).prefetch_related('files')
 
             # Apply filters
             if branch_id:
@@ -1437,66 +1453,81 @@ class DataEntryViewSet(viewsets.ModelViewSet):
             if sub_department_id:
                 queryset = queryset.filter(sub_department_id=sub_department_id)
 
-            # Apply field value filters
-            for key, value in request.query_params.items():
-                if key.startswith('field_') and value:
-                    field_name = key.replace('field_', '')
-                    queryset = queryset.filter(field_values__has_key=field_name)
-                    queryset = queryset.filter(**{f'field_values__{field_name}__icontains': value})
+            # Apply field value and created_at filters using the field_values index
+            queryset = filter_records(queryset, request.query_params, sub_department_id)
+            ordering = search_ordering(request.query_params)
+
+            # Full-text search over field values and branch, department and sub-department names
+            text = request.query_params.get('q', '').strip()
+            unmatched = queryset
+            if text:
+                queryset = text_search(queryset, text)
+
+            if use_cursor:
+                if ordering not in (None, (True, None)):
+                    raise SearchQueryError('Cursor pagination only orders by -created_at; use page pagination')
+                # Keyset pagination on (created_at, id); the total is opt-in. q results
+                # come newest first here, as a rank cannot be resumed from a cursor
+                paginator = KeysetPagination()
+                page_items = paginator.paginate_queryset(queryset, request, view=self)
+                results = self._search_results(page_items)
+                return paginator.get_paginated_response(results)
+
+            page = int(request.query_params.get('page', 1))
+            per_page = int(request.query_params.get('per_page', 10))
 
-            # Get total count before pagination
-            total_count = queryset.count()
+            # Get total count before pagination (skipped with include_count=false)
+            include_count = request.query_params.get('include_count', 'true').lower() != 'false'
+            total_count = queryset.count() if include_count else None
 
             # Apply pagination
             start = (page - 1) * per_page
             end = start + per_page
-            queryset = queryset[start:end]
-
-            # Serialize results with permissions
-            serializer = self.get_serializer(queryset, many=True)
-            results = serializer.data
-            
-            # Add permission flags to each result
-            for result in results:
-                result['can_view'] = request.user.can_view_data_edit
-                result['can_update'] = request.user.can_update_data_edit
-                result['can_delete'] = request.user.can_delete_data_edit
-            
-            return Response({
-                'count': total_count,
-                'results': results
-            })
-
+            if ordering is not None:
+                # An explicit order wins over the text rank
+                queryset = order_records(queryset, ordering, sub_department_id)[start:end]
+            else:
+                ranked = ranked_page(unmatched, text, start, end) if text else None
+                queryset = ranked if ranked is not None else queryset.order_by('-created_at', '-id')[start:end]
+
+            response_data = {'results': self._search_results(queryset)}
+            if include_count:
+                response_data['count'] = total_count
+            return Response(response_data)
+
+        except SearchQueryError as e:
+            return Response({'error': str(e)}, status=400)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=404)
         except PermissionDenied as e:
             return Response({'error': str(e)}, status=403)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+    @query_budget(max_queries=8)
     @action(detail=False, methods=['get'])
     def get_hierarchy(self, request):
         try:
-            # Get user's sub-department mappings
-            user_mappings = UserSubDepartment.objects.filter(user=request.user).first()
-            if not user_mappings:
-                return Response({'error': 'No permissions found for user'}, status=403)
-
-            mappings = user_mappings.get_mappings()
-            if not mappings:
-                return Response({'error': 'No branch-department mappings found for user'}, status=403)
-
-            # Get unique branch IDs from mappings
-            branch_ids = set()
-            for mapping in mappings.values():
-                branch_ids.add(mapping['branch_id'])
-
-            # Get branches with their departments and sub-departments
-            branches = DivisionBranch.objects.filter(id__in=branch_ids)
-            serializer = BranchSerializer(branches, many=True, context={'request': request})
-            return Response(serializer.data)
+            # Branches with their departments and sub-departments, built in a fixed number of queries
+            etag, hierarchy = get_user_hierarchy(request)
+            if not hierarchy:
+                error = access_denied_message(request.user, 'No branch-department mappings found for user')
+                return Response({'error': error}, status=403)
+
+            if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                response = Response(status=304)
+            else:
+                response = Response(hierarchy)
+            response['ETag'] = etag
+            # Let clients keep the tree but revalidate it on every use
+            response['Cache-Control'] = 'private, no-cache'
+            return response
         except Exception as e:
             print(f"Error in get_hierarchy: {str(e)}")  # Debug log
             return Response({'error': str(e)}, status=500)
 
+    @query_budget(max_queries=8)
     @action(detail=False, methods=['get'])
     def get_subdepartment_fields(self, request):
         try:
@@ -1505,28 +1536,14 @@ class DataEntryViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Sub department ID is required'}, status=400)
 
             # Verify user has access to this sub-department
-            user_mappings = UserSubDepartment.objects.filter(user=request.user).first()
-            if not user_mappings:
-                return Response({'error': 'No permissions found for user'}, status=403)
-
-            mappings = user_mappings.get_mappings()
-            if not mappings:
-                return Response({'error': 'No branch-department mappings found for user'}, status=403)
-
-            # Check if user has access to this sub-department
-            has_access = False
-            for mapping in mappings.values():
-                if str(mapping['subdepartment_id']) == str(sub_department_id):
-                    has_access = True
-                    break
-
-            if not has_access:
-                return Response({'error': 'You do not have access to this sub-department'}, status=403)
+            if not has_access(request.user, sub_department_id=sub_department_id):
+                error = access_denied_message(request.user, 'You do not have access to this sub-department')
+                return Response({'error': error}, status=403)
 
-            sub_department = SubDepartment.objects.get(id=sub_department_id)
+            sub_department = get_master_data().get(SubDepartment, sub_department_id)
+            if sub_department is None:
+                return Response({'error': 'Sub department not found'}, status=404)
             return Response({'fields': sub_department.fields})
-        except SubDepartment.DoesNotExist:
-            return Response({'error': 'Sub department not found'}, status=404)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
@@ -1536,31 +1553,16 @@ class DataEntryViewSet(viewsets.ModelViewSet):
         department_id = serializer.validated_data.get('department').id
         sub_department_id = serializer.validated_data.get('sub_department').id
 
-        user_mappings = UserSubDepartment.objects.filter(user=self.request.user).first()
-        if not user_mappings:
-            raise PermissionDenied("No permissions found for user")
-
-        mappings = user_mappings.get_mappings()
-        if not mappings:
-            raise PermissionDenied("No branch-department mappings found for user")
-
-        # Check if user has access to this combination
-        has_access = False
-        for mapping in mappings.values():
-            if (str(mapping['branch_id']) == str(branch_id) and
-                str(mapping['department_id']) == str(department_id) and
-                str(mapping['subdepartment_id']) == str(sub_department_id)):
-                has_access = True
-                break
-
-        if not has_access:
-            raise PermissionDenied("You do not have access to this branch-department-subdepartment combination")
+        if not has_access(self.request.user, branch_id, department_id, sub_department_id):
+            raise PermissionDenied(access_denied_message(
+                self.request.user, "You do not have access to this branch-department-subdepartment combination"))
 
         # Attach request to the instance
         instance = serializer.save(user=self.request.user)
         instance._request = self.request
         serializer.save(user=self.request.user)
 
+    @query_budget(max_queries=30)
     def create(self, request, *args, **kwargs):
         try:
             with transaction.atomic():
@@ -1607,13 +1609,8 @@ class DataEntryViewSet(viewsets.ModelViewSet):
                 for file in files:
                     print(f"Processing file: {file.name} ({file.size} bytes)")  # Debug log
                     try:
-                        file_obj = DataEntryFile.objects.create(
-                            record=record,
-                            file_name=file.name,
-                            file_type=file.content_type,
-                            file_data=file.read(),
-                            file_size=file.size
-                        )
+                        file_obj = DataEntryFile.from_content(record, file.name, file.content_type, file)
+                        file_obj.save()
                         print(f"File saved with ID: {file_obj.id}")  # Debug log
                     except Exception as e:
                         print(f"Error saving file {file.name}: {str(e)}")  # Debug log
@@ -1627,23 +1624,61 @@ class DataEntryViewSet(viewsets.ModelViewSet):
             print(f"Error in create: {str(e)}")  # Debug log
             return Response({'error': str(e)}, status=400)
 
-    @action(detail=True, methods=['get'])
-    def download_file(self, request, pk=None):
+    @query_budget(max_queries=30)
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch_create(self, request):
+        """
+        Create many records at once. `records` is a JSON list of {branch,
+        department, sub_department, field_values}; the files of record i are
+        sent as multipart parts named documents_<i>. The batch is validated as
+        a whole and either every record is created or none.
+        """
+        if not request.user.can_create_data_entry:
+            return Response({'error': "You don't have permission to create data entries"}, status=403)
         try:
-            record = self.get_object()
-            if not record.files.exists():
-                return Response({'error': 'No files found for this record'}, status=404)
+            records = read_batch(request.data)
+        except BatchError as e:
+            return Response({'error': str(e)}, status=400)
 
-            # Get the first file (or you could add a file_id parameter to get a specific file)
-            file_obj = record.files.first()
-            
-            # Create the response with the file data
-            response = HttpResponse(file_obj.file_data, content_type=file_obj.file_type)
-            response['Content-Disposition'] = f'attachment; filename="{file_obj.file_name}"'
-            return response
+        entries, errors = plan_batch(request.user, records, request.FILES)
+        if errors:
+            return Response({'error': 'No records were created', 'errors': errors}, status=400)
+
+        try:
+            created = insert_batch(request.user, entries, request)
+        except Exception as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({'count': len(created), 'ids': [record.id for record in created]}, status=201)
+
+    @action(detail=True, methods=['get'], renderer_classes=[JSONRenderer, PassthroughRenderer])
+    def download_file(self, request, pk=None):
+        record = self.get_object()
+        files = record.files.all()
+
+        # Serve the requested file, or the most recent one for older clients
+        file_id = request.query_params.get('file_id')
+        if file_id:
+            try:
+                file_id = int(file_id)
+            except ValueError:
+                return Response({'error': 'file_id must be an integer'}, status=400)
+        file_obj = files.filter(pk=file_id).first() if file_id else files.first()
+        if not file_obj:
+            return Response({'error': 'No files found for this record'}, status=404)
+
+        try:
+            return serve_data_entry_file(request, file_obj)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
+    @action(detail=True, methods=['get'], url_path=r'files/(?P<file_id>[0-9]+)/download',
+            renderer_classes=[JSONRenderer, PassthroughRenderer])
+    def download(self, request, pk=None, file_id=None):
+        """Stream one file of a record, with Range and conditional request support."""
+        record = self.get_object()
+        file_obj = get_object_or_404(DataEntryFile, pk=file_id, record=record)
+        return serve_data_entry_file(request, file_obj, as_attachment=request.query_params.get('inline') != 'true')
+
 class LogoutView(APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -1674,13 +1709,15 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    default_query_budget = QueryBudget(max_queries=6)
 
     def get_queryset(self):
         if not self.request.user.can_view_log_report:
             raise PermissionDenied("You don't have permission to view activity logs")
         
-        queryset = ActivityLog.objects.all()
+        # user_name is serialized for every log
+        queryset = ActivityLog.objects.select_related('user')
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date')
@@ -1758,6 +1795,7 @@ def download_bulk_upload_template(request):
     
     return response
 
+@query_budget(max_queries=12)
 @login_required
 def process_bulk_upload(request):
     if not request.user.can_create_bulk_upload:
@@ -1771,152 +1809,54 @@ def process_bulk_upload(request):
         zip_file = request.FILES.get('zipFile')
         if not zip_file:
             return JsonResponse({'error': 'No ZIP file provided'}, status=400)
+        if not zipfile.is_zipfile(zip_file):
+            return JsonResponse({'error': 'The uploaded file is not a valid ZIP archive'}, status=400)
+        zip_file.seek(0)
         
-        # Create a temporary directory to extract files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Save the ZIP file temporarily
-            zip_path = os.path.join(temp_dir, 'upload.zip')
-            with open(zip_path, 'wb+') as destination:
-                for chunk in zip_file.chunks():
-                    destination.write(chunk)
-            
-            # Extract the ZIP file
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            
-            # Find the Excel file and data directory
-            excel_file = None
-            data_dir = None
-            
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    if file.endswith(('.xlsx', '.xls')):
-                        excel_file = os.path.join(root, file)
-                if 'data' in dirs:
-                    data_dir = os.path.join(root, 'data')
-            
-            if not excel_file:
-                return JsonResponse({'error': 'No Excel file found in the ZIP'}, status=400)
-            if not data_dir:
-                return JsonResponse({'error': 'No data directory found in the ZIP'}, status=400)
-            
-            # Read the Excel file
-            df = pd.read_excel(excel_file)
-            
-            # Convert column names to lowercase for case-insensitive matching
-            df.columns = [col.lower() for col in df.columns]
-            
-            # Define required columns (case-insensitive)
-            required_columns = ['branch id', 'department id', 'sub department id', 'file name']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return JsonResponse({
-                    'error': f'Missing required columns: {", ".join(missing_columns)}'
-                }, status=400)
-            
-            # Process each row
-            success_count = 0
-            error_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # Get the file from data directory
-                    file_name = row['file name']
-                    file_path = os.path.join(data_dir, file_name)
-                    
-                    if not os.path.exists(file_path):
-                        raise FileNotFoundError(f'File not found: {file_name}')
-                    
-                    # Get branch, department, and sub-department
-                    try:
-                        branch = DivisionBranch.objects.get(division_id=row['branch id'])
-                        department = Department.objects.get(department_id=row['department id'])
-                        sub_department = SubDepartment.objects.get(sub_department_id=row['sub department id'])
-                    except (DivisionBranch.DoesNotExist, Department.DoesNotExist, SubDepartment.DoesNotExist) as e:
-                        raise ValueError(f'Invalid ID in row {index + 2}: {str(e)}')
-                    
-                    # Get existing fields from sub-department
-                    existing_fields = sub_department.fields
-                    field_names = {field['name'].lower(): field for field in existing_fields}
-                    
-                    # Create field values dictionary from dynamic fields
-                    field_values = {}
-                    new_fields = []
-                    
-                    for column in df.columns:
-                        if column.lower().startswith('field:'):
-                            field_name = column.replace('field:', '').strip()
-                            field_value = row[column]
-                            
-                            # Add to field values
-                            field_values[field_name] = field_value
-                            
-                            # Check if field exists in sub-department
-                            if field_name.lower() not in field_names:
-                                # Create new field configuration
-                                new_field = {
-                                    'name': field_name,
-                                    'data_type': 'alphanumeric',  # Default to alphanumeric
-                                    'requirement': 'optional',    # Default to optional
-                                    'verify': False              # Default to no verification
-                                }
-                                new_fields.append(new_field)
-                                field_names[field_name.lower()] = new_field
-                    
-                    # Update sub-department fields if new fields were added
-                    if new_fields:
-                        sub_department.fields = existing_fields + new_fields
-                        sub_department.save()
-                    
-                    # Create data entry record
-                    with transaction.atomic():
-                        # Create the record
-                        record = DataEntryRecord.objects.create(
-                            user=request.user,
-                            branch=branch,
-                            department=department,
-                            sub_department=sub_department,
-                            field_values=field_values
-                        )
-                        
-                        # Add the file
-                        with open(file_path, 'rb') as f:
-                            file_data = f.read()
-                            DataEntryFile.objects.create(
-                                record=record,
-                                file_name=file_name,
-                                file_type=mimetypes.guess_type(file_name)[0] or 'application/octet-stream',
-                                file_data=file_data,
-                                file_size=len(file_data)
-                            )
-                    
-                    success_count += 1
-                    
-                except Exception as e:
-                    error_count += 1
-                    errors.append(f'Row {index + 2}: {str(e)}')
-            
-            # Log the activity
-            log_activity(
-                user=request.user,
-                action='create',
-                page='Bulk Upload',
-                model_name='DataEntryRecord',
-                details={
-                    'success_count': success_count,
-                    'error_count': error_count,
-                    'errors': errors
-                },
-                request=request
-            )
-            
-            return JsonResponse({
-                'message': 'Bulk upload completed',
-                'success_count': success_count,
-                'error_count': error_count,
-                'errors': errors
-            })
+        # Keep the archive in the blob store; the rows are processed by the run_jobs worker
+        zip_sha256, zip_size = get_blob_store().save(zip_file)
+        job = enqueue_job('bulk_upload', request.user, {
+            'user_id': request.user.id,
+            'zip_sha256': zip_sha256,
+            'zip_size': zip_size,
+            'file_name': zip_file.name,
+            'ip_address': get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        })
+        
+        return JsonResponse({
+            'message': 'Bulk upload queued',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('bulk_upload_job_status', args=[job.id]),
+        }, status=202)
             
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+@query_budget(max_queries=6)
+@login_required
+def bulk_upload_jobs(request):
+    if not (request.user.can_view_bulk_upload or request.user.can_create_bulk_upload):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    jobs = BackgroundJob.objects.filter(kind='bulk_upload')
+    if not request.user.is_superuser:
+        jobs = jobs.filter(user=request.user)
+    
+    return JsonResponse({'jobs': [job.as_dict() for job in jobs[:20]]})
+
+@query_budget(max_queries=6)
+@login_required
+def bulk_upload_job_status(request, job_id):
+    if not (request.user.can_view_bulk_upload or request.user.can_create_bulk_upload):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    jobs = BackgroundJob.objects.filter(kind='bulk_upload')
+    if not request.user.is_superuser:
+        jobs = jobs.filter(user=request.user)
+    job = jobs.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    
+    return JsonResponse(job.as_dict())